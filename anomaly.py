@@ -0,0 +1,294 @@
+"""
+SetuAayu Online Anomaly Engine
+
+Streaming detector with O(1) memory per bridge and sensor:
+
+* Seasonal profile: EWMA mean per hour-of-day bin (24 floats), so rush-hour
+  strain is not flagged every evening.
+* EWMA residual variance around that profile, giving a z-score per reading.
+* Two-sided CUSUM on the z-score for slow drifts that never cross the
+  z threshold on their own.
+* Static engineering limits (the thresholds the dashboard and 3D viewer used
+  to hard-code) checked on every reading.
+
+Alerts are deduplicated per (bridge, sensor, kind) into episodes: the first
+reading in violation emits one event, and the episode stays open while that
+bridge's readings keep violating, however far apart they are. It closes on
+a reading without the condition that comes at least `cooldown_s` after the
+last violation, so a flapping condition does not re-open it every reading.
+
+Usage:
+    python anomaly.py replay synthetic_bridge.csv
+"""
+import argparse
+import math
+import time
+
+import numpy as np
+import pandas as pd
+
+from bridge_sim import SENSOR_FIELDS
+
+# Static engineering limits (single source of truth for app.py and the viewer)
+VIBRATION_LIMIT_G = 0.3
+TILT_LIMIT_DEG = 2.0
+TRAFFIC_LIMIT_PCU = 4000
+HEALTH_CRITICAL = 70
+HEALTH_WARNING = 90
+STRAIN_CRITICAL = 300
+STRAIN_WARNING = 150
+
+SEASON_BINS = 24
+
+
+def check_thresholds(reading):
+    """
+    Static limit checks for one reading.
+
+    Returns:
+        list: (field, value, limit) for every limit that is exceeded.
+    """
+    violations = []
+    for field in ("vibration_x", "vibration_y", "vibration_z"):
+        if field in reading and reading[field] > VIBRATION_LIMIT_G:
+            violations.append((field, reading[field], VIBRATION_LIMIT_G))
+    if "tilt" in reading and abs(reading["tilt"]) > TILT_LIMIT_DEG:
+        violations.append(("tilt", reading["tilt"], TILT_LIMIT_DEG))
+    if "strain" in reading and reading["strain"] > STRAIN_CRITICAL:
+        violations.append(("strain", reading["strain"], STRAIN_CRITICAL))
+    if "traffic_load" in reading and reading["traffic_load"] > TRAFFIC_LIMIT_PCU:
+        violations.append(("traffic_load", reading["traffic_load"], TRAFFIC_LIMIT_PCU))
+    if "health_score" in reading and reading["health_score"] < HEALTH_CRITICAL:
+        violations.append(("health_score", reading["health_score"], HEALTH_CRITICAL))
+    return violations
+
+
+class SensorBaseline:
+    """Adaptive baseline for one (bridge, sensor) stream."""
+
+    __slots__ = ("n", "mean", "res_var", "season_mean", "season_n", "cusum_pos", "cusum_neg")
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.res_var = 0.0
+        self.season_mean = [0.0] * SEASON_BINS
+        self.season_n = [0] * SEASON_BINS
+        self.cusum_pos = 0.0
+        self.cusum_neg = 0.0
+
+    def update(self, x, hour, engine):
+        """
+        Scores `x` against the baseline, then learns from it.
+
+        Returns:
+            tuple: (z-score, kind or None) where kind is "spike", "drift_up"
+            or "drift_down".
+        """
+        if self.n == 0:
+            self.mean = x
+            self.season_mean[hour] = x
+            self.season_n[hour] = 1
+            self.n = 1
+            return 0.0, None
+
+        seasonal = self.season_n[hour] >= engine.min_season_samples
+        expected = self.season_mean[hour] if seasonal else self.mean
+        residual = x - expected
+        sd = math.sqrt(self.res_var) + engine.min_sd
+        z = residual / sd
+
+        kind = None
+        if self.n >= engine.warmup:
+            self.cusum_pos = max(0.0, self.cusum_pos + z - engine.cusum_k)
+            self.cusum_neg = max(0.0, self.cusum_neg - z - engine.cusum_k)
+            if abs(z) > engine.z_threshold:
+                kind = "spike"
+            elif self.cusum_pos > engine.cusum_h:
+                kind = "drift_up"
+                self.cusum_pos = 0.0
+            elif self.cusum_neg > engine.cusum_h:
+                kind = "drift_down"
+                self.cusum_neg = 0.0
+
+        # Learn slowly from anomalous points so one burst does not poison the baseline
+        alpha = engine.alpha if kind is None else engine.alpha * 0.1
+        self.mean += alpha * (x - self.mean)
+        self.res_var = (1 - alpha) * (self.res_var + alpha * residual * residual)
+        if self.season_n[hour]:
+            self.season_mean[hour] += engine.season_alpha * (x - self.season_mean[hour])
+        else:
+            self.season_mean[hour] = x
+        self.season_n[hour] += 1
+        self.n += 1
+        return z, kind
+
+
+class AnomalyEngine:
+    """
+    Scores readings per bridge and emits deduplicated alert events.
+
+    Events are dicts, one per episode: timestamp, bridge, sensor, kind
+    ("spike", "drift_up", "drift_down" or "threshold"), value and score of
+    the reading that opened it.
+    """
+
+    def __init__(self, sensors=SENSOR_FIELDS, alpha=0.02, season_alpha=0.05, z_threshold=4.0,
+                 cusum_k=0.5, cusum_h=8.0, warmup=30, min_season_samples=10, min_sd=1e-6,
+                 cooldown_s=300.0, use_thresholds=True):
+        self.sensors = list(sensors)
+        self.alpha = alpha
+        self.season_alpha = season_alpha
+        self.z_threshold = z_threshold
+        self.cusum_k = cusum_k
+        self.cusum_h = cusum_h
+        self.warmup = warmup
+        self.min_season_samples = min_season_samples
+        self.min_sd = min_sd
+        self.cooldown_s = cooldown_s
+        self.use_thresholds = use_thresholds
+        self.baselines = {}
+        self.open_alerts = {} # bridge -> {(sensor, kind): last time the condition was seen}
+        self.suppressed = 0
+        self.last_conditions = 0 # Conditions seen in the last `process` call, incl. suppressed ones
+
+    def _baselines(self, bridge):
+        baselines = self.baselines.get(bridge)
+        if baselines is None:
+            baselines = self.baselines[bridge] = {sensor: SensorBaseline() for sensor in self.sensors}
+        return baselines
+
+    def _raise(self, events, seen, timestamp, bridge, sensor, kind, value, score):
+        self.last_conditions += 1
+        key = (sensor, kind)
+        seen.add(key)
+        episodes = self.open_alerts.setdefault(bridge, {})
+        if key in episodes:
+            self.suppressed += 1 # Same episode
+        else:
+            events.append({"timestamp": timestamp, "bridge": bridge, "sensor": sensor,
+                           "kind": kind, "value": value, "score": score})
+        episodes[key] = timestamp
+
+    def _close_quiet(self, bridge, seen, timestamp):
+        # Episodes of this bridge whose condition is absent from this reading and has been quiet long enough
+        episodes = self.open_alerts.get(bridge)
+        if not episodes:
+            return
+        for key in [k for k, last in episodes.items() if k not in seen and timestamp - last >= self.cooldown_s]:
+            del episodes[key]
+
+    def process(self, bridge, reading, timestamp):
+        """
+        Scores one reading.
+
+        Args:
+            bridge (str): Bridge / node id.
+            reading (dict): Sensor values (extra keys such as health_score are
+                used for the static limits).
+            timestamp (float): Epoch seconds.
+
+        Returns:
+            list: New alert events, one per newly opened episode (usually empty).
+        """
+        events = []
+        seen = set()
+        self.last_conditions = 0
+        hour = int(timestamp // 3600) % SEASON_BINS
+        baselines = self._baselines(bridge)
+        for sensor in self.sensors:
+            value = reading[sensor]
+            z, kind = baselines[sensor].update(value, hour, self)
+            if kind is not None:
+                self._raise(events, seen, timestamp, bridge, sensor, kind, value, z)
+        if self.use_thresholds:
+            for field, value, limit in check_thresholds(reading):
+                self._raise(events, seen, timestamp, bridge, field, "threshold", value, value / limit)
+        self._close_quiet(bridge, seen, timestamp)
+        return events
+
+
+def replay(df, engine=None, bridge_col=None):
+    """
+    Runs the engine over a stored history (oldest first) and measures it.
+
+    If the data carries a `scenario` column, a reading counts as flagged when
+    any alert condition holds for it (new or already open), and detection
+    latency is measured from the first critical reading of each critical
+    episode to the first flagged reading for that bridge.
+
+    Returns:
+        tuple: (events DataFrame, stats dict)
+    """
+    engine = engine or AnomalyEngine()
+    if bridge_col is None:
+        bridge_col = "location_id" if "location_id" in df.columns else "location"
+    # Explicit unit: pandas may parse to datetime64[us] or [ns]
+    timestamps = pd.to_datetime(df["timestamp"]).to_numpy().astype("datetime64[ms]").astype(np.int64) / 1e3
+    bridges = df[bridge_col].astype(str).to_numpy()
+    extra = [c for c in ("traffic_load", "health_score") if c in df.columns]
+    records = df[engine.sensors + extra].to_dict("records")
+    critical = (df["scenario"] == "critical").to_numpy() if "scenario" in df.columns else None
+
+    events = []
+    episode_start = {}
+    latencies = []
+    flagged_critical = flagged_normal = 0
+
+    start = time.perf_counter()
+    for i, record in enumerate(records):
+        events.extend(engine.process(bridges[i], record, timestamps[i]))
+        if critical is None:
+            continue
+        bridge = bridges[i]
+        flagged = engine.last_conditions > 0
+        if critical[i]:
+            flagged_critical += flagged
+            episode_start.setdefault(bridge, timestamps[i])
+            if flagged and episode_start[bridge] is not None:
+                latencies.append(timestamps[i] - episode_start[bridge])
+                episode_start[bridge] = None # Detected; ignore the rest of the episode
+        else:
+            flagged_normal += flagged
+            episode_start.pop(bridge, None)
+    elapsed = time.perf_counter() - start
+
+    stats = {
+        "readings": len(records),
+        "span_s": float(timestamps.max() - timestamps.min()) if len(timestamps) else 0.0,
+        "events": len(events), # One per episode
+        "suppressed": engine.suppressed, # Violations inside an already open episode
+        "seconds": elapsed,
+        "readings_per_s": len(records) / elapsed if elapsed else float("inf"),
+        "us_per_reading": elapsed / max(len(records), 1) * 1e6,
+    }
+    if critical is not None:
+        stats.update({
+            "critical_readings": int(critical.sum()),
+            "critical_with_alert": flagged_critical,
+            "normal_with_alert": flagged_normal,
+            "detected_episodes": len(latencies),
+            "mean_detection_latency_s": float(np.mean(latencies)) if latencies else float("nan"),
+        })
+    return pd.DataFrame(events), stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SetuAayu online anomaly engine")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_replay = sub.add_parser("replay", help="Replay a CSV through the engine")
+    p_replay.add_argument("csv", nargs="?", default="synthetic_bridge.csv")
+    p_replay.add_argument("--no-thresholds", action="store_true", help="Adaptive detectors only")
+    p_replay.add_argument("--events", help="Write alert events to this CSV")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv)
+    events, stats = replay(df, AnomalyEngine(use_thresholds=not args.no_thresholds))
+    print(f"--- Anomaly replay: {args.csv} ---")
+    for key, value in stats.items():
+        print(f"{key:<28} {value:,.2f}" if isinstance(value, float) else f"{key:<28} {value:,}")
+    if not events.empty:
+        print("\nEvents by kind:")
+        print(events.groupby(["kind"]).size().to_string())
+    if args.events:
+        events.to_csv(args.events, index=False)
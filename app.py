@@ -3,9 +3,17 @@ import pandas as pd
 import time
 import os
 import json
-from openai import OpenAI
+import instrumentation
 from bridge_sim import generate_bridge_data
 
+# Per-rerun timing (instrumentation.py); the panel toggle is read before its widget is drawn.
+# Metrics follow the toggle on every rerun, so switching it off turns them off again
+_metrics_from_env = os.environ.get("SETUAAYU_METRICS") == "1"
+_rerun_start = time.perf_counter()
+instrumentation.enable(_metrics_from_env or bool(st.session_state.get("timing_panel")))
+if st.session_state.get("timing_panel"):
+    instrumentation.start_trace()
+
 # Page Config
 st.set_page_config(
     page_title="SetuAayu - Bridge Digital Twin",
@@ -14,21 +22,138 @@ st.set_page_config(
 )
 
 import streamlit.components.v1 as components
-
-def get_bridge_viewer_html(data):
+from urllib.parse import urlencode
+from asset_registry import get_registry
+from inference import get_model, predict_batch
+from anomaly import (HEALTH_CRITICAL, HEALTH_WARNING, TILT_LIMIT_DEG, TRAFFIC_LIMIT_PCU, VIBRATION_LIMIT_G,
+                     check_thresholds)
+from viewer import read_template, render_viewer_html
+from twin_stream import DEFAULT_PORT as TWIN_STREAM_PORT
+
+ROLLUPS_DIR = "rollups"
+HISTORY_WIDTH_PX = 1000 # Chart width the rollup resolution is picked for
+HISTORY_RANGES = {"Last 1 h": 1, "Last 24 h": 24, "Last 7 days": 24 * 7, "All": None}
+
+# Fast mode skips the artificial "demo" delays on the interactive path
+FAST_MODE_DEFAULT = os.environ.get("SETUAAYU_FAST_MODE") == "1"
+
+def demo_delay(seconds):
+    if not st.session_state.get("fast_mode", FAST_MODE_DEFAULT):
+        time.sleep(seconds)
+
+@st.cache_data(show_spinner=False)
+def load_viewer_template():
+    # Read once per server process instead of on every rerun
+    return read_template()
+
+def load_model():
+    # Not st-cached: inference.py keeps the model keyed on the file's mtime, so a model
+    # trained after the dashboard started is picked up on the next rerun
     try:
-        with open("bridge_viewer_template.html", "r") as f:
-            html_template = f.read()
+        get_model()
+        return True
     except FileNotFoundError:
-        return "<div>Template not found</div>"
-    
-    # Simple template injection
-    html_content = html_template.replace("{{VIB_X}}", str(data['vibration_x']))\
-                                .replace("{{VIB_Y}}", str(data['vibration_y']))\
-                                .replace("{{VIB_Z}}", str(data['vibration_z']))\
-                                .replace("{{STRESS}}", str(data['strain']))\
-                                .replace("{{TILT}}", str(data['tilt']))
-    return html_content
+        return False
+
+@st.cache_resource(show_spinner=False)
+def start_twin_stream():
+    # One WebSocket stream server per Streamlit process (see twin_stream.py); its live feed
+    # also drives the metric cards, so the 3D twin and the cards show the same stream
+    from twin_stream import LiveFeed, start_in_thread
+    feed = LiveFeed()
+    try:
+        start_in_thread(port=TWIN_STREAM_PORT, source=feed)
+    except OSError:
+        pass # Port already served (e.g. a standalone twin_stream.py)
+    return TWIN_STREAM_PORT, feed
+
+@st.cache_resource(show_spinner=False)
+def load_report_template():
+    from audit_reports import ReportTemplate
+    return ReportTemplate()
+
+@st.cache_resource(show_spinner=False)
+def get_llm_runner():
+    # One async LLM client per process (llm_analysis.py): shared rate limit, cache and coalescing
+    from llm_analysis import CACHE_DIR, BackgroundRunner, ResponseCache
+    return BackgroundRunner(cache=ResponseCache(CACHE_DIR))
+
+@st.cache_resource(show_spinner=False)
+def get_image_cache():
+    # Content-addressed photo cache with thumbnails (image_cache.py); misses download in the background
+    from image_cache import ImageCache
+    return ImageCache()
+
+@st.cache_resource(show_spinner=False)
+def load_crack_model():
+    from crack_detection import CrackModel
+    try:
+        return CrackModel.load()
+    except FileNotFoundError:
+        return None
+
+def cached_image(url, width):
+    # Never blocks on the image host: until the local thumbnail exists the browser loads the URL itself
+    return get_image_cache().thumbnail_for_url(url, width) or url
+
+@st.cache_data(show_spinner=False, ttl=60)
+def load_history(location_id, hours, width_px):
+    # Rollups (rollups.py) keep every chart at <= ~width_px points whatever the range
+    from rollups import RollupStore
+    rollups = RollupStore(ROLLUPS_DIR)
+    bounds = rollups.bounds(location_id)
+    if bounds is None:
+        return None, None
+    end = bounds[1]
+    start = max(bounds[0], end - pd.Timedelta(hours=hours)) if hours else bounds[0]
+    return rollups.query_range(location_id, start, end, width_px)
+
+@st.cache_resource(show_spinner=False)
+def start_forecast_refresher():
+    # Remaining-life trends (forecasting.py) are refreshed off the render path, one thread per process
+    from forecasting import refresh_in_thread
+    return refresh_in_thread()
+
+@st.cache_data(show_spinner=False, ttl=300)
+def load_forecasts():
+    # Reads the saved trend statistics only; start_forecast_refresher folds in new telemetry
+    from forecasting import METRICS, DegradationForecaster, format_window
+    try:
+        forecaster = DegradationForecaster.load()
+    except (FileNotFoundError, ValueError):
+        return None
+    if not forecaster.ids:
+        return None
+    table = forecaster.forecast().set_index("bridge_id")
+    table["window"] = [format_window(*row) for row in
+                       table[["remaining_days", "remaining_low", "remaining_high"]].itertuples(index=False)]
+    health = METRICS.index("health_score")
+    for days in (90, 365):
+        value, low, high = forecaster.project(days)
+        table[f"health_{days}d"], table[f"health_{days}d_low"], table[f"health_{days}d_high"] = \
+            (x[:, health].clip(0, 100) for x in (value, low, high)) # Health is a 0-100 score
+    return table
+
+def health_outlook(forecast, days, worse, better):
+    # Report line from the projected health trend, or None without enough history
+    if forecast is None or pd.isna(forecast[f"health_{days}d"]):
+        return None
+    value, low, high = forecast[f"health_{days}d"], forecast[f"health_{days}d_low"], forecast[f"health_{days}d_high"]
+    outlook = worse if low < HEALTH_CRITICAL else better
+    return f"Projected health {value:.0f}/100 (90% interval {low:.0f}-{high:.0f}). {outlook}"
+
+@st.cache_resource(show_spinner=False)
+def start_metrics_endpoint():
+    # The dashboard has no HTTP route of its own, so /metrics gets a small side server
+    try:
+        instrumentation.serve_in_thread(port=instrumentation.METRICS_PORT)
+    except OSError:
+        pass # Port already served by another dashboard process
+    return instrumentation.METRICS_PORT
+
+def get_bridge_viewer_html(data, stream_port=None, stream_query=""):
+    # Single-pass template injection (viewer.py)
+    return render_viewer_html(load_viewer_template(), data, stream_port, stream_query)
 
 # Custom CSS for aesthetics (as per instructions)
 st.markdown("""
@@ -104,6 +229,9 @@ st.markdown("### Real-time Structural Health Monitoring & AI Analysis")
 
 # Sidebar
 st.sidebar.header("Control Panel")
+st.sidebar.toggle("⚡ Fast mode (skip demo delays)", value=FAST_MODE_DEFAULT, key="fast_mode")
+st.sidebar.toggle("⏱️ Timing panel", value=_metrics_from_env, key="timing_panel",
+                  help="Per-rerun timings of model load, inference, simulation and HTML rendering")
 
 # --- Asset Onboarding (Image to 3D) ---
 uploaded_file = st.sidebar.file_uploader("Upload Architecture / Bridge Image", type=['jpg', 'png', 'jpeg'])
@@ -112,13 +240,13 @@ model_ready = False
 if uploaded_file is not None:
     st.sidebar.image(uploaded_file, caption="Source Image", use_container_width=True)
     
-    if "reconstruction_done" not in st.session_state:
+    if "reconstruction_done" not in st.session_state and not st.session_state["fast_mode"]:
         # Simulation of complex 3D reconstruction
         progress_text = "Initializing Photogrammetry Engine..."
         my_bar = st.sidebar.progress(0, text=progress_text)
         
         for percent_complete in range(100):
-            time.sleep(0.03) # Simulation delay
+            time.sleep(0.03) # Simulation delay (skipped entirely in fast mode)
             if percent_complete < 30:
                 my_bar.progress(percent_complete + 1, text="Initializing Photogrammetry Engine...")
             elif percent_complete < 60:
@@ -128,7 +256,7 @@ if uploaded_file is not None:
             
         time.sleep(0.5)
         my_bar.empty()
-        st.session_state["reconstruction_done"] = True
+    st.session_state["reconstruction_done"] = True
     
     st.sidebar.success("✅ 3D Model Generated from Image")
     model_ready = True
@@ -138,27 +266,18 @@ else:
 simulation_mode = st.sidebar.radio("Simulation Mode", ["Normal", "Critical"])
 
 # --- Location Selector ---
-# Define locations list here or import it (defining here for simplicity and UI control)
-blr_locations = [
-    "Silk Board Junction Flyover",
-    "Hebbal Flyover Service Rd",
-    "KR Puram Suspension Bridge",
-    "Domlur Flyover",
-    "Yeshwanthpur Railway Overbridge",
-    "Madiwala Underpass"
-]
-
-# Real-world images for "Web Scraping" simulation
-bridge_images = {
-    "Silk Board Junction Flyover": "https://upload.wikimedia.org/wikipedia/commons/thumb/d/d1/Silk_board_junction.jpg/1024px-Silk_board_junction.jpg",
-    "Hebbal Flyover Service Rd": "https://upload.wikimedia.org/wikipedia/commons/4/42/Hebbal_Flyover_Bangalore.jpg",
-    "KR Puram Suspension Bridge": "https://upload.wikimedia.org/wikipedia/commons/thumb/6/67/K_R_Puram_Bridge.jpg/1200px-K_R_Puram_Bridge.jpg",
-    "Domlur Flyover": "https://upload.wikimedia.org/wikipedia/commons/9/9f/Domlur_Flyover.jpg",
-    "Yeshwanthpur Railway Overbridge": "https://cf.bstatic.com/xdata/images/hotel/max1024x768/498114811.jpg?k=20f5c184478144214f4e38e670404439c28929ac747445c73860070119293673&o=&hp=1",
-    "Madiwala Underpass": "https://content.jdmagicbox.com/comp/bangalore/48/080p5005948/catalogue/madiwala-underpass-madiwala-bangalore-bridge-construction-contractors-3p9f5.jpg"
-}
-
-selected_location = st.sidebar.selectbox("Select Bridge Location", blr_locations)
+# Every bridge, its reference image and its telemetry ID come from the asset registry (asset_registry.py)
+registry = get_registry() # Parsed once per process, reloaded only if bridge_assets.csv changes
+selected_asset_id = st.sidebar.selectbox("Select Bridge Location", registry.ids,
+                                         format_func=lambda asset_id: registry.get(asset_id).name)
+selected_asset = registry.get(selected_asset_id)
+selected_location = selected_asset.name
+
+# Live metrics refresh on their own timer without rerunning the whole page
+refresh_s = st.sidebar.select_slider("Live refresh interval (s)", options=[0, 1, 2, 5, 10], value=2,
+                                     help="0 = refresh only on interaction")
+live_twin = st.sidebar.toggle("📡 Live 3D twin stream", value=True,
+                              help="Stream 10 Hz values into the 3D viewer over a local WebSocket")
 
 # --- Web Scraping & Twin Generation Module ---
 st.sidebar.markdown("---")
@@ -170,11 +289,11 @@ scraped_image_url = None
 if scrape_btn:
     with st.sidebar.status("Running OSINT Crawlers...", expanded=True) as status:
         st.write("🕷️ Spawning bots on Google Images...")
-        time.sleep(1)
+        demo_delay(1)
         st.write(f"📂 Found 14 historical images for '{selected_location}'")
-        time.sleep(0.8)
+        demo_delay(0.8)
         st.write("📐 Triangulating Photogrammetry Points...")
-        time.sleep(1.2)
+        demo_delay(1.2)
         st.write("🧊 Constructing 3D Mesh...")
         status.update(label="✅ Digital Twin Ready", state="complete", expanded=False)
     
@@ -183,8 +302,8 @@ if scrape_btn:
     
 if st.session_state.get('scraped_active'):
     # Show the "Scraped" image
-    st.sidebar.image(bridge_images.get(selected_location, "https://via.placeholder.com/300"), caption=f"Reference: {selected_location}", use_container_width=True)
-    scraped_image_url = bridge_images.get(selected_location)
+    st.sidebar.image(cached_image(selected_asset.image_url, 300) if selected_asset.image_url else "https://via.placeholder.com/300", caption=f"Reference: {selected_location}", use_container_width=True)
+    scraped_image_url = selected_asset.image_url or None
     model_ready = True # Enable the Twin view
 
 # Main Content - Live Metrics
@@ -192,77 +311,97 @@ st.markdown("---")
 # Header with Location
 st.subheader(f"📍 Live Sensor Telemetry: {selected_location}")
 st.caption(f"Asset ID: {'TWIN-GEN-001' if st.session_state.get('scraped_active') else 'BLR-CIVIC-8842'} | Monitoring Node: Active")
+start_forecast_refresher()
 
-# Generate Data
-data_dict = generate_bridge_data(scenario=simulation_mode.lower(), location_name=selected_location) 
-
-col1, col2, col3, col4 = st.columns(4)
-
-with col1:
-    st.markdown(f"""
-        <div class="metric-card">
-            <h3>Vibration (g)</h3>
-            <p style="font-size: 18px; color: {'#ff4b4b' if data_dict['vibration_x'] > 0.3 else '#00cc66'}">
-                x: {data_dict['vibration_x']}<br>
-                y: {data_dict['vibration_y']}<br>
-                z: {data_dict['vibration_z']}
-            </p>
-        </div>
-    """, unsafe_allow_html=True)
-
-with col2:
-    st.markdown(f"""
-        <div class="metric-card">
-            <h3>Stress (MPa)</h3>
-            <p style="font-size: 32px; font-weight: bold; color: #3399ff">
-                {data_dict['stress_mpa']}
-            </p>
-            <span style="font-size:12px; color:#888">Legacy Strain: {data_dict['strain']}µε</span>
-        </div>
-    """, unsafe_allow_html=True)
-
-with col3:
-    st.markdown(f"""
-        <div class="metric-card">
-            <h3>Tilt (°)</h3>
-            <p style="font-size: 32px; font-weight: bold; color: {'#ff4b4b' if abs(data_dict['tilt']) > 2.0 else '#00cc66'}">
-                {data_dict['tilt']}
-            </p>
-        </div>
-    """, unsafe_allow_html=True)
+def render_live_metrics():
+    # Generate Data (the latest reading is shared with the rest of the page via session state)
+    if live_twin:
+        data_dict = start_twin_stream()[1](selected_location, simulation_mode.lower())
+    else:
+        data_dict = generate_bridge_data(scenario=simulation_mode.lower(), location_name=selected_location)
+    forecasts = load_forecasts()
+    if forecasts is not None and selected_asset_id in forecasts.index:
+        # Trend-based remaining life replaces the simulator's scenario label
+        data_dict["prediction_window"] = forecasts.loc[selected_asset_id, "window"]
+    st.session_state["latest_reading"] = data_dict
+
+    col1, col2, col3, col4 = st.columns(4)
+
+    with col1:
+        st.markdown(f"""
+            <div class="metric-card">
+                <h3>Vibration (g)</h3>
+                <p style="font-size: 18px; color: {'#ff4b4b' if data_dict['vibration_x'] > VIBRATION_LIMIT_G else '#00cc66'}">
+                    x: {data_dict['vibration_x']}<br>
+                    y: {data_dict['vibration_y']}<br>
+                    z: {data_dict['vibration_z']}
+                </p>
+            </div>
+        """, unsafe_allow_html=True)
+
+    with col2:
+        st.markdown(f"""
+            <div class="metric-card">
+                <h3>Stress (MPa)</h3>
+                <p style="font-size: 32px; font-weight: bold; color: #3399ff">
+                    {data_dict['stress_mpa']}
+                </p>
+                <span style="font-size:12px; color:#888">Legacy Strain: {data_dict['strain']}µε</span>
+            </div>
+        """, unsafe_allow_html=True)
+
+    with col3:
+        st.markdown(f"""
+            <div class="metric-card">
+                <h3>Tilt (°)</h3>
+                <p style="font-size: 32px; font-weight: bold; color: {'#ff4b4b' if abs(data_dict['tilt']) > TILT_LIMIT_DEG else '#00cc66'}">
+                    {data_dict['tilt']}
+                </p>
+            </div>
+        """, unsafe_allow_html=True)
     
-with col4:
+    with col4:
+        st.markdown(f"""
+            <div class="metric-card">
+                <h3>Traffic (PCU/hr)</h3>
+                <p style="font-size: 32px; font-weight: bold; color: {'#ff4b4b' if data_dict['traffic_load'] > TRAFFIC_LIMIT_PCU else '#ffa500'}">
+                    {data_dict['traffic_load']}
+                </p>
+            </div>
+        """, unsafe_allow_html=True)
+
+    # --- Structural Health Score ---
+    st.markdown("### 🏥 Structural Health Score")
+    health_color = "#00cc66" # Green
+    if data_dict['health_score'] < HEALTH_CRITICAL: health_color = "#ff4b4b" # Red
+    elif data_dict['health_score'] < HEALTH_WARNING: health_color = "#ffa500" # Orange
+
     st.markdown(f"""
-        <div class="metric-card">
-            <h3>Traffic (PCU/hr)</h3>
-            <p style="font-size: 32px; font-weight: bold; color: {'#ff4b4b' if data_dict['traffic_load'] > 4000 else '#ffa500'}">
-                {data_dict['traffic_load']}
-            </p>
+        <div style="background-color: rgba(255,255,255,0.05); padding: 20px; border-radius: 15px; text-align: center; border: 2px solid {health_color}; margin-bottom: 20px;">
+            <h2 style="color: #e0e0e0; margin: 0;">OVERALL ASSET HEALTH</h2>
+            <h1 style="font-size: 80px; margin: 0; color: {health_color}; text-shadow: 0 0 20px {health_color};">
+                {data_dict['health_score']}%
+            </h1>
+            <p style="color: #aaa;">Predicted Failure Window: <span style="color: #fff; font-weight: bold;">{data_dict['prediction_window']}</span></p>
         </div>
     """, unsafe_allow_html=True)
 
-# --- Structural Health Score ---
-st.markdown("### 🏥 Structural Health Score")
-health_color = "#00cc66" # Green
-if data_dict['health_score'] < 70: health_color = "#ff4b4b" # Red
-elif data_dict['health_score'] < 90: health_color = "#ffa500" # Orange
-
-st.markdown(f"""
-    <div style="background-color: rgba(255,255,255,0.05); padding: 20px; border-radius: 15px; text-align: center; border: 2px solid {health_color}; margin-bottom: 20px;">
-        <h2 style="color: #e0e0e0; margin: 0;">OVERALL ASSET HEALTH</h2>
-        <h1 style="font-size: 80px; margin: 0; color: {health_color}; text-shadow: 0 0 20px {health_color};">
-            {data_dict['health_score']}%
-        </h1>
-        <p style="color: #aaa;">Predicted Failure Window: <span style="color: #fff; font-weight: bold;">{data_dict['prediction_window']}</span></p>
-    </div>
-""", unsafe_allow_html=True)
+st.fragment(run_every=refresh_s or None)(render_live_metrics)()
+data_dict = st.session_state["latest_reading"]
 
 col_twin, col_drone = st.columns([2, 1])
 
 with col_twin:
     # --- 3D Digital Twin Visualizer ---
     st.markdown(f"### 🧊 3D Digital Twin ({'Custom Model' if model_ready else 'Live IoT'})")
-    html_3d = get_bridge_viewer_html(data_dict)
+    if live_twin:
+        # Loaded once per location/mode; values then arrive over the WebSocket,
+        # so reruns do not reload Three.js or rebuild the scene
+        idle = {'vibration_x': 0, 'vibration_y': 0, 'vibration_z': 0, 'strain': 0, 'tilt': 0}
+        query = urlencode({"location": selected_location, "scenario": simulation_mode.lower()})
+        html_3d = get_bridge_viewer_html(idle, stream_port=start_twin_stream()[0], stream_query=query)
+    else:
+        html_3d = get_bridge_viewer_html(data_dict)
     components.html(html_3d, height=450)
     
 with col_drone:
@@ -274,39 +413,126 @@ with col_drone:
     caption_text = "LiDAR Depth Map - Default"
     
     # Check if we have a specific image for this location
-    location_img_url = bridge_images.get(selected_location)
+    location_img_url = selected_asset.image_url or None
 
+    inspection_bytes = None # Full-resolution image for the crack-detection pipeline
+    upload_failed = False
     if model_ready and uploaded_file is not None:
-        display_img = uploaded_file
-        caption_text = f"User Upload: {uploaded_file.name}"
-        st.info(f"Analyzing: {uploaded_file.name}")
+        try:
+            sha = get_image_cache().put(uploaded_file.getvalue())
+        except OSError: # PIL's UnidentifiedImageError included
+            st.error(f"❌ '{uploaded_file.name}' is not a readable image")
+            upload_failed = True
+        else:
+            inspection_bytes = uploaded_file.getvalue()
+            display_img = get_image_cache().thumb_path(sha, 600)
+            caption_text = f"User Upload: {uploaded_file.name}"
+            st.info(f"Analyzing: {uploaded_file.name}")
     elif location_img_url:
-        display_img = location_img_url
+        display_img = cached_image(location_img_url, 600)
         caption_text = f"Asset Reference: {selected_location}"
+        original = get_image_cache().original_for_url(location_img_url)
+        if original:
+            with open(original, "rb") as f:
+                inspection_bytes = f.read()
         # Only show analyzing text if we are 'analyzing' (simulated)
         if st.session_state.get('scraped_active'):
              st.info(f"Analyzing Web Data for: {selected_location}")
-        
+
+    # Tiled crack detection (crack_detection.py), cached per image hash so reruns are one file read
+    crack_model = load_crack_model()
+    inspection = None
+    if inspection_bytes and crack_model is not None:
+        from crack_detection import cached_overlay, inspect_image
+        with instrumentation.timer("crack_detection_seconds", "Crack inspection incl. result cache"):
+            inspection = inspect_image(inspection_bytes, crack_model)
+
+    if inspection and inspection["verdict"] == "crack":
+        display_img = cached_overlay(inspection_bytes, inspection)
+        caption_text += " | flagged tiles in red"
     st.image(display_img, caption=caption_text, use_container_width=True)
 
-    if simulation_mode == "Critical":
-        st.error(f"⚠️ Vision AI: Structural Defects Detected ({data_dict['defect_type']})")
+    if inspection is None:
+        if crack_model is None:
+            st.warning("Vision AI: crack model not trained (run `python crack_detection.py train`)")
+        elif not upload_failed and (location_img_url or uploaded_file is not None):
+            st.info("⏳ Vision AI: image is downloading to the local cache, inspection pending")
+        else:
+            st.info("Vision AI: upload an inspection image to scan for cracks")
+    elif inspection["verdict"] == "crack":
+        st.error(f"⚠️ Vision AI: Possible cracking in {inspection['crack_tiles']} of "
+                 f"{inspection['rows'] * inspection['cols']} tiles (max score {inspection['max_score']:.2f})")
     else:
-        st.success("✅ Vision AI: No Surface Defects Found")
+        st.success(f"✅ Vision AI: No Surface Defects Found ({inspection['rows'] * inspection['cols']} tiles scanned)")
+
+st.markdown("---")
+
+# --- SENSOR HISTORY (pre-aggregated rollups) ---
+st.markdown("### 📈 Sensor History")
+history_locations = []
+if os.path.isdir(ROLLUPS_DIR):
+    from rollups import RollupStore
+    history_locations = RollupStore(ROLLUPS_DIR).locations()
+if not history_locations:
+    st.info("No rollups yet. Run `python rollups.py backfill bridge_data.csv synthetic_bridge.csv` "
+            "or `python fleet_sim.py --rollups rollups`.")
+else:
+    col_loc, col_range, col_sensor = st.columns(3)
+    # Partitions written before the registry are name slugs; they still resolve to their asset
+    history_assets = [registry.resolve_id(location, location) for location in history_locations]
+    history_location = col_loc.selectbox(
+        "Bridge", history_locations, format_func=registry.display_name,
+        index=history_assets.index(selected_asset_id) if selected_asset_id in history_assets else 0)
+    history_range = col_range.selectbox("Range", list(HISTORY_RANGES), index=len(HISTORY_RANGES) - 1)
+    history_sensor = col_sensor.selectbox("Sensor", ["strain", "vibration_x", "vibration_y", "vibration_z", "tilt"])
+    history, resolution = load_history(history_location, HISTORY_RANGES[history_range], HISTORY_WIDTH_PX)
+    if history is None or history.empty:
+        st.info("No history for this bridge in the selected range.")
+    else:
+        import plotly.graph_objects as go
+        fig = go.Figure([
+            go.Scatter(x=history["timestamp"], y=history[f"{history_sensor}_max"], line=dict(width=0),
+                       showlegend=False, hoverinfo="skip"),
+            go.Scatter(x=history["timestamp"], y=history[f"{history_sensor}_min"], line=dict(width=0),
+                       fill="tonexty", fillcolor="rgba(0, 210, 255, 0.2)", name="min / max"),
+            go.Scatter(x=history["timestamp"], y=history[f"{history_sensor}_mean"], line=dict(color="#00d2ff"),
+                       name="mean"),
+            go.Scatter(x=history["timestamp"], y=history[f"{history_sensor}_rms"], line=dict(color="#ffa500", dash="dot"),
+                       name="RMS"),
+        ])
+        fig.update_layout(template="plotly_dark", height=320, margin=dict(l=10, r=10, t=30, b=10),
+                          title=f"{history_sensor} · {resolution} buckets · {len(history):,} points")
+        st.plotly_chart(fig, use_container_width=True)
 
 st.markdown("---")
 
 from datetime import datetime
 # --- REPORT GENERATION ---
-if st.button("📄 Generate Safety Audit Report"):
+report_requested = st.button("📄 Generate Safety Audit Report")
+if report_requested and history_locations:
+    # Statistics over the stored history shown above (audit_reports.py; fleet-wide: `python audit_reports.py run`)
+    from audit_reports import render_report
+    rollups = RollupStore(ROLLUPS_DIR)
+    bounds = rollups.bounds(history_location)
+    hours = HISTORY_RANGES[history_range]
+    start = max(bounds[0], bounds[1] - pd.Timedelta(hours=hours)) if bounds and hours else None
+    report_text, _ = render_report(rollups, load_report_template(), history_location, start)
+    if report_text is None:
+        st.info("No history for this bridge in the selected range.")
+    else:
+        st.markdown(report_text)
+        st.download_button("Download Report (Markdown)", report_text, file_name=f"Report_{history_location}.md")
+elif report_requested:
     with st.spinner("Compiling Engineering Report..."):
-        time.sleep(1.5)
+        demo_delay(1.5)
+        forecasts = load_forecasts()
+        forecast = forecasts.loc[selected_asset_id] if forecasts is not None and selected_asset_id in forecasts.index else None
         
         report_text = f"""
         # 🌉 SetuAayu STRUCTURAL SAFETY AUDIT REPORT
         **Date:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
         **Asset:** {selected_location}
-        **Asset ID:** BLR-CIVIC-8842-TWIN
+        **Asset ID:** {selected_asset_id}
         
         ---
         ## 1. TELEMETRY SUMMARY
@@ -316,17 +542,17 @@ if st.button("📄 Generate Safety Audit Report"):
         
         ## 2. AI SAFETY ASSESSMENT
         - **Health Score:** {data_dict['health_score']}/100
-        - **Condition:** {'CRITICAL' if data_dict['health_score'] < 70 else 'OPTIMAL'}
+        - **Condition:** {'CRITICAL' if data_dict['health_score'] < HEALTH_CRITICAL else 'OPTIMAL'}
         - **Predicted Failure Window:** {data_dict['prediction_window']}
         
         ## 3. FUTURE CONDITION PREDICTION (AI PROJECTION)
         Based on current stress accumulation of {data_dict['stress_mpa']} MPa/hr and traffic patterns:
-        - **3 Months:** {'Micro-fissures likely in Sector 4' if data_dict['health_score'] < 80 else 'No significant degradation expected.'}
-        - **1 Year:** {'Major rehabilitation required.' if data_dict['health_score'] < 60 else 'Routine maintenance sufficient.'}
+        - **3 Months:** {health_outlook(forecast, 90, 'Micro-fissures likely in Sector 4', 'No significant degradation expected.') or ('Micro-fissures likely in Sector 4' if data_dict['health_score'] < 80 else 'No significant degradation expected.')}
+        - **1 Year:** {health_outlook(forecast, 365, 'Major rehabilitation required.', 'Routine maintenance sufficient.') or ('Major rehabilitation required.' if data_dict['health_score'] < 60 else 'Routine maintenance sufficient.')}
         
         ## 4. RECOMMENDATIONS
         1. {'Reduce traffic load immediately' if data_dict['traffic_load'] > 5000 else 'Maintain current traffic flow.'}
-        2. {'Schedule NDT (Non-Destructive Testing) this week' if data_dict['health_score'] < 70 else 'Next inspection due in 6 months.'}
+        2. {'Schedule NDT (Non-Destructive Testing) this week' if data_dict['health_score'] < HEALTH_CRITICAL else 'Next inspection due in 6 months.'}
         
         *Generated by SetuAayu AI Engine v1.0*
         """
@@ -334,20 +560,11 @@ if st.button("📄 Generate Safety Audit Report"):
         st.text_area("Report Preview", report_text, height=400)
         st.download_button("Download Report (PDF)", report_text, file_name=f"Report_{selected_location.replace(' ', '_')}.txt")
 
-import pickle
-import numpy as np
-
-# Load ML Model
-try:
-    with open("model.pkl", "rb") as f:
-        ml_model = pickle.load(f)
-    model_loaded = True
-except FileNotFoundError:
-    model_loaded = False
+# Load ML Model (cached per process, reloaded only when the model file changes)
+model_loaded = load_model()
 
 # ... [Previous imports mostly ok, just ensuring location] ...
-from openai import OpenAI
-from bridge_sim import generate_bridge_data
+# (openai is imported lazily via llm_analysis.py: it adds ~0.5 s to a cold start and is only needed with an API key)
 
 # [Skipping to Analysis Section logic substitution]
 
@@ -358,25 +575,28 @@ if st.button("Run AI Analysis"):
         
         # Priority 1: OpenAI (if key exists)
         if api_key:
-             # ... [Keep existing OpenAI logic] ...
-             pass
+            from llm_analysis import LLMError
+            runner = get_llm_runner()
+            try:
+                analysis = runner.analyze(data_dict)
+            except (LLMError, TimeoutError) as e:
+                st.error(f"AI analysis unavailable: {e}")
+            else:
+                client = runner.client
+                st.success(f"Analysis Complete (OpenAI `{client.model}`)")
+                st.markdown(analysis)
+                st.caption(f"Running in 'LLM' Mode: {client.stats['api_calls']} API call(s) for "
+                           f"{client.stats['requests']} analyses in this dashboard process "
+                           f"(cache hit rate {client.hit_rate():.0%}).")
         
         # Priority 2: Trained ML Model (if file exists and no API key)
         elif model_loaded:
-            time.sleep(1.0) # UX delay
-            
-            # Prepare Input Vector
-            input_data = np.array([[
-                data_dict['vibration_x'],
-                data_dict['vibration_y'], 
-                data_dict['vibration_z'],
-                data_dict['strain'],
-                data_dict['tilt']
-            ]])
+            demo_delay(1.0) # UX delay
             
-            # Predict
-            prediction = ml_model.predict(input_data)[0] # 0 = Normal, 1 = Critical
-            probs = ml_model.predict_proba(input_data)[0]
+            # Predict (labels and probabilities from a single pass)
+            labels, probs = predict_batch(data_dict)
+            prediction = labels[0] # 0 = Normal, 1 = Critical
+            probs = probs[0]
             confidence = max(probs) * 100
             
             st.success(f"Analysis Complete (Random Forest Model | Confidence: {confidence:.2f}%)")
@@ -397,11 +617,29 @@ if st.button("Run AI Analysis"):
 
         # Priority 3: Rule-Based Fallback (if no model and no API key)
         else:
-             # ... [Keep fallback rule logic] ...
             st.warning("Model not found. Falling back to Rule-Based Engine.")
-            vib_max = max(data_dict['vibration_x'], data_dict['vibration_y'], data_dict['vibration_z'])
-            # [Existing logic follows...]
+            # Same static limits as the anomaly engine (anomaly.py)
+            violations = check_thresholds(data_dict)
+            if violations:
+                st.error(f"**CRITICAL ALERT**: {len(violations)} engineering limit(s) exceeded.")
+                for field, value, limit in violations:
+                    st.markdown(f"- **{field}**: {value} (limit {limit})")
+            else:
+                st.success("**STATUS OPTIMAL**: All readings within engineering limits.")
+            st.caption("Running in 'Rule-Based' Mode: static limits from `anomaly.py`.")
 
 # Add a footer
 st.markdown("---")
 st.caption("SetuAayu v1.0 | Hackathon Build | Built with Streamlit & OpenAI")
+
+# --- Timing Panel ---
+instrumentation.record("app_rerun_seconds", time.perf_counter() - _rerun_start, "Full Streamlit script reruns")
+if st.session_state.get("timing_panel"):
+    spans = instrumentation.end_trace()
+    with st.sidebar.expander("⏱️ This rerun", expanded=True):
+        st.dataframe(pd.DataFrame([(name, round(seconds * 1000, 2)) for name, seconds in spans],
+                                  columns=["step", "ms"]), hide_index=True)
+        totals = instrumentation.summary()
+        st.caption(" | ".join(f"{name}: {count} calls, {total / count * 1000:.2f} ms avg"
+                              for name, (count, total) in sorted(totals.items()) if count))
+        st.caption(f"Prometheus metrics: http://localhost:{start_metrics_endpoint()}/metrics")
@@ -0,0 +1,347 @@
+"""
+SetuAayu Asset Registry
+
+The single list of monitored bridges, loaded once from `bridge_assets.csv`:
+asset ID, display name (plus aliases used by older datasets), coordinates,
+structure type, sensor node IDs and reference image.
+
+* Lookups: O(1) dicts on asset ID, name, alias and sensor node ID,
+  case- and punctuation-insensitive ("BLR_SB_01", "Silk Board Flyover,
+  Bangalore" and the store slug "SILK_BOARD_JUNCTION_FLYOVER" all resolve to
+  the same asset).
+* Spatial index: a KD-tree on unit-sphere coordinates for "within X km" and
+  k-nearest queries, and a latitude-sorted index for bounding boxes, so both
+  stay logarithmic at tens of thousands of assets.
+
+`get_registry()` caches the parsed file per process and reloads it only when
+the file changes (same scheme as the model cache in inference.py). The
+simulator, the dashboard selector and the telemetry store / rollup
+partitioning all key on it.
+
+Usage:
+    python asset_registry.py list
+    python asset_registry.py near --lat 12.93 --lon 77.62 --km 5
+    python asset_registry.py bench --assets 50000
+"""
+import argparse
+import csv
+import os
+import re
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+REGISTRY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bridge_assets.csv")
+EARTH_RADIUS_KM = 6371.0088
+LIST_SEPARATOR = "|" # Between node IDs in the CSV
+RECHECK_S = 1.0 # How often get_registry() looks at the file's mtime
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def _normalize(key):
+    """Lookup form of an ID / name: lowercase alphanumerics separated by single spaces."""
+    return re.sub(r"[^a-z0-9]+", " ", str(key).casefold()).strip()
+
+
+def _unit_vectors(lat, lon):
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance (km); broadcasts over arrays."""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class Asset:
+    """One monitored structure."""
+
+    __slots__ = ("asset_id", "name", "aliases", "lat", "lon", "structure_type", "nodes", "image_url")
+
+    def __init__(self, asset_id, name, lat, lon, structure_type="", nodes=(), aliases=(), image_url=""):
+        self.asset_id = asset_id
+        self.name = name
+        self.lat = float(lat)
+        self.lon = float(lon)
+        self.structure_type = structure_type
+        self.nodes = tuple(nodes)
+        self.aliases = tuple(aliases)
+        self.image_url = image_url
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def __repr__(self):
+        return f"Asset({self.asset_id!r}, {self.name!r})"
+
+
+class BridgeRegistry:
+    """
+    Indexed collection of assets.
+
+    Raises:
+        ValueError: On duplicate asset IDs, or a name / alias / node ID that
+            would resolve to two different assets.
+    """
+
+    def __init__(self, assets):
+        self.assets = list(assets)
+        self._by_id = {}
+        self._by_key = {} # Normalized ID / name / alias / node ID -> index
+        for i, asset in enumerate(self.assets):
+            if asset.asset_id in self._by_id:
+                raise ValueError(f"Duplicate asset ID {asset.asset_id!r}")
+            self._by_id[asset.asset_id] = i
+            for key in (asset.asset_id, asset.name, *asset.aliases, *asset.nodes):
+                normalized = _normalize(key)
+                if self._by_key.setdefault(normalized, i) != i:
+                    other = self.assets[self._by_key[normalized]].asset_id
+                    raise ValueError(f"{key!r} is used by both {other!r} and {asset.asset_id!r}")
+
+        self.ids = [a.asset_id for a in self.assets]
+        self.names = [a.name for a in self.assets]
+        self.lat = np.array([a.lat for a in self.assets], dtype=np.float64)
+        self.lon = np.array([a.lon for a in self.assets], dtype=np.float64)
+        self._lat_order = np.argsort(self.lat, kind="stable")
+        self._lat_sorted = self.lat[self._lat_order]
+        self._tree = None # Built on the first radius / nearest query
+
+    @classmethod
+    def load(cls, path=REGISTRY_FILE):
+        """
+        Reads a registry CSV (asset_id, name, aliases, lat, lon, structure_type,
+        nodes, image_url). Aliases and nodes are `|`-separated.
+        """
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        return cls(
+            Asset(row["asset_id"], row["name"], row["lat"], row["lon"], row.get("structure_type", ""),
+                  _split(row.get("nodes")), _split(row.get("aliases")), row.get("image_url", ""))
+            for row in rows
+        )
+
+    def save(self, path):
+        fields = list(Asset.__slots__)
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=["asset_id", "name", "aliases", "lat", "lon",
+                                                   "structure_type", "nodes", "image_url"])
+            writer.writeheader()
+            for asset in self.assets:
+                row = {field: getattr(asset, field) for field in fields}
+                row["aliases"] = LIST_SEPARATOR.join(asset.aliases)
+                row["nodes"] = LIST_SEPARATOR.join(asset.nodes)
+                writer.writerow(row)
+
+    def __len__(self):
+        return len(self.assets)
+
+    def __iter__(self):
+        return iter(self.assets)
+
+    def __contains__(self, key):
+        return self.lookup(key) is not None
+
+    # --- Lookups ---
+    def get(self, asset_id):
+        """
+        The asset with exactly this ID.
+
+        Raises:
+            KeyError: If there is no such asset.
+        """
+        return self.assets[self._by_id[asset_id]]
+
+    def lookup(self, key):
+        """Asset for an ID, name, alias or sensor node ID (case / punctuation-insensitive), or None."""
+        i = self._by_id.get(key)
+        if i is None:
+            i = self._by_key.get(_normalize(key))
+        return None if i is None else self.assets[i]
+
+    def resolve_id(self, key, default=None):
+        """Asset ID for `key` (see `lookup`), or `default` if it is not registered."""
+        asset = self.lookup(key)
+        return default if asset is None else asset.asset_id
+
+    def display_name(self, key):
+        """Registered name for an ID / alias, or the key itself."""
+        asset = self.lookup(key)
+        return str(key) if asset is None else asset.name
+
+    # --- Spatial queries ---
+    def _kdtree(self):
+        if self._tree is None:
+            from scipy.spatial import cKDTree
+            self._tree = cKDTree(_unit_vectors(self.lat, self.lon))
+        return self._tree
+
+    def within_km(self, lat, lon, km):
+        """
+        Assets within `km` (great-circle) of a point.
+
+        Returns:
+            list: (asset, distance_km), nearest first.
+        """
+        if not self.assets:
+            return []
+        chord = 2 * np.sin(min(km / EARTH_RADIUS_KM, np.pi) / 2)
+        hits = np.asarray(self._kdtree().query_ball_point(_unit_vectors(lat, lon)[0], chord), dtype=np.int64)
+        distances = haversine_km(lat, lon, self.lat[hits], self.lon[hits])
+        order = np.argsort(distances, kind="stable")
+        return [(self.assets[hits[i]], float(distances[i])) for i in order if distances[i] <= km]
+
+    def nearest(self, lat, lon, k=1):
+        """The `k` nearest assets as (asset, distance_km), nearest first."""
+        k = min(k, len(self.assets))
+        if k == 0:
+            return []
+        _, idx = self._kdtree().query(_unit_vectors(lat, lon)[0], k=k)
+        idx = np.atleast_1d(idx)
+        distances = haversine_km(lat, lon, self.lat[idx], self.lon[idx])
+        return [(self.assets[i], float(d)) for i, d in zip(idx, distances)]
+
+    def in_bbox(self, min_lat, min_lon, max_lat, max_lon):
+        """
+        Assets inside a latitude / longitude box (inclusive), in latitude order.
+
+        Raises:
+            ValueError: If a minimum is above its maximum.
+        """
+        if min_lat > max_lat or min_lon > max_lon:
+            raise ValueError("Bounding box minimum is above its maximum")
+        lo = np.searchsorted(self._lat_sorted, min_lat, side="left")
+        hi = np.searchsorted(self._lat_sorted, max_lat, side="right")
+        candidates = self._lat_order[lo:hi]
+        lon = self.lon[candidates]
+        return [self.assets[i] for i in candidates[(lon >= min_lon) & (lon <= max_lon)]]
+
+    def frame(self):
+        """All assets as a DataFrame (one row per asset, list fields joined with `|`)."""
+        df = pd.DataFrame([a.to_dict() for a in self.assets], columns=list(Asset.__slots__))
+        for column in ("aliases", "nodes"):
+            df[column] = df[column].map(LIST_SEPARATOR.join)
+        return df
+
+
+def _split(value):
+    return tuple(part.strip() for part in (value or "").split(LIST_SEPARATOR) if part.strip())
+
+
+def get_registry(path=None):
+    """
+    The process-wide registry, reloaded only if its file changed (checked at
+    most every RECHECK_S, so per-reading callers do not pay for a stat).
+
+    Raises:
+        FileNotFoundError: If the registry file does not exist.
+    """
+    path = path or REGISTRY_FILE
+    now = time.monotonic()
+    entry = _cache.get(path)
+    if entry is not None and now - entry[2] < RECHECK_S:
+        return entry[1]
+    st = os.stat(path)
+    key = (st.st_mtime_ns, st.st_size)
+    with _lock:
+        entry = _cache.get(path)
+        if entry is None or entry[0] != key:
+            entry = (key, BridgeRegistry.load(path), now)
+        else:
+            entry = (key, entry[1], now)
+        _cache[path] = entry
+        return entry[1]
+
+
+# --- Scale benchmark ---
+def synthetic_registry(n, seed=0):
+    """`n` random assets across India (for scale tests), each with 2 sensor nodes."""
+    rng = np.random.default_rng(seed)
+    lat = rng.uniform(8.0, 35.0, n)
+    lon = rng.uniform(68.0, 97.0, n)
+    types = ["flyover", "girder bridge", "cable-stayed bridge", "railway overbridge", "underpass"]
+    return BridgeRegistry(
+        Asset(f"IN_{i:06d}", f"Bridge {i:06d}", lat[i], lon[i], types[i % len(types)],
+              (f"IN_{i:06d}-N1", f"IN_{i:06d}-N2"))
+        for i in range(n)
+    )
+
+
+def benchmark(n_assets=50_000, queries=2_000, radius_km=10.0, seed=0):
+    """
+    Registry build and query times on a synthetic registry, against a linear
+    scan for the radius query.
+
+    Returns:
+        dict: Times per operation (µs) and result sizes.
+    """
+    rng = np.random.default_rng(seed + 1)
+    start = time.perf_counter()
+    registry = synthetic_registry(n_assets, seed)
+    registry._kdtree()
+    build_s = time.perf_counter() - start
+
+    ids = [registry.ids[i] for i in rng.integers(0, n_assets, queries)]
+    names = [registry.names[i].upper().replace(" ", "_") for i in rng.integers(0, n_assets, queries)]
+    points = np.column_stack([rng.uniform(8.0, 35.0, queries), rng.uniform(68.0, 97.0, queries)])
+
+    def per_query(fn, items):
+        start = time.perf_counter()
+        out = [fn(item) for item in items]
+        return (time.perf_counter() - start) / len(items) * 1e6, out
+
+    id_us, _ = per_query(registry.get, ids)
+    name_us, _ = per_query(registry.lookup, names)
+    radius_us, hits = per_query(lambda p: registry.within_km(p[0], p[1], radius_km), points)
+    bbox_us, boxes = per_query(lambda p: registry.in_bbox(p[0] - 0.1, p[1] - 0.1, p[0] + 0.1, p[1] + 0.1), points)
+    scan_us, scans = per_query(lambda p: np.flatnonzero(haversine_km(p[0], p[1], registry.lat, registry.lon)
+                                                        <= radius_km), points[:200])
+    assert all(len(h) == len(s) for h, s in zip(hits, scans)), "KD-tree and linear scan disagree"
+    return {
+        "assets": n_assets,
+        "build_s": build_s,
+        "get_us": id_us,
+        "lookup_name_us": name_us,
+        "within_km_us": radius_us,
+        "within_km_hits": float(np.mean([len(h) for h in hits])),
+        "bbox_us": bbox_us,
+        "bbox_hits": float(np.mean([len(b) for b in boxes])),
+        "linear_scan_us": scan_us,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SetuAayu asset registry")
+    parser.add_argument("--registry", default=REGISTRY_FILE)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="Print every registered asset")
+    p_near = sub.add_parser("near", help="Assets within a radius of a point")
+    p_near.add_argument("--lat", type=float, required=True)
+    p_near.add_argument("--lon", type=float, required=True)
+    p_near.add_argument("--km", type=float, default=5.0)
+    p_bench = sub.add_parser("bench", help="Lookup and spatial query times on a synthetic registry")
+    p_bench.add_argument("--assets", type=int, default=50_000)
+    p_bench.add_argument("--radius-km", type=float, default=10.0)
+    args = parser.parse_args()
+
+    if args.command == "list":
+        with pd.option_context("display.max_rows", None, "display.width", 200, "display.max_colwidth", 40):
+            print(get_registry(args.registry).frame().drop(columns="image_url").to_string(index=False))
+    elif args.command == "near":
+        hits = get_registry(args.registry).within_km(args.lat, args.lon, args.km)
+        print(f"{len(hits)} asset(s) within {args.km} km of ({args.lat}, {args.lon}):")
+        for asset, distance in hits:
+            print(f"  {distance:6.2f} km  {asset.asset_id:<12} {asset.name} ({asset.structure_type})")
+    else:
+        r = benchmark(args.assets, radius_km=args.radius_km)
+        print(f"--- Asset registry: {r['assets']:,} assets (built + indexed in {r['build_s']:.2f}s) ---")
+        print(f"get(asset_id)        {r['get_us']:8.2f} µs")
+        print(f"lookup(name/slug)    {r['lookup_name_us']:8.2f} µs")
+        print(f"within_km({args.radius_km:g})     {r['within_km_us']:8.2f} µs  ({r['within_km_hits']:.1f} hits avg)"
+              f"  vs. linear scan {r['linear_scan_us']:.0f} µs")
+        print(f"in_bbox(0.2°)        {r['bbox_us']:8.2f} µs  ({r['bbox_hits']:.1f} hits avg)")
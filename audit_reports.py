@@ -0,0 +1,329 @@
+"""
+SetuAayu Fleet Audit Reports
+
+Generates a structural safety audit report for every bridge over a chosen
+period, from stored history instead of a single live reading:
+
+* Statistics come from the 1 h rollups (rollups.py): min / max / mean / RMS
+  per sensor, and the hours in which a limit from anomaly.py was exceeded.
+  A month is ~720 rows per bridge, however many raw readings it covered.
+* `audit_report_template.md` is parsed once per worker into literal and
+  field parts, so rendering a report is a single join.
+* Bridges are spread over a process pool; reports stream back to the parent,
+  which writes them into one zip archive (plus summary.csv) and prints
+  progress.
+* `--incremental` skips bridges whose rollup files have not changed since
+  their last report for the same period (signatures kept in state.json).
+
+Usage:
+    python audit_reports.py run                                 # all bridges, whole history
+    python audit_reports.py run --start 2025-12-01 --end 2025-12-08 --workers 8
+    python audit_reports.py run --incremental
+    python audit_reports.py bench --bridges 1000 --hours 168
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import string
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from anomaly import STRAIN_CRITICAL, STRAIN_WARNING, TILT_LIMIT_DEG, TRAFFIC_LIMIT_PCU, VIBRATION_LIMIT_G
+from bridge_sim import SENSOR_FIELDS
+from rollups import DEFAULT_ROOT as ROLLUPS_DIR
+from rollups import RollupStore
+
+TEMPLATE_PATH = "audit_report_template.md"
+OUTPUT_DIR = "audit_reports"
+STATE_FILE = "state.json"
+RESOLUTION = "1h"
+CRITICAL_HOURS_FRACTION = 0.01 # Share of hours over a critical limit that makes a bridge CRITICAL
+SUMMARY_FIELDS = ["location_id", "condition", "hours", "readings", "vibration_hours", "tilt_hours",
+                  "strain_critical_hours", "strain_max", "strain_trend"]
+
+
+class ReportTemplate:
+    """
+    A `str.format`-style template parsed once into (literal, field, spec)
+    parts, so each render skips re-parsing the text.
+
+    Raises:
+        FileNotFoundError: If the template file does not exist.
+    """
+
+    def __init__(self, path=TEMPLATE_PATH):
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        self.parts = list(string.Formatter().parse(text))
+        self.fields = {field for _, field, _, _ in self.parts if field}
+
+    def render(self, values):
+        """
+        Raises:
+            KeyError: If `values` lacks a template field.
+        """
+        out = []
+        for literal, field, spec, _ in self.parts:
+            out.append(literal)
+            if field is not None:
+                out.append(format(values[field], spec))
+        return "".join(out)
+
+
+def bridge_stats(hourly):
+    """
+    Period statistics for one bridge from its finalized 1 h rollup rows.
+
+    Returns:
+        dict: Template values (sensor aggregates, exceedance hours,
+        condition, trend), or None if the period has no data.
+    """
+    if hourly.empty:
+        return None
+    count = hourly["count"].to_numpy(dtype=np.float64)
+    total = count.sum()
+    stats = {"hours": len(hourly), "readings": int(total),
+             "period_start": f"{hourly['timestamp'].iloc[0]:%Y-%m-%d %H:%M}",
+             "period_end": f"{hourly['timestamp'].iloc[-1] + pd.Timedelta(hours=1):%Y-%m-%d %H:%M}"}
+    for field in SENSOR_FIELDS:
+        stats[f"{field}_min"] = float(hourly[f"{field}_min"].min())
+        stats[f"{field}_max"] = float(hourly[f"{field}_max"].max())
+        # Count-weighted: mean and mean square of the whole period, not of the hourly values
+        stats[f"{field}_mean"] = float((hourly[f"{field}_mean"].to_numpy() * count).sum() / total)
+        stats[f"{field}_rms"] = float(np.sqrt((hourly[f"{field}_rms"].to_numpy() ** 2 * count).sum() / total))
+
+    vibration_max = hourly[[f"vibration_{axis}_max" for axis in "xyz"]].to_numpy().max(axis=1)
+    tilt_abs = np.maximum(hourly["tilt_max"].abs().to_numpy(), hourly["tilt_min"].abs().to_numpy())
+    strain_max = hourly["strain_max"].to_numpy()
+    stats.update(
+        vibration_hours=int((vibration_max > VIBRATION_LIMIT_G).sum()),
+        tilt_hours=int((tilt_abs > TILT_LIMIT_DEG).sum()),
+        strain_critical_hours=int((strain_max > STRAIN_CRITICAL).sum()),
+        strain_warning_hours=int((strain_max > STRAIN_WARNING).sum()),
+    )
+
+    # Trend: mean strain over the last day vs. the first day (or halves of a shorter period)
+    span = min(24, max(1, len(hourly) // 2))
+    strain_mean = hourly["strain_mean"].to_numpy()
+    first, last = strain_mean[:span].mean(), strain_mean[-span:].mean()
+    stats["strain_trend"] = float((last - first) / abs(first) * 100) if first else 0.0
+
+    critical_hours = max(stats["vibration_hours"], stats["tilt_hours"], stats["strain_critical_hours"])
+    if critical_hours > CRITICAL_HOURS_FRACTION * len(hourly):
+        stats["condition"] = "CRITICAL"
+    elif critical_hours or stats["strain_warning_hours"]:
+        stats["condition"] = "WARNING"
+    else:
+        stats["condition"] = "OPTIMAL"
+    return stats
+
+
+def _recommendations(stats):
+    if stats["condition"] == "CRITICAL":
+        traffic = f"Restrict heavy vehicles (limit {TRAFFIC_LIMIT_PCU} PCU/hr) until inspected."
+        inspection = "Schedule NDT (Non-Destructive Testing) this week."
+    elif stats["condition"] == "WARNING":
+        traffic = "Maintain current traffic flow; review peak-hour loading."
+        inspection = "Bring the next inspection forward to within 30 days."
+    else:
+        traffic = "Maintain current traffic flow."
+        inspection = "Next inspection due in 6 months."
+    return {"recommendation_traffic": traffic, "recommendation_inspection": inspection}
+
+
+def render_report(rollups, template, location_id, start=None, end=None, generated_at=None):
+    """
+    Builds one bridge's report.
+
+    Returns:
+        tuple: (report text, stats dict), or (None, None) without data in the period.
+    """
+    stats = bridge_stats(rollups.query(location_id, RESOLUTION, start, end))
+    if stats is None:
+        return None, None
+    values = dict(stats, location_id=location_id,
+                  generated_at=generated_at or datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                  vibration_limit=VIBRATION_LIMIT_G, tilt_limit=TILT_LIMIT_DEG,
+                  strain_critical=STRAIN_CRITICAL, strain_warning=STRAIN_WARNING, **_recommendations(stats))
+    return template.render(values), stats
+
+
+# --- Process pool ---
+_worker = {}
+
+
+def _init_worker(rollups_root, template_path, start, end, generated_at):
+    # Store handle and parsed template are built once per worker process
+    _worker.update(rollups=RollupStore(rollups_root), template=ReportTemplate(template_path),
+                   start=start, end=end, generated_at=generated_at)
+
+
+def _report_job(location_id):
+    text, stats = render_report(_worker["rollups"], _worker["template"], location_id,
+                                _worker["start"], _worker["end"], _worker["generated_at"])
+    return location_id, text, stats
+
+
+def _period_key(start, end):
+    return f"{start or 'begin'}..{end or 'end'}"
+
+
+def load_state(output_dir=OUTPUT_DIR):
+    try:
+        with open(os.path.join(output_dir, STATE_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def generate_reports(rollups_root=ROLLUPS_DIR, output_dir=OUTPUT_DIR, start=None, end=None, workers=None,
+                     incremental=False, template_path=TEMPLATE_PATH, locations=None, progress=None):
+    """
+    Generates reports for every bridge (or `locations`) into one zip archive.
+
+    Args:
+        start, end (str or datetime): Report period (default: whole history).
+        incremental (bool): Skip bridges whose rollups did not change since
+            their last report for the same period.
+        progress (callable): Called as progress(done, total) as reports arrive.
+
+    Returns:
+        dict: archive path (None if nothing was generated), counts and elapsed seconds.
+    """
+    started = time.perf_counter()
+    rollups = RollupStore(rollups_root)
+    ReportTemplate(template_path) # Fail fast on a missing template, before starting workers
+    locations = list(locations) if locations is not None else rollups.locations(RESOLUTION)
+    period = _period_key(start, end)
+    # Always merged into, so a full run over some bridges keeps the others' entries
+    state = load_state(output_dir)
+    previous = state if incremental else {}
+
+    signatures = {location_id: rollups.signature(location_id, RESOLUTION) for location_id in locations}
+    todo = [location_id for location_id in locations
+            if previous.get(location_id) != {"period": period, "signature": signatures[location_id]}]
+    result = {"archive": None, "bridges": len(locations), "generated": 0, "skipped": len(locations) - len(todo),
+              "empty": 0, "conditions": {}}
+    if not todo:
+        result["elapsed_s"] = time.perf_counter() - started
+        return result
+
+    os.makedirs(output_dir, exist_ok=True)
+    archive = os.path.join(output_dir, f"audit_{datetime.now():%Y%m%d-%H%M%S}.zip")
+    generated_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    workers = workers or os.cpu_count()
+    # A few chunks per worker keeps IPC low and the load balanced
+    chunksize = max(1, len(todo) // (workers * 8))
+
+    summary = io.StringIO()
+    writer = csv.DictWriter(summary, fieldnames=SUMMARY_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zf, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                initargs=(rollups_root, template_path, start, end, generated_at)) as pool:
+        for done, (location_id, text, stats) in enumerate(pool.map(_report_job, todo, chunksize=chunksize), 1):
+            if text is None:
+                result["empty"] += 1
+            else:
+                zf.writestr(f"{location_id}.md", text)
+                writer.writerow({"location_id": location_id,
+                                 **{k: round(v, 3) if isinstance(v, float) else v for k, v in stats.items()}})
+                result["generated"] += 1
+                result["conditions"][stats["condition"]] = result["conditions"].get(stats["condition"], 0) + 1
+            state[location_id] = {"period": period, "signature": signatures[location_id]}
+            if progress:
+                progress(done, len(todo))
+        zf.writestr("summary.csv", summary.getvalue())
+
+    path = os.path.join(output_dir, STATE_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(state, f, indent=1)
+    os.replace(path + ".tmp", path)
+    result["archive"] = archive
+    result["elapsed_s"] = time.perf_counter() - started
+    return result
+
+
+class ProgressPrinter:
+    """`progress` callback that prints done/total and throughput at most every `interval` seconds."""
+
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self.start = time.perf_counter()
+        self.last = self.start
+
+    def __call__(self, done, total):
+        now = time.perf_counter()
+        if done == total or now - self.last >= self.interval:
+            self.last = now
+            rate = done / max(now - self.start, 1e-9)
+            print(f"\r  {done}/{total} reports ({done / total:.0%}, {rate:,.0f}/s)", end="", flush=True)
+            if done == total:
+                print()
+
+
+def benchmark(n_bridges=1000, hours=168, workers=None, seed=0):
+    """
+    Builds 1 h rollups for a simulated fleet in a temp dir and times a full
+    and an incremental run. The fleet is sampled once a minute: report cost
+    depends on the hourly rows, not on the raw sample rate.
+    """
+    from fleet_sim import FleetSimulator, block_to_frame
+
+    with tempfile.TemporaryDirectory(prefix="audit_bench_") as tmp:
+        rollups = RollupStore(os.path.join(tmp, "rollups"), resolutions={RESOLUTION: 3600})
+        sim = FleetSimulator(n_bridges, seed=seed, fs=1 / 60)
+        print(f"Simulating {n_bridges} bridges x {hours} h into 1 h rollups...")
+        for block in sim.run(hours * 3600, block_seconds=6 * 3600):
+            rollups.add(block_to_frame(block, sim.ids))
+        rollups.compact()
+
+        output = os.path.join(tmp, "reports")
+        full = generate_reports(rollups.root, output, workers=workers, progress=ProgressPrinter())
+        incremental = generate_reports(rollups.root, output, workers=workers, incremental=True)
+        return full, incremental
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SetuAayu fleet audit reports")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_run = sub.add_parser("run", help="Generate reports for every bridge into a zip archive")
+    p_run.add_argument("--rollups", default=ROLLUPS_DIR)
+    p_run.add_argument("--output", default=OUTPUT_DIR)
+    p_run.add_argument("--start", help="Period start (default: beginning of history)")
+    p_run.add_argument("--end", help="Period end, exclusive (default: end of history)")
+    p_run.add_argument("--workers", type=int, default=None, help="Process pool size (default: all cores)")
+    p_run.add_argument("--incremental", action="store_true", help="Skip bridges with no new data")
+
+    p_bench = sub.add_parser("bench", help="Time a full and an incremental run on a simulated fleet")
+    p_bench.add_argument("--bridges", type=int, default=1000)
+    p_bench.add_argument("--hours", type=int, default=168)
+    p_bench.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    def report(name, result):
+        print(f"{name}: {result['generated']} generated, {result['skipped']} skipped, {result['empty']} empty "
+              f"in {result['elapsed_s']:.2f}s {result['conditions'] or ''}")
+
+    if args.command == "run":
+        result = generate_reports(args.rollups, args.output, args.start, args.end, args.workers,
+                                  args.incremental, progress=ProgressPrinter())
+        report("Reports", result)
+        if result["archive"]:
+            print(f"✅ Archive written to '{result['archive']}'")
+        else:
+            print("✅ Nothing to do (no bridges with new data)")
+    else:
+        full, incremental = benchmark(args.bridges, args.hours, args.workers)
+        print(f"--- Audit reports, {args.bridges} bridges x {args.hours} h, {args.workers or os.cpu_count()} workers ---")
+        report("Full run       ", full)
+        report("Incremental run", incremental)
@@ -0,0 +1,330 @@
+"""
+SetuAayu Benchmark Suite
+
+Fixed-seed micro-benchmarks of the hot paths, recorded to a JSON history so
+every performance change can be judged against the runs before it:
+
+* Simulation: `generate_bridge_data` per call, `generate_bridge_batch` 100k rows
+  (DataFrame and compact ReadingBatch)
+* Readings: dicts <-> ReadingBatch conversion, 10k rows
+* CSV load: bridge_data.csv and synthetic_bridge.csv
+* Model load: pickle vs. compact forest (cold, cache cleared)
+* Inference: single row vs. 10k-row batch through `predict_batch`
+* Training: Random Forest fit time at 1k / 5k / 20k rows
+* Dashboard: 3D viewer HTML rendering
+
+Every case reports the median and best time per operation over `repeat` runs.
+`compare` flags cases whose median got slower than the tolerance allows and
+exits non-zero, so it can gate a change.
+
+Usage:
+    python bench_suite.py run                       # append a run to bench_history.json
+    python bench_suite.py run --filter inference
+    python bench_suite.py compare                   # last run vs. the one before
+    python bench_suite.py compare --base 0 --tolerance 0.2
+    python bench_suite.py list
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import warnings
+from datetime import datetime
+
+import numpy as np
+
+HISTORY_FILE = "bench_history.json"
+TOLERANCE = 0.15 # Allowed slowdown of the median before a case is flagged
+REPEAT = 5
+SEED = 0
+
+CASES = {}
+
+
+def case(name, number=1, repeat=None):
+    """
+    Registers a benchmark case.
+
+    The decorated function receives no arguments and returns the callable to
+    time, so expensive setup (data generation, file reads) is not measured.
+
+    Args:
+        name (str): Dotted case name, e.g. "inference.batch_10k".
+        number (int): Calls per timing sample (results are per call).
+        repeat (int): Timing samples (default: the suite's --repeat).
+    """
+    def register(setup):
+        CASES[name] = {"setup": setup, "number": number, "repeat": repeat}
+        return setup
+    return register
+
+
+# --- Simulation ---
+@case("sim.generate_bridge_data", number=2000)
+def _sim_single():
+    from bridge_sim import generate_bridge_data
+    random.seed(SEED)
+    return lambda: generate_bridge_data("normal")
+
+
+@case("sim.generate_bridge_batch_100k")
+def _sim_batch():
+    from bridge_sim import generate_bridge_batch
+    return lambda: generate_bridge_batch(100_000, seed=SEED)
+
+
+@case("sim.generate_bridge_batch_100k_compact")
+def _sim_batch_compact():
+    from bridge_sim import generate_bridge_batch
+    return lambda: generate_bridge_batch(100_000, seed=SEED, compact=True)
+
+
+# --- Readings ---
+@case("readings.from_dicts_10k")
+def _readings_from_dicts():
+    from bridge_sim import generate_bridge_batch
+    from readings import ReadingBatch
+    dicts = generate_bridge_batch(10_000, seed=SEED, compact=True).to_dicts()
+    return lambda: ReadingBatch.from_dicts(dicts)
+
+
+@case("readings.to_dicts_10k")
+def _readings_to_dicts():
+    from bridge_sim import generate_bridge_batch
+    batch = generate_bridge_batch(10_000, seed=SEED, compact=True)
+    return lambda: batch.to_dicts()
+
+
+# --- CSV load ---
+def _csv_case(path):
+    import pandas as pd
+    return lambda: pd.read_csv(path)
+
+
+@case("csv.load_bridge_data")
+def _csv_bridge_data():
+    return _csv_case("bridge_data.csv")
+
+
+@case("csv.load_synthetic_bridge")
+def _csv_synthetic():
+    return _csv_case("synthetic_bridge.csv")
+
+
+# --- Model load ---
+@case("model.load_pickle")
+def _load_pickle():
+    import pickle
+    import sklearn.ensemble # noqa: F401 - import cost is not part of the load
+
+    def load():
+        with open("model.pkl", "rb") as f:
+            pickle.load(f)
+    return load
+
+
+@case("model.load_compact")
+def _load_compact():
+    from inference import clear_cache, get_model
+
+    def load():
+        clear_cache()
+        get_model("model.pkl")
+    return load
+
+
+# --- Inference ---
+@case("inference.single_row", number=200)
+def _predict_single():
+    from inference import get_model, predict_batch
+    get_model("model.pkl")
+    row = np.random.default_rng(SEED).random((1, 5))
+    return lambda: predict_batch(row, "model.pkl")
+
+
+@case("inference.batch_10k")
+def _predict_batch():
+    from inference import get_model, predict_batch
+    get_model("model.pkl")
+    X = np.random.default_rng(SEED).random((10_000, 5))
+    return lambda: predict_batch(X, "model.pkl")
+
+
+# --- Training ---
+def _train_case(rows):
+    from sklearn.ensemble import RandomForestClassifier
+
+    from bridge_sim import SENSOR_FIELDS, generate_bridge_batch
+    from train_model import DEFAULT_PARAMS, RANDOM_STATE
+
+    df = generate_bridge_batch(rows, critical_ratio=0.1, seed=SEED)
+    X = df[SENSOR_FIELDS].to_numpy()
+    y = (df["scenario"] == "critical").to_numpy()
+    # Single-threaded so the number does not depend on the core count
+    return lambda: RandomForestClassifier(random_state=RANDOM_STATE, n_jobs=1, **DEFAULT_PARAMS).fit(X, y)
+
+
+@case("train.rows_1k", repeat=3)
+def _train_1k():
+    return _train_case(1_000)
+
+
+@case("train.rows_5k", repeat=3)
+def _train_5k():
+    return _train_case(5_000)
+
+
+@case("train.rows_20k", repeat=3)
+def _train_20k():
+    return _train_case(20_000)
+
+
+# --- Dashboard ---
+@case("app.viewer_html", number=500)
+def _viewer_html():
+    from bridge_sim import generate_bridge_data
+    from viewer import read_template, render_viewer_html
+    random.seed(SEED)
+    template = read_template()
+    data = generate_bridge_data("critical")
+    return lambda: render_viewer_html(template, data)
+
+
+def run(filter=None, repeat=REPEAT):
+    """
+    Runs the (matching) cases.
+
+    Returns:
+        dict: case name -> {"median_s", "min_s", "number", "repeat"} (per call).
+    """
+    warnings.filterwarnings("ignore")
+    results = {}
+    for name, spec in CASES.items():
+        if filter and filter not in name:
+            continue
+        fn = spec["setup"]()
+        number = spec["number"]
+        fn() # Warm-up (imports, caches, first-touch allocations)
+        samples = []
+        for _ in range(spec["repeat"] or repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            samples.append((time.perf_counter() - start) / number)
+        results[name] = {"median_s": float(np.median(samples)), "min_s": float(min(samples)),
+                         "number": number, "repeat": len(samples)}
+        print(f"{name:<34} {_fmt(results[name]['median_s']):>10}  (best {_fmt(results[name]['min_s'])})")
+    return results
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def load_history(path=HISTORY_FILE):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return json.load(f)
+
+
+def record(results, label=None, path=HISTORY_FILE):
+    """Appends a run to the JSON history file."""
+    history = load_history(path)
+    history.append({
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "label": label,
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()} x{os.cpu_count()}",
+        "results": results,
+    })
+    with open(path, "w") as f:
+        json.dump(history, f, indent=2)
+    return len(history) - 1
+
+
+def compare(base, head, tolerance=TOLERANCE):
+    """
+    Compares two runs case by case.
+
+    Returns:
+        list: (case, base median, head median, ratio, status) where status is
+        "regression", "improvement" or "ok". Cases missing from either run are skipped.
+    """
+    rows = []
+    for name, result in head["results"].items():
+        if name not in base["results"]:
+            continue
+        before, after = base["results"][name]["median_s"], result["median_s"]
+        ratio = after / before if before else float("inf")
+        status = "regression" if ratio > 1 + tolerance else "improvement" if ratio < 1 - tolerance else "ok"
+        rows.append((name, before, after, ratio, status))
+    return rows
+
+
+def _fmt(seconds):
+    if seconds >= 1:
+        return f"{seconds:.2f} s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds * 1e6:.1f} µs"
+
+
+def _describe(index, entry):
+    return f"#{index} {entry['timestamp']} {entry.get('commit') or ''} {entry.get('label') or ''}".rstrip()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SetuAayu benchmark suite")
+    parser.add_argument("--history", default=HISTORY_FILE)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_run = sub.add_parser("run", help="Run the suite and append the results to the history")
+    p_run.add_argument("--filter", help="Only cases whose name contains this text")
+    p_run.add_argument("--repeat", type=int, default=REPEAT)
+    p_run.add_argument("--label", help="Free-text note stored with the run")
+    p_run.add_argument("--no-record", action="store_true", help="Print only, do not write the history")
+
+    p_compare = sub.add_parser("compare", help="Flag regressions between two recorded runs")
+    p_compare.add_argument("--base", type=int, default=-2, help="History index of the baseline run")
+    p_compare.add_argument("--head", type=int, default=-1, help="History index of the run to check")
+    p_compare.add_argument("--tolerance", type=float, default=TOLERANCE, help="Allowed relative slowdown")
+
+    sub.add_parser("list", help="List recorded runs")
+    args = parser.parse_args()
+
+    # Cases use repo-relative paths (model.pkl, CSVs, template)
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    if args.command == "run":
+        print(f"--- SetuAayu benchmark suite (seed {SEED}, repeat {args.repeat}) ---")
+        results = run(args.filter, args.repeat)
+        if not args.no_record:
+            index = record(results, args.label, args.history)
+            print(f"\n📝 Recorded as run #{index} in '{args.history}'")
+    elif args.command == "list":
+        for i, entry in enumerate(load_history(args.history)):
+            print(f"{_describe(i, entry)}  ({len(entry['results'])} cases)")
+    else:
+        history = load_history(args.history)
+        if len(history) < 2:
+            sys.exit("Need at least two recorded runs to compare.")
+        base, head = history[args.base], history[args.head]
+        print(f"Base: {_describe(args.base % len(history), base)}")
+        print(f"Head: {_describe(args.head % len(history), head)}\n")
+        rows = compare(base, head, args.tolerance)
+        marks = {"regression": "❌", "improvement": "✅", "ok": "  "}
+        for name, before, after, ratio, status in rows:
+            print(f"{marks[status]} {name:<34} {_fmt(before):>10} -> {_fmt(after):>10}  {ratio:6.2f}x")
+        regressions = [row for row in rows if row[4] == "regression"]
+        print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%} tolerance")
+        sys.exit(1 if regressions else 0)
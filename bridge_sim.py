@@ -2,6 +2,16 @@ import json
 import random
 from datetime import datetime
 
+import numpy as np
+import pandas as pd
+
+from asset_registry import get_registry
+from instrumentation import timed
+
+# The five raw channels streamed by the ESP32 node and used as model features
+SENSOR_FIELDS = ["vibration_x", "vibration_y", "vibration_z", "strain", "tilt"]
+
+@timed("sim_reading_seconds", "generate_bridge_data calls")
 def generate_bridge_data(scenario="normal", location_name=None):
     """
     Generates mock bridge sensor data.
@@ -21,15 +31,7 @@ def generate_bridge_data(scenario="normal", location_name=None):
     """
     timestamp = datetime.now().isoformat()
     
-    locations = [
-        "Silk Board Junction Flyover",
-        "Hebbal Flyover Service Rd",
-        "KR Puram Suspension Bridge",
-        "Domlur Flyover",
-        "Yeshwanthpur Railway Overbridge",
-        "Madiwala Underpass"
-    ]
-    location = location_name if location_name else random.choice(locations)
+    location = location_name if location_name else random.choice(get_registry().names)
     
     # Stress (MPa) = Strain (microstrain) * Young's Modulus (GPa) / 1000 approx
     # Concrete E ~ 30 GPa. Steel E ~ 200 GPa. Let's assume Reinforced Concrete ~ 30-50 effective.
@@ -78,6 +80,89 @@ def generate_bridge_data(scenario="normal", location_name=None):
     
     return data # Returning dict. If string is absolutely required, I'll change it.
 
+@timed("sim_batch_seconds", "generate_bridge_batch calls")
+def generate_bridge_batch(n, critical_ratio=0.05, locations=None, seed=None,
+                          start_time=None, interval_s=90.0, compact=False):
+    """
+    Vectorized version of generate_bridge_data for large datasets.
+
+    Every column is drawn at once with NumPy, using exactly the same value
+    ranges as the "normal" and "critical" branches above.
+
+    Args:
+        n (int): Number of rows to generate.
+        critical_ratio (float): Fraction of rows drawn from the critical branch.
+        locations (list): Location names to sample from (defaults to every registered asset,
+            see asset_registry.py).
+        seed (int): Seed for reproducible output (optional).
+        start_time (datetime): Timestamp of the first row (defaults to now).
+        interval_s (float): Seconds between consecutive rows.
+        compact (bool): Return a readings.ReadingBatch (40 bytes per row,
+            float32 sensors, epoch-ms timestamps) instead of a DataFrame.
+
+    Returns:
+        pd.DataFrame: Columnar frame with the same columns as generate_bridge_data.
+    """
+    rng = np.random.default_rng(seed)
+    locations = list(dict.fromkeys(locations)) if locations else get_registry().names
+    start = np.datetime64(start_time if start_time else datetime.now(), "us")
+
+    critical = rng.random(n) < critical_ratio
+
+    def uniform(lo_normal, hi_normal, lo_crit, hi_crit, decimals):
+        lo = np.where(critical, lo_crit, lo_normal)
+        hi = np.where(critical, hi_crit, hi_normal)
+        return np.round(rng.uniform(lo, hi), decimals)
+
+    def randint(lo_normal, hi_normal, lo_crit, hi_crit):
+        # Inclusive bounds, same as random.randint
+        lo = np.where(critical, lo_crit, lo_normal)
+        hi = np.where(critical, hi_crit, hi_normal)
+        return rng.integers(lo, hi + 1)
+
+    vibration_x = uniform(0.001, 0.25, 0.31, 0.8, 4)
+    vibration_y = uniform(0.001, 0.25, 0.31, 0.8, 4)
+    vibration_z = uniform(0.001, 0.25, 0.31, 0.8, 4)
+    strain = uniform(10, 100, 500, 1000, 2)
+    stress_mpa = np.round(strain * np.where(critical, 0.035, 0.030), 2)
+    tilt = uniform(-0.5, 0.5, 2.0, 5.0, 2)
+    health_score = randint(95, 100, 45, 65)
+    traffic_load = randint(800, 3500, 4500, 8000)
+
+    # Repeated strings are stored once as categoricals
+    codes = critical.astype(np.int8)
+    def categorical(normal_value, critical_value):
+        return pd.Categorical.from_codes(codes, categories=[normal_value, critical_value])
+
+    offsets = (np.arange(n) * (interval_s * 1e6)).astype("timedelta64[us]")
+    location_codes = rng.integers(0, len(locations), n)
+
+    if compact:
+        from readings import ReadingBatch
+        # Code tables put "normal" values at 1 and "critical" values at 2 (0 = not provided)
+        return ReadingBatch.from_columns(
+            (start + offsets).astype("datetime64[ms]").astype(np.int64), locations, source_codes=location_codes,
+            vibration_x=vibration_x, vibration_y=vibration_y, vibration_z=vibration_z, strain=strain,
+            stress_mpa=stress_mpa, tilt=tilt, health_score=health_score, traffic_load=traffic_load,
+            scenario=codes + 1, prediction_window=codes + 1, defect_type=codes + 1,
+        )
+
+    return pd.DataFrame({
+        "timestamp": start + offsets,
+        "location": pd.Categorical.from_codes(location_codes, categories=locations),
+        "vibration_x": vibration_x,
+        "vibration_y": vibration_y,
+        "vibration_z": vibration_z,
+        "strain": strain,
+        "stress_mpa": stress_mpa,
+        "tilt": tilt,
+        "health_score": health_score,
+        "prediction_window": categorical("None (Safe)", "45-60 days"),
+        "defect_type": categorical("None", "Early-stage Rebar Corrosion"),
+        "traffic_load": traffic_load,
+        "scenario": categorical("normal", "critical"),
+    })
+
 if __name__ == "__main__":
     import json
     # Test the function
@@ -0,0 +1,59 @@
+"""
+SetuAayu Dashboard Timing
+
+Runs `app.py` headlessly with Streamlit's AppTest and reports how long each
+interaction takes to return control to the user (time-to-interactive):
+initial load, a plain widget rerun and each button on the interactive path.
+
+Usage:
+    python dashboard_timing.py                # demo delays on
+    SETUAAYU_FAST_MODE=1 python dashboard_timing.py
+"""
+import os
+import time
+
+from streamlit.testing.v1 import AppTest
+
+APP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+
+def _click(at, label):
+    button = next(b for b in list(at.button) + list(at.sidebar.button) if b.label == label)
+    button.click()
+
+
+def measure(app_file=APP_FILE, timeout=60):
+    """
+    Returns:
+        dict: interaction name -> seconds until the script run completed.
+    """
+    results = {}
+    at = AppTest.from_file(app_file, default_timeout=timeout)
+
+    def timed(name, action=None):
+        if action is not None:
+            action()
+        t = time.perf_counter()
+        at.run()
+        results[name] = time.perf_counter() - t
+        if at.exception:
+            raise RuntimeError(f"{name}: {at.exception[0].message}")
+
+    cwd = os.getcwd()
+    os.chdir(os.path.dirname(app_file))
+    try:
+        timed("initial load")
+        timed("widget rerun (mode switch)", lambda: at.sidebar.radio[0].set_value("Critical"))
+        timed("scrape web & reconstruct", lambda: _click(at, "🔍 Scrape Web & Reconstruct"))
+        timed("generate audit report", lambda: _click(at, "📄 Generate Safety Audit Report"))
+        timed("run AI analysis", lambda: _click(at, "Run AI Analysis"))
+    finally:
+        os.chdir(cwd)
+    return results
+
+
+if __name__ == "__main__":
+    mode = "fast mode" if os.environ.get("SETUAAYU_FAST_MODE") == "1" else "demo delays"
+    print(f"--- Dashboard time-to-interactive ({mode}) ---")
+    for name, seconds in measure().items():
+        print(f"{name:<30} {seconds * 1000:9.1f} ms")
@@ -0,0 +1,319 @@
+"""
+SetuAayu Windowed Feature Extraction
+
+Turns the raw 10 Hz channels into sliding-window features per sensor:
+
+    mean, rms, p2p (peak-to-peak), crest (peak / rms), kurtosis,
+    dom_freq (dominant FFT frequency, Hz) and drift (slope per second)
+
+Two modes share the same definitions:
+
+* Streaming: `WindowFeatureExtractor.push(reading)` keeps a ring buffer per
+  channel with O(1) running sums and monotonic min/max queues, and emits a
+  feature dict every `hop` samples once the window is full. Only the FFT is
+  computed per emitted window.
+* Batch: `extract_batch(df)` computes the same windows over stored history
+  with NumPy (CSV or columnar store), so training (train_model.py) and
+  streaming scoring (scoring_scheduler.py) see identical features.
+
+The dashboard's `inference.predict_batch` scores single raw readings and has
+no window history, so windowed models are not served there yet (see
+`model_registry.ModelRegistry.servable`).
+
+Usage:
+    python features.py bench
+"""
+import argparse
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from bridge_sim import SENSOR_FIELDS
+
+WINDOW = 100 # 10 s at 10 Hz
+HOP = 10 # Emit once per second
+SAMPLE_RATE_HZ = 10.0
+STATS = ["mean", "rms", "p2p", "crest", "kurtosis", "dom_freq", "drift"]
+FEATURE_NAMES = [f"{field}_{stat}" for field in SENSOR_FIELDS for stat in STATS]
+
+# Running sums are rebuilt from the buffer this often (in windows) to stop
+# floating-point error from accumulating on long streams
+RESYNC_EVERY_WINDOWS = 64
+
+
+def _dominant_frequency(ordered, fs):
+    """Frequency of the largest non-DC bin of a Hann-windowed, demeaned rFFT."""
+    size = ordered.shape[-1]
+    spectrum = np.abs(np.fft.rfft((ordered - ordered.mean(axis=-1, keepdims=True)) * np.hanning(size), axis=-1))
+    spectrum[..., 0] = 0.0
+    return np.argmax(spectrum, axis=-1) * fs / size
+
+
+class RunningWindow:
+    """Ring buffer for one channel with O(1) running statistics."""
+
+    __slots__ = ("size", "buf", "pos", "n", "count", "shift",
+                 "s1", "s2", "s3", "s4", "six", "max_q", "min_q", "abs_q")
+
+    def __init__(self, size):
+        self.size = size
+        self.buf = np.zeros(size)
+        self.pos = 0
+        self.n = 0
+        self.count = 0
+        self.shift = None
+        self.s1 = self.s2 = self.s3 = self.s4 = self.six = 0.0
+        self.max_q, self.min_q, self.abs_q = deque(), deque(), deque()
+
+    def push(self, x):
+        x = float(x)
+        if self.shift is None:
+            # Sums are kept on (x - first value) for numerical stability
+            self.shift = x
+        y = x - self.shift
+
+        if self.n == self.size:
+            yo = self.buf[self.pos] - self.shift
+            rest = self.s1 - yo
+            self.six = self.six - rest + (self.size - 1) * y
+            self.s1 = rest + y
+            y2, yo2 = y * y, yo * yo
+            self.s2 += y2 - yo2
+            self.s3 += y2 * y - yo2 * yo
+            self.s4 += y2 * y2 - yo2 * yo2
+        else:
+            self.six += self.n * y
+            self.s1 += y
+            y2 = y * y
+            self.s2 += y2
+            self.s3 += y2 * y
+            self.s4 += y2 * y2
+            self.n += 1
+
+        self.buf[self.pos] = x
+        self.pos = (self.pos + 1) % self.size
+        i = self.count
+        self.count += 1
+
+        # Monotonic queues: the front is always the window max / min / max |x|
+        oldest = self.count - self.size
+        max_q, min_q, abs_q = self.max_q, self.min_q, self.abs_q
+        ax = abs(x)
+        while max_q and max_q[-1][1] <= x:
+            max_q.pop()
+        max_q.append((i, x))
+        while min_q and min_q[-1][1] >= x:
+            min_q.pop()
+        min_q.append((i, x))
+        while abs_q and abs_q[-1][1] <= ax:
+            abs_q.pop()
+        abs_q.append((i, ax))
+        for q in (max_q, min_q, abs_q):
+            if q[0][0] < oldest:
+                q.popleft()
+
+        if self.count % (self.size * RESYNC_EVERY_WINDOWS) == 0:
+            self._resync()
+
+    def _resync(self):
+        y = self.ordered() - self.shift
+        self.s1, self.s2 = y.sum(), (y * y).sum()
+        self.s3, self.s4 = (y ** 3).sum(), (y ** 4).sum()
+        self.six = (np.arange(self.n) * y).sum()
+
+    def ordered(self):
+        """Window contents, oldest first."""
+        if self.n < self.size:
+            return self.buf[:self.n].copy()
+        return np.concatenate((self.buf[self.pos:], self.buf[:self.pos]))
+
+    def stats(self, fs):
+        n, c = self.n, self.shift
+        m = self.s1 / n
+        var = max(self.s2 / n - m * m, 0.0)
+        mu4 = self.s4 / n - 4 * m * self.s3 / n + 6 * m * m * self.s2 / n - 3 * m ** 4
+        rms = np.sqrt(max((self.s2 + 2 * c * self.s1) / n + c * c, 0.0))
+        peak = self.abs_q[0][1]
+
+        sum_i = n * (n - 1) / 2
+        sum_i2 = (n - 1) * n * (2 * n - 1) / 6
+        denom = n * sum_i2 - sum_i * sum_i
+        slope = (n * self.six - sum_i * self.s1) / denom if denom else 0.0
+
+        return {
+            "mean": m + c,
+            "rms": rms,
+            "p2p": self.max_q[0][1] - self.min_q[0][1],
+            "crest": peak / rms if rms > 0 else 0.0,
+            "kurtosis": mu4 / (var * var) if var > 1e-12 else 0.0,
+            "dom_freq": float(_dominant_frequency(self.ordered(), fs)),
+            "drift": slope * fs,
+        }
+
+
+class WindowFeatureExtractor:
+    """Streaming feature extractor for one sensor node / bridge."""
+
+    def __init__(self, window=WINDOW, hop=HOP, fs=SAMPLE_RATE_HZ, fields=SENSOR_FIELDS):
+        self.window = window
+        self.hop = hop
+        self.fs = fs
+        self.fields = list(fields)
+        self.channels = {field: RunningWindow(window) for field in self.fields}
+        self.count = 0
+
+    def push(self, reading):
+        """
+        Adds one reading (dict with the sensor fields).
+
+        Returns:
+            dict or None: Features for the window ending at this reading, every
+            `hop` samples once `window` samples have been seen.
+        """
+        for field in self.fields:
+            self.channels[field].push(reading[field])
+        self.count += 1
+        if self.count < self.window or (self.count - self.window) % self.hop:
+            return None
+        features = {}
+        for field in self.fields:
+            for stat, value in self.channels[field].stats(self.fs).items():
+                features[f"{field}_{stat}"] = value
+        return features
+
+
+class FeatureStreams:
+    """One WindowFeatureExtractor per stream key (node id or location id)."""
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.extractors = {}
+
+    def push(self, key, reading):
+        extractor = self.extractors.get(key)
+        if extractor is None:
+            extractor = self.extractors[key] = WindowFeatureExtractor(**self.kwargs)
+        return extractor.push(reading)
+
+
+# --- Batch mode ---
+
+def window_features(x, window=WINDOW, hop=HOP, fs=SAMPLE_RATE_HZ, block=4096):
+    """
+    Vectorized features for one channel.
+
+    Args:
+        x (np.ndarray): 1-D series, oldest first.
+
+    Returns:
+        dict: stat name -> array with one value per window. Windows end at
+        indices window-1, window-1+hop, ... exactly like the streaming mode.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    out = {stat: [] for stat in STATS}
+    if len(x) < window:
+        return {stat: np.empty(0) for stat in STATS}
+
+    windows = np.lib.stride_tricks.sliding_window_view(x, window)[::hop]
+    i = np.arange(window)
+    sum_i = i.sum()
+    denom = window * (i * i).sum() - sum_i * sum_i
+
+    for start in range(0, len(windows), block):
+        w = windows[start:start + block]
+        mean = w.mean(axis=1)
+        d = w - mean[:, None]
+        var = (d * d).mean(axis=1)
+        mu4 = (d ** 4).mean(axis=1)
+        rms = np.sqrt((w * w).mean(axis=1))
+        peak = np.abs(w).max(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            crest = np.where(rms > 0, peak / rms, 0.0)
+            kurtosis = np.where(var > 1e-12, mu4 / (var * var), 0.0)
+        slope = (window * (w * i).sum(axis=1) - sum_i * w.sum(axis=1)) / denom
+
+        out["mean"].append(mean)
+        out["rms"].append(rms)
+        out["p2p"].append(w.max(axis=1) - w.min(axis=1))
+        out["crest"].append(crest)
+        out["kurtosis"].append(kurtosis)
+        out["dom_freq"].append(_dominant_frequency(w, fs))
+        out["drift"].append(slope * fs)
+
+    return {stat: np.concatenate(values) for stat, values in out.items()}
+
+
+def extract_batch(df, window=WINDOW, hop=HOP, fs=SAMPLE_RATE_HZ, group_col=None, keep_cols=()):
+    """
+    Batch feature extraction over stored history.
+
+    Args:
+        df (pd.DataFrame): Readings with SENSOR_FIELDS, ordered by time within
+            each group.
+        group_col (str): Column identifying a stream (e.g. `location_id`).
+        keep_cols (tuple): Columns copied from the last row of each window
+            (e.g. `timestamp`, `scenario` for training labels).
+
+    Returns:
+        pd.DataFrame: One row per window with FEATURE_NAMES plus keep_cols.
+    """
+    groups = df.groupby(group_col, sort=False, observed=True) if group_col else [(None, df)]
+    frames = []
+    for key, part in groups:
+        if len(part) < window:
+            continue
+        columns = {}
+        for field in SENSOR_FIELDS:
+            for stat, values in window_features(part[field].to_numpy(), window, hop, fs).items():
+                columns[f"{field}_{stat}"] = values
+        frame = pd.DataFrame(columns, columns=FEATURE_NAMES)
+        ends = np.arange(window - 1, len(part), hop)
+        for col in keep_cols:
+            frame[col] = part[col].to_numpy()[ends]
+        if group_col:
+            frame.insert(0, group_col, key)
+        frames.append(frame)
+    if not frames:
+        return pd.DataFrame(columns=([group_col] if group_col else []) + FEATURE_NAMES + list(keep_cols))
+    return pd.concat(frames, ignore_index=True)
+
+
+def parity_check(n=2000, window=WINDOW, hop=HOP, seed=0):
+    """Max absolute difference between streaming and batch features on random data."""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({field: rng.normal(0, 1, n) + (500 if field == "strain" else 0) for field in SENSOR_FIELDS})
+    extractor = WindowFeatureExtractor(window, hop)
+    streamed = [f for f in (extractor.push(r) for r in df.to_dict("records")) if f is not None]
+    streamed = pd.DataFrame(streamed, columns=FEATURE_NAMES)
+    batch = extract_batch(df, window, hop)
+    return float(np.nanmax(np.abs(streamed.to_numpy() - batch.to_numpy()) / (1 + np.abs(batch.to_numpy()))))
+
+
+def benchmark(n=100_000, window=WINDOW, hop=HOP, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({field: rng.normal(0, 1, n) for field in SENSOR_FIELDS})
+
+    records = df.to_dict("records")
+    extractor = WindowFeatureExtractor(window, hop)
+    t = time.perf_counter()
+    for r in records:
+        extractor.push(r)
+    stream_s = time.perf_counter() - t
+    print(f"Streaming: {n / stream_s:12,.0f} readings/s ({stream_s / n * 1e6:.1f} µs/reading)")
+
+    t = time.perf_counter()
+    extract_batch(df, window, hop)
+    batch_s = time.perf_counter() - t
+    print(f"Batch    : {n / batch_s:12,.0f} readings/s")
+    print(f"Parity (max relative diff): {parity_check(window=window, hop=hop):.2e}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SetuAayu windowed feature extraction")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_bench = sub.add_parser("bench", help="Streaming vs batch throughput and parity")
+    p_bench.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+    benchmark(args.rows)
@@ -1,13 +1,39 @@
 #include <WiFi.h>
 #include <HTTPClient.h>
 #include <Wire.h>
+#include <sys/time.h>
+#include <time.h>
 #include <Adafruit_MPU6050.h>
 #include <Adafruit_Sensor.h>
 
 // --- Configuration ---
 const char* ssid = "YOUR_WIFI_SSID";
 const char* password = "YOUR_WIFI_PASSWORD";
-const char* serverUrl = "http://YOUR_LAPTOP_IP:8501/api/data"; // Placeholder endpoint
+const char* serverUrl = "http://YOUR_LAPTOP_IP:8000/api/frames"; // ingest_server.py (python ingest_server.py serve)
+
+// --- Uplink (binary frames, see wire_protocol.py) ---
+// Little-endian fixed layout: 24-byte header + 5 float32 per sample.
+const uint16_t SAMPLE_PERIOD_MS = 100; // 10Hz sample rate
+const uint16_t BATCH_SAMPLES = 10;     // One frame (224 bytes) per second
+const size_t HEADER_BYTES = 24;
+const size_t SAMPLE_BYTES = 5 * sizeof(float);
+
+struct Sample {
+  float vibration_x, vibration_y, vibration_z, strain, tilt;
+};
+
+uint8_t frame[HEADER_BYTES + BATCH_SAMPLES * SAMPLE_BYTES];
+Sample samples[BATCH_SAMPLES];
+uint16_t sampleCount = 0;
+uint32_t frameSeq = 0;
+uint32_t nodeId = 0;
+uint64_t batchStartMs = 0;
+unsigned long nextSampleAt = 0;
+
+// One client for the life of the program: the TCP connection is kept alive
+// between frames instead of being reopened for every sample
+HTTPClient http;
+bool httpReady = false;
 
 // Sensors
 Adafruit_MPU6050 mpu;
@@ -48,12 +74,62 @@ void setup() {
     Serial.println("WiFi connected");
     Serial.println("IP address: ");
     Serial.println(WiFi.localIP());
+    configTime(0, 0, "pool.ntp.org"); // Frame timestamps are epoch ms once synced
   } else {
     Serial.println("\nWiFi Connection Failed - Continuing in Offline Mode");
   }
+
+  nodeId = (uint32_t)ESP.getEfuseMac(); // Low 32 bits of the chip id
+  nextSampleAt = millis();
+}
+
+// Epoch milliseconds, or 0 while NTP has not synced (the server then
+// timestamps the frame on arrival)
+uint64_t epochMillis() {
+  struct timeval tv;
+  gettimeofday(&tv, NULL);
+  if (tv.tv_sec < 1600000000) return 0;
+  return (uint64_t)tv.tv_sec * 1000ULL + tv.tv_usec / 1000;
+}
+
+void sendFrame() {
+  // Header: magic, version, flags, node id, sequence, t0, period, sample count
+  uint8_t* p = frame;
+  *p++ = 'S'; *p++ = 'A'; *p++ = 1; *p++ = 0;
+  memcpy(p, &nodeId, 4); p += 4;
+  memcpy(p, &frameSeq, 4); p += 4;
+  memcpy(p, &batchStartMs, 8); p += 8;
+  memcpy(p, &SAMPLE_PERIOD_MS, 2); p += 2;
+  memcpy(p, &sampleCount, 2); p += 2;
+  memcpy(p, samples, sampleCount * SAMPLE_BYTES);
+  size_t length = HEADER_BYTES + sampleCount * SAMPLE_BYTES;
+  frameSeq++;
+
+  if (WiFi.status() != WL_CONNECTED) return;
+  if (!httpReady) {
+    http.setReuse(true);
+    httpReady = http.begin(serverUrl);
+    http.addHeader("Content-Type", "application/octet-stream");
+  }
+  int httpResponseCode = http.POST(frame, length);
+  if (httpResponseCode > 0) {
+    http.getString(); // Drain the body so the connection can be reused
+  } else {
+    Serial.print("Error on sending POST: ");
+    Serial.println(httpResponseCode);
+    http.end(); // Reconnect on the next frame
+    httpReady = false;
+  }
 }
 
 void loop() {
+  // Fixed 10Hz schedule (the old delay(100) drifted by the time spent sending)
+  unsigned long now = millis();
+  if ((long)(now - nextSampleAt) < 0) {
+    return;
+  }
+  nextSampleAt += SAMPLE_PERIOD_MS;
+
   /* Get new sensor events with the readings */
   sensors_event_t a, g, temp;
   mpu.getEvent(&a, &g, &temp);
@@ -62,36 +138,17 @@ void loop() {
   simStrain = random(100, 500) + (sin(millis() / 1000.0) * 50); // Fluctuating strain
   simTilt = (a.acceleration.x / 9.8) * 90.0; // Rough tilt calc from accel
 
-  // Create JSON Payload
-  String jsonPayload = "{";
-  jsonPayload += "\"vibration_x\": " + String(a.acceleration.x) + ",";
-  jsonPayload += "\"vibration_y\": " + String(a.acceleration.y) + ",";
-  jsonPayload += "\"vibration_z\": " + String(a.acceleration.z) + ",";
-  jsonPayload += "\"strain\": " + String(simStrain) + ",";
-  jsonPayload += "\"tilt\": " + String(simTilt);
-  jsonPayload += "}";
-
-  // Print to Serial (for debugging/demo)
-  Serial.println(jsonPayload);
-
-  // Send to Server (if connected)
-  if(WiFi.status() == WL_CONNECTED) {
-    HTTPClient http;
-    http.begin(serverUrl);
-    http.addHeader("Content-Type", "application/json");
-    
-    int httpResponseCode = http.POST(jsonPayload);
-    
-    if(httpResponseCode > 0) {
-      String response = http.getString();
-      // Serial.println(httpResponseCode);
-      // Serial.println(response);
-    } else {
-      Serial.print("Error on sending POST: ");
-      Serial.println(httpResponseCode);
-    }
-    http.end();
+  if (sampleCount == 0) {
+    batchStartMs = epochMillis();
   }
+  samples[sampleCount++] = {a.acceleration.x, a.acceleration.y, a.acceleration.z, simStrain, simTilt};
 
-  delay(100); # 10Hz sample rate
+  // Send one frame per BATCH_SAMPLES samples (print the first sample for debugging/demo)
+  if (sampleCount == BATCH_SAMPLES) {
+    Serial.printf("frame %u: vib %.2f %.2f %.2f strain %.1f tilt %.2f\n", frameSeq,
+                  samples[0].vibration_x, samples[0].vibration_y, samples[0].vibration_z,
+                  samples[0].strain, samples[0].tilt);
+    sendFrame();
+    sampleCount = 0;
+  }
 }
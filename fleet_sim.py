@@ -0,0 +1,311 @@
+"""
+SetuAayu Fleet Simulator
+
+Advances N bridges in lock-step at 10 Hz, vectorized over bridges (and over
+time within a block), with physically correlated signals instead of the
+independent uniform draws of `generate_bridge_data`:
+
+* Vibration: sinusoid at each bridge's natural frequency plus AR(2) noise,
+  scaled by traffic. Degradation raises the amplitude and lowers the frequency.
+* Traffic: two rush-hour peaks per day per bridge (PCU/hr).
+* Strain: baseline + traffic load + daily thermal cycle + degradation.
+* Tilt: slow random-walk drift plus degradation-driven lean.
+* Degradation events: arrive at random per bridge and ramp up over hours.
+  They drive health_score and scenario ("critical" once severity > 0.5).
+
+Output goes to the columnar store, the rollups, a CSV file or the ingest
+service.
+
+Usage:
+    python fleet_sim.py --bridges 1000 --hours 24 --store telemetry_store --rollups rollups
+    python fleet_sim.py --bridges 200 --hours 1 --ingest http://127.0.0.1:8000/api/data --realtime
+    python fleet_sim.py --bridges 1000 --hours 24      # benchmark only, no output
+    python fleet_sim.py --bridges 200 --hours 24 --modal
+"""
+import argparse
+import http.client
+import json
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+import numpy as np
+import pandas as pd
+
+from asset_registry import get_registry
+from bridge_sim import SENSOR_FIELDS
+
+SAMPLE_RATE_HZ = 10.0
+BLOCK_SECONDS = 600 # Ticks are generated 10 minutes at a time
+DEGRADATION_EVENTS_PER_DAY = 0.05 # Per bridge
+CRITICAL_SEVERITY = 0.5
+INGEST_BACKOFF_S = 0.1 # First wait after a 503; doubles per retry
+INGEST_MAX_BACKOFF_S = 5.0
+INGEST_MAX_RETRIES = 10
+
+
+def bridge_ids(n):
+    """Registered asset IDs first (asset_registry.py), then SIM_xxxxx for the rest of the fleet."""
+    registered = get_registry().ids[:n]
+    return registered + [f"SIM_{i:05d}" for i in range(len(registered), n)]
+
+
+def bridge_names(n):
+    registered = get_registry().names[:n]
+    return registered + [f"Simulated Bridge {i}" for i in range(len(registered), n)]
+
+
+class FleetSimulator:
+    """Lock-step simulator for `n_bridges` bridges. All state is (N,) or (N, 3) arrays."""
+
+    def __init__(self, n_bridges, seed=0, fs=SAMPLE_RATE_HZ, start_time=None,
+                 events_per_day=DEGRADATION_EVENTS_PER_DAY):
+        self.n = n_bridges
+        self.fs = fs
+        self.events_per_day = events_per_day
+        self.rng = np.random.default_rng(seed)
+        start_time = start_time or datetime(2025, 12, 5, tzinfo=timezone.utc)
+        if start_time.tzinfo is None: # Naive times are UTC, as block_to_frame reads them back
+            start_time = start_time.replace(tzinfo=timezone.utc)
+        self.start_epoch = start_time.timestamp()
+        self.ids = bridge_ids(n_bridges)
+        self.tick = 0
+
+        rng, n = self.rng, n_bridges
+        # Static per-bridge properties
+        self.natural_freq = rng.uniform(0.8, 3.5, n) # Hz, below Nyquist at 10 Hz
+        self.base_amp = rng.uniform(0.03, 0.08, (n, 3)) # g
+        self.traffic_scale = rng.uniform(2500, 4500, n) # Peak PCU/hr
+        self.strain_base = rng.uniform(20, 50, n) # µε
+        self.tilt_direction = rng.choice([-1.0, 1.0], n)
+
+        # Dynamic state carried between blocks
+        self.phase = rng.uniform(0, 2 * np.pi, n)
+        self.ar = np.zeros((2, n, 3))
+        self.tilt_walk = rng.uniform(-0.1, 0.1, n)
+        self.event_start = np.full(n, np.inf) # Seconds since start
+        self.event_ramp = rng.uniform(2, 12, n) * 3600 # Seconds to reach peak severity
+        self.event_peak = rng.uniform(0.6, 1.0, n)
+
+    def inject_degradation(self, bridge_index, start_s=None, ramp_hours=None, peak=None):
+        """Forces a degradation event on one bridge (defaults: now, existing ramp/peak)."""
+        self.event_start[bridge_index] = self.tick / self.fs if start_s is None else start_s
+        if ramp_hours is not None:
+            self.event_ramp[bridge_index] = ramp_hours * 3600
+        if peak is not None:
+            self.event_peak[bridge_index] = peak
+
+    def step_block(self, ticks):
+        """
+        Simulates the next `ticks` samples for every bridge.
+
+        Returns:
+            dict: `timestamp` (T,) epoch seconds and (T, N) arrays for every
+            sensor field plus traffic_load, health_score and severity, and
+            `acceleration` (T, N, 3), the signed signal behind vibration_x/y/z.
+        """
+        rng, n, fs = self.rng, self.n, self.fs
+        t = (self.tick + np.arange(ticks)) / fs # Seconds since start, (T,)
+        epoch = self.start_epoch + t
+        hour = (epoch % 86400) / 3600
+
+        # New degradation events (Poisson arrivals within this block)
+        block_days = ticks / fs / 86400
+        healthy = np.isinf(self.event_start)
+        arrivals = healthy & (rng.random(n) < 1 - np.exp(-self.events_per_day * block_days))
+        self.event_start[arrivals] = t[0] + rng.uniform(0, ticks / fs, arrivals.sum())
+        severity = np.clip((t[:, None] - self.event_start) / self.event_ramp, 0, 1) * self.event_peak
+
+        # Traffic: morning and evening peaks
+        profile = 0.3 + 0.7 * (np.exp(-((hour - 9) / 1.5) ** 2) + np.exp(-((hour - 18.5) / 2.0) ** 2))
+        traffic = self.traffic_scale * profile[:, None] * (1 + 0.05 * rng.standard_normal((ticks, n)))
+
+        # Vibration: natural-frequency sinusoid + AR(2) noise, traffic and damage scaled
+        freq = self.natural_freq * (1 - 0.15 * severity)
+        phase = self.phase + 2 * np.pi * np.cumsum(freq, axis=0) / fs
+        self.phase = phase[-1] % (2 * np.pi)
+        noise = rng.standard_normal((ticks, n, 3))
+        ar = np.empty((ticks, n, 3))
+        prev1, prev2 = self.ar
+        for i in range(ticks):
+            prev1, prev2 = 1.2 * prev1 - 0.5 * prev2 + 0.3 * noise[i], prev1
+            ar[i] = prev1
+        self.ar = np.stack([prev1, prev2])
+        amp = self.base_amp * ((0.5 + traffic / self.traffic_scale) * (1 + 4 * severity))[:, :, None]
+        acceleration = amp * (0.7 * np.sin(phase)[:, :, None] + 0.3 * ar) # Signed, as the MPU6050 reports it
+        vibration = np.abs(acceleration) + 0.001
+
+        # Strain: baseline + traffic + thermal cycle + damage
+        thermal = 5 * np.sin(2 * np.pi * (hour - 14) / 24)[:, None]
+        strain = (self.strain_base + 0.012 * traffic + thermal + 650 * severity
+                  + 2 * rng.standard_normal((ticks, n)))
+
+        # Tilt: slow random walk + damage-driven lean
+        walk = self.tilt_walk + np.cumsum(rng.normal(0, 0.0005, (ticks, n)), axis=0)
+        walk = np.clip(walk, -0.5, 0.5)
+        self.tilt_walk = walk[-1]
+        tilt = walk + self.tilt_direction * 4.0 * severity
+
+        health = np.clip(np.round(100 - 55 * severity - np.abs(rng.normal(0, 1, (ticks, n)))), 0, 100)
+
+        self.tick += ticks
+        return {
+            "timestamp": epoch,
+            "vibration_x": vibration[:, :, 0],
+            "vibration_y": vibration[:, :, 1],
+            "vibration_z": vibration[:, :, 2],
+            "strain": strain,
+            "tilt": tilt,
+            "traffic_load": traffic,
+            "health_score": health,
+            "severity": severity,
+            "acceleration": acceleration, # (T, N, 3) signed g, for spectral analysis (modal_analysis.py)
+        }
+
+    def run(self, seconds, block_seconds=BLOCK_SECONDS):
+        """Yields blocks (see `step_block`) covering `seconds` of simulated time."""
+        total = int(round(seconds * self.fs))
+        per_block = max(1, int(round(block_seconds * self.fs)))
+        done = 0
+        while done < total:
+            ticks = min(per_block, total - done)
+            yield self.step_block(ticks)
+            done += ticks
+
+
+def block_to_frame(block, ids):
+    """Long (T * N rows) DataFrame in the telemetry store schema."""
+    ticks, n = block["strain"].shape
+    return pd.DataFrame({
+        "timestamp": pd.to_datetime(np.repeat(block["timestamp"], n), unit="s"),
+        "location_id": pd.Categorical.from_codes(np.tile(np.arange(n), ticks), categories=ids),
+        **{field: block[field].ravel().astype(np.float32) for field in SENSOR_FIELDS},
+        "health_score": block["health_score"].ravel().astype(np.float32),
+        "scenario": np.where(block["severity"].ravel() > CRITICAL_SEVERITY, "critical", "normal"),
+    })
+
+
+class IngestEmitter:
+    """
+    POSTs blocks to the ingest service over one kept-alive connection. A
+    chunk answered with 503 (back-pressure) is resent with exponential
+    backoff, so no readings are dropped while the service catches up.
+    """
+
+    def __init__(self, url, max_readings_per_request=2000):
+        parsed = urlparse(url)
+        self.path = parsed.path or "/api/data"
+        self.conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80)
+        self.max_readings = max_readings_per_request
+
+    def __call__(self, block, ids):
+        ticks, n = block["strain"].shape
+        ids = np.asarray(ids, dtype=object)
+        total = ticks * n
+        for start in range(0, total, self.max_readings):
+            # Dicts only for one request at a time; rows are (tick, bridge) in tick-major order
+            k = np.arange(start, min(start + self.max_readings, total))
+            i, j = k // n, k % n
+            names = ids[j].tolist()
+            stamps = block["timestamp"][i].astype(np.float64).tolist()
+            columns = {field: np.round(block[field][i, j], 4).tolist() for field in SENSOR_FIELDS}
+            readings = [
+                {"node_id": names[r], "timestamp": stamps[r], **{field: columns[field][r] for field in SENSOR_FIELDS}}
+                for r in range(len(k))
+            ]
+            self._post(json.dumps(readings))
+
+    def _post(self, body):
+        """
+        Raises:
+            RuntimeError: If the chunk is still refused after INGEST_MAX_RETRIES.
+        """
+        delay = INGEST_BACKOFF_S
+        for _ in range(INGEST_MAX_RETRIES + 1):
+            self.conn.request("POST", self.path, body, {"Content-Type": "application/json"})
+            response = self.conn.getresponse()
+            response.read()
+            if response.status != 503:
+                return response.status
+            time.sleep(delay) # Ingest is applying back-pressure
+            delay = min(delay * 2, INGEST_MAX_BACKOFF_S)
+        raise RuntimeError(f"Ingest still busy after {INGEST_MAX_RETRIES} retries")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SetuAayu multi-bridge fleet simulator")
+    parser.add_argument("--bridges", type=int, default=len(get_registry()))
+    parser.add_argument("--hours", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--block-seconds", type=float, default=BLOCK_SECONDS)
+    parser.add_argument("--store", help="Write to this columnar telemetry store")
+    parser.add_argument("--rollups", help="Maintain 1 s / 1 min / 1 h rollups in this directory")
+    parser.add_argument("--csv", help="Write to this CSV file")
+    parser.add_argument("--ingest", help="POST to this ingest URL, e.g. http://127.0.0.1:8000/api/data")
+    parser.add_argument("--modal", action="store_true", help="Track natural frequencies (modal_analysis.py)")
+    parser.add_argument("--realtime", action="store_true", help="Pace output to wall-clock time")
+    parser.add_argument("--speed", type=float, default=1.0, help="Time acceleration factor with --realtime")
+    args = parser.parse_args()
+
+    # Real-time output is emitted once per second of simulated time
+    block_seconds = 1.0 if args.realtime else args.block_seconds
+    sim = FleetSimulator(args.bridges, seed=args.seed)
+
+    store = None
+    if args.store:
+        from telemetry_store import TelemetryStore
+        store = TelemetryStore(args.store)
+    rollups = None
+    if args.rollups:
+        from rollups import RollupStore
+        rollups = RollupStore(args.rollups)
+    ingest = IngestEmitter(args.ingest) if args.ingest else None
+    modal = None
+    if args.modal:
+        from modal_analysis import DRIFT_ALERT_PCT, ModalTracker
+        modal = ModalTracker(args.bridges, fs=sim.fs, start_time=sim.start_epoch)
+
+    print(f"Simulating {args.bridges} bridges for {args.hours} h at {SAMPLE_RATE_HZ:.0f} Hz...")
+    start = time.perf_counter()
+    readings = 0
+    sim_s = 0.0
+    first_block = True
+    for block in sim.run(args.hours * 3600, block_seconds):
+        ticks = len(block["timestamp"])
+        readings += ticks * args.bridges
+        sim_s += ticks / sim.fs
+        if store is not None or rollups is not None or args.csv:
+            frame = block_to_frame(block, sim.ids)
+            if store is not None:
+                store.append(frame)
+            if rollups is not None:
+                rollups.add(frame)
+            if args.csv:
+                frame.to_csv(args.csv, mode="w" if first_block else "a", header=first_block, index=False)
+        if ingest is not None:
+            ingest(block, sim.ids)
+        if modal is not None:
+            modal.update_fleet_block(block)
+        first_block = False
+        if args.realtime:
+            delay = sim_s / args.speed - (time.perf_counter() - start)
+            if delay > 0:
+                time.sleep(delay)
+
+    if store is not None:
+        store.compact()
+    if rollups is not None:
+        rollups.compact()
+    elapsed = time.perf_counter() - start
+    critical = int((sim.event_start <= sim.tick / sim.fs).sum())
+    print(f"✅ {readings:,} readings in {elapsed:.1f}s ({readings / elapsed:,.0f} readings/s, "
+          f"{sim_s / elapsed:,.0f}x real time)")
+    print(f"Bridges with active degradation: {critical}/{args.bridges}")
+    if modal is not None and modal.windows:
+        drift = modal.frequency_drift()
+        print(f"Modal tracking: {modal.windows} windows, {int(drift['alert'].sum())} bridge(s) with a natural "
+              f"frequency drop beyond {DRIFT_ALERT_PCT}% (median drift {drift['drift_pct'].median():+.2f}%)")
+
+
+if __name__ == "__main__":
+    main()
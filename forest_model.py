@@ -0,0 +1,230 @@
+"""
+SetuAayu Compact Forest Format
+
+Flattens a trained scikit-learn RandomForestClassifier into contiguous NumPy
+arrays (one row per node across all trees) saved as memory-mappable `.npy`
+files:
+
+    model_forest/        # <pickle stem>_forest, next to the pickle it was exported from
+        meta.json        # classes, feature names, tree roots, max depth, pickle sha256
+        feature.npy      # int32, -1 for leaves
+        threshold.npy    # float64
+        left.npy         # int32, global node index
+        right.npy        # int32, global node index
+        value.npy        # float64 (n_nodes, n_classes), per-leaf class fractions
+
+The export records the SHA-256 of its source pickle, and inference only uses
+it while that pickle is byte-for-byte unchanged (see `is_current`).
+
+`CompactForest` scores batches from those arrays with NumPy only, following
+the same float32 input cast, per-tree normalisation and tree-order summation
+as scikit-learn, so probabilities are bit-identical.
+
+Usage:
+    python forest_model.py export model.pkl          # -> model_forest/
+    python forest_model.py check model.pkl
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+FOREST_DIR = "model_forest" # Export of model.pkl (see forest_dir)
+ARRAYS = ["feature", "threshold", "left", "right", "value"]
+
+
+def forest_dir(model_path):
+    """Export directory for a pickle: `<stem>_forest/` beside it (model.pkl -> model_forest/)."""
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    return os.path.join(os.path.dirname(model_path), f"{stem}_forest")
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def is_current(directory, source_sha256):
+    """True if `directory` holds a complete export of the pickle with this SHA-256."""
+    try:
+        with open(os.path.join(directory, "meta.json")) as f:
+            return json.load(f).get("source_sha256") == source_sha256
+    except (OSError, ValueError):
+        return False
+
+
+def export_forest(model, directory=FOREST_DIR, source_sha256=None):
+    """
+    Writes a fitted RandomForestClassifier in the compact format.
+
+    Args:
+        model: Fitted RandomForestClassifier.
+        directory (str): Output directory.
+        source_sha256 (str): SHA-256 of the pickle the model is stored as,
+            so loaders can tell whether the export still matches it.
+
+    Returns:
+        str: The output directory.
+    """
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        n = tree.node_count
+        is_leaf = tree.children_left == -1
+        features.append(np.where(is_leaf, -1, tree.feature).astype(np.int32))
+        thresholds.append(tree.threshold.astype(np.float64))
+        lefts.append(np.where(is_leaf, -1, tree.children_left + offset).astype(np.int32))
+        rights.append(np.where(is_leaf, -1, tree.children_right + offset).astype(np.int32))
+
+        # Same normalisation as DecisionTreeClassifier.predict_proba
+        value = tree.value[:, 0, :].astype(np.float64)
+        normalizer = value.sum(axis=1)[:, None]
+        normalizer[normalizer == 0.0] = 1.0
+        values.append(value / normalizer)
+
+        roots.append(offset)
+        max_depth = max(max_depth, tree.max_depth)
+        offset += n
+
+    os.makedirs(directory, exist_ok=True)
+    arrays = {
+        "feature": np.concatenate(features),
+        "threshold": np.concatenate(thresholds),
+        "left": np.concatenate(lefts),
+        "right": np.concatenate(rights),
+        "value": np.ascontiguousarray(np.concatenate(values)),
+    }
+    for name, array in arrays.items():
+        np.save(os.path.join(directory, f"{name}.npy"), array)
+
+    meta = {
+        "format": 1,
+        "n_trees": len(model.estimators_),
+        "n_nodes": offset,
+        "max_depth": int(max_depth),
+        "roots": roots,
+        "classes": np.asarray(model.classes_).tolist(),
+        "feature_names": [str(f) for f in getattr(model, "feature_names_in_", [])] or None,
+        "n_features": int(model.n_features_in_),
+        "source_sha256": source_sha256,
+    }
+    # meta.json is written last so a partially written export is never loaded
+    with open(os.path.join(directory, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    return directory
+
+
+class CompactForest:
+    """
+    Pure-NumPy forest evaluator. Exposes `classes_`, `feature_names_in_`,
+    `predict_proba` and `predict` so it can stand in for the sklearn model.
+    """
+
+    def __init__(self, directory=FOREST_DIR, mmap=True):
+        with open(os.path.join(directory, "meta.json")) as f:
+            self.meta = json.load(f)
+        mode = "r" if mmap else None
+        for name in ARRAYS:
+            setattr(self, name, np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mode))
+        self.roots = np.asarray(self.meta["roots"], dtype=np.int64)
+        self.classes_ = np.asarray(self.meta["classes"])
+        self.n_features_in_ = self.meta["n_features"]
+        if self.meta.get("feature_names"):
+            self.feature_names_in_ = np.asarray(self.meta["feature_names"], dtype=object)
+
+    def apply(self, X):
+        """Global leaf index reached in every tree: shape (n_trees, n_samples)."""
+        # sklearn evaluates splits on float32 inputs
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        n = X.shape[0]
+        nodes = np.repeat(self.roots[:, None], n, axis=1)
+        rows = np.broadcast_to(np.arange(n), nodes.shape)
+        for _ in range(self.meta["max_depth"]):
+            feature = self.feature[nodes]
+            internal = feature >= 0
+            if not internal.any():
+                break
+            go_left = X[rows, np.where(internal, feature, 0)] <= self.threshold[nodes]
+            nodes = np.where(internal, np.where(go_left, self.left[nodes], self.right[nodes]), nodes)
+        return nodes
+
+    def predict_proba(self, X):
+        leaves = self.apply(X)
+        proba = np.zeros((leaves.shape[1], len(self.classes_)))
+        # Summed tree by tree, in order, exactly like the sklearn forest
+        for tree_leaves in leaves:
+            proba += self.value[tree_leaves]
+        proba /= len(leaves)
+        return proba
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def parity_check(model, directory=FOREST_DIR, n=5000, seed=0):
+    """
+    Compares CompactForest against the sklearn model on random and edge inputs.
+
+    Returns:
+        tuple: (probabilities identical, labels identical)
+    """
+    rng = np.random.default_rng(seed)
+    forest = CompactForest(directory)
+    internal = forest.feature >= 0
+
+    # Random inputs spanning each feature's split range
+    X = np.empty((n, model.n_features_in_))
+    for j in range(model.n_features_in_):
+        splits = forest.threshold[internal & (forest.feature == j)]
+        lo, hi = (splits.min(), splits.max()) if len(splits) else (0.0, 1.0)
+        pad = 0.1 * (hi - lo) + 1e-3
+        X[:, j] = rng.uniform(lo - pad, hi + pad, n)
+
+    # Plus every split threshold exactly, where <= vs < would show up
+    edges = np.tile(X[:1], (int(internal.sum()), 1))
+    edges[np.arange(len(edges)), forest.feature[internal]] = forest.threshold[internal]
+    X = np.vstack([X, edges])
+
+    expected = model.predict_proba(X)
+    actual = forest.predict_proba(X)
+    return bool(np.array_equal(expected, actual)), bool(np.array_equal(model.predict(X), forest.predict(X)))
+
+
+if __name__ == "__main__":
+    import pickle
+    import warnings
+
+    parser = argparse.ArgumentParser(description="SetuAayu compact forest format")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("export", "check"):
+        p = sub.add_parser(name)
+        p.add_argument("model", nargs="?", default="model.pkl")
+        p.add_argument("directory", nargs="?", help="Default: <model stem>_forest beside the model")
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    t = time.perf_counter()
+    with open(args.model, "rb") as f:
+        model = pickle.load(f)
+    pickle_s = time.perf_counter() - t
+    args.directory = args.directory or forest_dir(args.model)
+
+    if args.command == "export":
+        export_forest(model, args.directory, file_sha256(args.model))
+        print(f"✅ Exported {len(model.estimators_)} trees to '{args.directory}'")
+    else:
+        t = time.perf_counter()
+        forest = CompactForest(args.directory)
+        compact_s = time.perf_counter() - t
+        proba_ok, labels_ok = parity_check(model, args.directory)
+        print(f"Load: pickle {pickle_s * 1000:.1f} ms (incl. sklearn import) vs compact {compact_s * 1000:.1f} ms")
+        print(f"{'✅' if proba_ok else '❌'} Probabilities bit-identical")
+        print(f"{'✅' if labels_ok else '❌'} Labels identical")
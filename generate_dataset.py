@@ -1,39 +1,50 @@
-import pandas as pd
-import random
+import argparse
+import time
 from datetime import datetime, timedelta
-from bridge_sim import generate_bridge_data
+from bridge_sim import generate_bridge_batch
 
 # Configurations
-RECORDS = 1000 # Number of data points
-START_TIME = datetime.now() - timedelta(hours=24)
+RECORDS = 1000 # Default number of data points
+CRITICAL_RATIO = 0.05 # Mix of Normal (95%) and Critical (5%) data
+INTERVAL_S = 90 # Advance time by ~1.5 minutes per row
+CHUNK_ROWS = 1_000_000 # Rows generated per pass (bounds memory on huge runs)
 
-print(f"Generating {RECORDS} rows of structural health data...")
+parser = argparse.ArgumentParser(description="Generate synthetic structural health data.")
+parser.add_argument("--rows", type=int, default=RECORDS, help="Number of rows to generate")
+parser.add_argument("--critical-ratio", type=float, default=CRITICAL_RATIO, help="Fraction of critical rows")
+parser.add_argument("--seed", type=int, default=None, help="Random seed for reproducible output")
+parser.add_argument("--output", default="bridge_data.csv", help="Output CSV path")
+args = parser.parse_args()
 
-data_list = []
-current_time = START_TIME
+print(f"Generating {args.rows} rows of structural health data...")
+start = time.perf_counter()
 
-for i in range(RECORDS):
-    # Simulate a mix of Normal (95%) and Critical (5%) data
-    is_critical = random.random() > 0.95
-    scenario = "critical" if is_critical else "normal"
-    
-    # Generate single data point
-    row = generate_bridge_data(scenario)
-    
-    # Override timestamp to make it a time-series
-    row['timestamp'] = current_time.isoformat()
-    
-    data_list.append(row)
-    
-    # Advance time by ~1.5 minutes
-    current_time += timedelta(minutes=1.5)
+# Time-series always starts 24h ago; runs longer than 24h of rows (960 at 90 s) extend into the future
+start_time = datetime.now() - timedelta(hours=24)
 
-# Create DataFrame
-df = pd.DataFrame(data_list)
+# Generate and write in chunks so tens of millions of rows never sit in memory at once
+written = 0
+chunk_index = 0
+while written < args.rows:
+    n = min(CHUNK_ROWS, args.rows - written)
+    chunk_seed = None if args.seed is None else args.seed + chunk_index
+    df = generate_bridge_batch(
+        n,
+        critical_ratio=args.critical_ratio,
+        seed=chunk_seed,
+        start_time=start_time + timedelta(seconds=written * INTERVAL_S),
+        interval_s=INTERVAL_S,
+    )
+    df.to_csv(
+        args.output,
+        mode="w" if written == 0 else "a",
+        header=written == 0,
+        index=False,
+        date_format="%Y-%m-%dT%H:%M:%S.%f",
+    )
+    written += n
+    chunk_index += 1
 
-# Save to CSV
-output_file = "bridge_data.csv"
-df.to_csv(output_file, index=False)
-
-print(f"✅ Success! Generated '{output_file}' with shape {df.shape}")
+elapsed = time.perf_counter() - start
+print(f"✅ Success! Generated '{args.output}' with {written} rows in {elapsed:.2f}s")
 print("You can verify this file in Excel or use it for offline AI training.")
@@ -0,0 +1,278 @@
+"""
+SetuAayu Image Cache
+
+Content-addressed on-disk cache for reference and inspection photos, so the
+dashboard never waits on Wikimedia or other image hosts:
+
+    image_cache/
+        objects/ab/<sha256>.<ext>      original bytes, named by their hash
+        thumbs/<sha256>_<width>.jpg    pre-generated thumbnails (THUMB_WIDTHS)
+        urls/<sha256 of url>           url -> content hash
+
+`thumbnail_for_url(url)` only ever reads the disk: on a miss it queues a
+background download (a small thread pool) and returns None, and the caller
+shows a placeholder until a later rerun finds the file. Identical images
+behind different URLs are stored once. Uploaded files go through `put`.
+A URL whose download fails is not retried until its backoff (doubling per
+consecutive failure, up to FETCH_MAX_BACKOFF_S) has passed.
+
+Thumbnails are rendered with Pillow.
+
+Usage:
+    python image_cache.py prefetch               # every image in the asset registry
+    python image_cache.py prefetch --url https://...
+    python image_cache.py stats
+"""
+import argparse
+import hashlib
+import io
+import os
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+CACHE_DIR = "image_cache"
+THUMB_WIDTHS = (300, 600) # Sidebar and main-column display widths
+THUMB_QUALITY = 85
+FETCH_TIMEOUT_S = 15
+FETCH_WORKERS = 4
+MAX_IMAGE_BYTES = 50 * 1024 * 1024
+FETCH_BACKOFF_S = 30.0 # First retry delay after a failed download
+FETCH_MAX_BACKOFF_S = 3600.0
+USER_AGENT = "SetuAayu/1.0 (bridge health monitoring dashboard)" # Wikimedia rejects blank agents
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _image_ext(data):
+    if data[:3] == b"\xff\xd8\xff":
+        return "jpg"
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "png"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    return "img"
+
+
+class ImageCache:
+    """Content-addressed image store with thumbnails and non-blocking URL fetches."""
+
+    def __init__(self, root=CACHE_DIR, thumb_widths=THUMB_WIDTHS):
+        self.root = root
+        self.thumb_widths = tuple(thumb_widths)
+        self._pending = {} # url -> Future
+        self._failures = {} # url -> (consecutive failures, monotonic time of the next allowed retry)
+        self._lock = threading.Lock()
+        self._executor = None
+        self.stats = {"hits": 0, "misses": 0, "fetched": 0, "failed": 0}
+
+    # --- Paths ---
+    def _object_path(self, sha, ext):
+        return os.path.join(self.root, "objects", sha[:2], f"{sha}.{ext}")
+
+    def _url_path(self, url):
+        return os.path.join(self.root, "urls", content_hash(url.encode()))
+
+    def thumb_path(self, sha, width):
+        return os.path.join(self.root, "thumbs", f"{sha}_{width}.jpg")
+
+    def object_path(self, sha):
+        """Path of the stored original for `sha`, or None."""
+        folder = os.path.join(self.root, "objects", sha[:2])
+        try:
+            names = os.listdir(folder)
+        except FileNotFoundError:
+            return None
+        for name in names:
+            if name.startswith(sha + "."):
+                return os.path.join(folder, name)
+        return None
+
+    # --- Writes ---
+    def put(self, data):
+        """
+        Stores image bytes (idempotent) and renders its thumbnails.
+
+        Returns:
+            str: The content hash.
+
+        Raises:
+            OSError: If the bytes are not a readable image (PIL's
+                UnidentifiedImageError is an OSError); nothing is stored.
+        """
+        sha = content_hash(data)
+        for width in self.thumb_widths:
+            if not os.path.exists(self.thumb_path(sha, width)):
+                self._render_thumbnails(sha, data)
+                break
+        path = self._object_path(sha, _image_ext(data))
+        if not os.path.exists(path):
+            _atomic_write(path, data)
+        return sha
+
+    def _render_thumbnails(self, sha, data):
+        from PIL import Image
+
+        with Image.open(io.BytesIO(data)) as image:
+            image.draft("RGB", (max(self.thumb_widths), max(self.thumb_widths))) # Fast JPEG downscale on decode
+            image = image.convert("RGB")
+            for width in self.thumb_widths:
+                thumb = image.copy()
+                thumb.thumbnail((width, width * 4))
+                out = io.BytesIO()
+                thumb.save(out, "JPEG", quality=THUMB_QUALITY, optimize=True)
+                _atomic_write(self.thumb_path(sha, width), out.getvalue())
+
+    def fetch(self, url, timeout=FETCH_TIMEOUT_S):
+        """
+        Downloads `url` into the cache (blocking) unless it is already there.
+
+        Returns:
+            str: The content hash.
+
+        Raises:
+            OSError: On network errors or an oversized response.
+        """
+        sha = self.sha_for_url(url)
+        if sha is not None:
+            return sha
+        request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            data = response.read(MAX_IMAGE_BYTES + 1)
+        if len(data) > MAX_IMAGE_BYTES:
+            raise OSError(f"Image larger than {MAX_IMAGE_BYTES} bytes: {url}")
+        sha = self.put(data)
+        _atomic_write(self._url_path(url), sha.encode())
+        return sha
+
+    # --- Reads ---
+    def sha_for_url(self, url):
+        """Content hash of a previously fetched URL, or None."""
+        try:
+            with open(self._url_path(url)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def thumbnail_for_url(self, url, width=THUMB_WIDTHS[0]):
+        """
+        Local thumbnail path for `url` without blocking: None (and a queued
+        background fetch) if the image is not cached yet.
+        """
+        sha = self.sha_for_url(url)
+        if sha is not None:
+            path = self.thumb_path(sha, width)
+            if os.path.exists(path):
+                self.stats["hits"] += 1
+                return path
+        self.stats["misses"] += 1
+        self.fetch_async(url)
+        return None
+
+    def original_for_url(self, url):
+        """Local path of the full-size original for `url`, or None (no fetch)."""
+        sha = self.sha_for_url(url)
+        return None if sha is None else self.object_path(sha)
+
+    def fetch_async(self, url):
+        """
+        Queues a background download of `url` (once per URL while in flight).
+
+        Returns:
+            Future or None: None while a failed URL is backing off.
+        """
+        with self._lock:
+            if url in self._pending:
+                return self._pending[url]
+            failure = self._failures.get(url)
+            if failure is not None and time.monotonic() < failure[1]:
+                return None
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(FETCH_WORKERS, thread_name_prefix="image-fetch")
+            future = self._executor.submit(self._fetch_logged, url)
+            self._pending[url] = future
+            return future
+
+    def _fetch_logged(self, url):
+        try:
+            sha = self.fetch(url)
+            self.stats["fetched"] += 1
+            with self._lock:
+                self._failures.pop(url, None)
+            return sha
+        except Exception:
+            self.stats["failed"] += 1 # Caller keeps showing its placeholder; retried after the backoff
+            with self._lock:
+                count = self._failures.get(url, (0, 0.0))[0] + 1
+                delay = min(FETCH_BACKOFF_S * 2 ** (count - 1), FETCH_MAX_BACKOFF_S)
+                self._failures[url] = (count, time.monotonic() + delay)
+            return None
+        finally:
+            with self._lock:
+                self._pending.pop(url, None)
+
+    def prefetch(self, urls, workers=FETCH_WORKERS):
+        """
+        Downloads many URLs in parallel (blocking).
+
+        Returns:
+            dict: url -> content hash, or the exception for failed URLs.
+        """
+        def one(url):
+            try:
+                return url, self.fetch(url)
+            except Exception as e:
+                return url, e
+        with ThreadPoolExecutor(workers) as pool:
+            return dict(pool.map(one, urls))
+
+    def disk_usage(self):
+        """(files, bytes) per cache area."""
+        usage = {}
+        for area in ("objects", "thumbs", "urls"):
+            files = size = 0
+            for folder, _, names in os.walk(os.path.join(self.root, area)):
+                for name in names:
+                    files += 1
+                    size += os.path.getsize(os.path.join(folder, name))
+            usage[area] = (files, size)
+        return usage
+
+
+def _atomic_write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SetuAayu image cache")
+    parser.add_argument("--root", default=CACHE_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_pre = sub.add_parser("prefetch", help="Download images (default: every asset in the registry)")
+    p_pre.add_argument("--url", action="append", help="URL to fetch (repeatable)")
+    sub.add_parser("stats", help="Cache size on disk")
+    args = parser.parse_args()
+
+    cache = ImageCache(args.root)
+    if args.command == "prefetch":
+        if args.url:
+            urls = args.url
+        else:
+            from asset_registry import get_registry
+            urls = [asset.image_url for asset in get_registry() if asset.image_url]
+        start = time.perf_counter()
+        results = cache.prefetch(urls)
+        for url, result in results.items():
+            mark = "❌" if isinstance(result, Exception) else "✅"
+            print(f"{mark} {url[:80]}  {result if isinstance(result, Exception) else result[:12]}")
+        ok = sum(not isinstance(r, Exception) for r in results.values())
+        print(f"\n{ok}/{len(results)} images cached in {time.perf_counter() - start:.1f}s")
+    else:
+        for area, (files, size) in cache.disk_usage().items():
+            print(f"{area:<8} {files:6d} files  {size / 1e6:8.2f} MB")
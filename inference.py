@@ -0,0 +1,193 @@
+"""
+SetuAayu Inference Module
+
+Single entry point for model scoring. The model is unpickled once per process
+and kept in a cache keyed on the file's mtime and size, so it is reloaded only
+when the model file is replaced (e.g. by `train_model.py`). The active
+model_registry version is used when one exists, else `model.pkl`. If a compact
+export of that exact pickle (forest_model.py, matched by SHA-256) sits next to
+it, the export is loaded instead, which avoids importing scikit-learn. `predict_batch` returns labels and
+probabilities from one pass over the forest.
+
+Usage:
+    python inference.py bench
+"""
+import argparse
+import hashlib
+import os
+import pickle
+import threading
+import time
+
+import numpy as np
+
+from bridge_sim import SENSOR_FIELDS
+from forest_model import CompactForest, forest_dir, is_current
+from instrumentation import counter, timed
+from model_registry import REGISTRY_DIR, ModelRegistry
+
+MODEL_PATH = "model.pkl"
+
+_cache = {}
+_lock = threading.Lock()
+_rows_scored = counter("inference_rows_total", "Rows scored by predict_batch")
+_registry_state = {"key": None, "path": None}
+
+
+def resolve_model_path():
+    """Active model_registry version if there is one, else model.pkl."""
+    state_path = os.path.join(REGISTRY_DIR, "registry.json")
+    try:
+        key = _file_key(state_path)
+    except FileNotFoundError:
+        return MODEL_PATH
+    if _registry_state["key"] != key:
+        _registry_state["path"] = ModelRegistry(REGISTRY_DIR).active_model_path() or MODEL_PATH
+        _registry_state["key"] = key
+    return _registry_state["path"]
+
+
+class LoadedModel:
+    """A loaded model plus the file identity it was loaded from."""
+
+    def __init__(self, model, path, key, sha256):
+        self.model = model
+        self.path = path
+        self.key = key
+        self.sha256 = sha256
+
+
+def _file_key(path):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def get_model(path=None):
+    """
+    Returns the cached model for `path`, reloading it if the file changed.
+    Defaults to the active registry version (see model_registry.py).
+
+    Raises:
+        FileNotFoundError: If the model file does not exist.
+    """
+    path = path or resolve_model_path()
+    key = _file_key(path)
+    entry = _cache.get(path)
+    if entry is not None and entry.key == key:
+        return entry
+
+    with _lock:
+        entry = _cache.get(path)
+        if entry is None or entry.key != key:
+            entry = _load(path, key)
+            _cache[path] = entry
+        return entry
+
+
+@timed("model_load_seconds", "Model file load (compact forest or pickle)")
+def _load(path, key):
+    # Prefer the compact export of this pickle (no sklearn import, no
+    # unpickling) when its recorded hash matches the pickle's bytes
+    with open(path, "rb") as f:
+        raw = f.read()
+    digest = hashlib.sha256(raw).hexdigest()
+    directory = forest_dir(path)
+    if is_current(directory, digest):
+        return LoadedModel(CompactForest(directory), path, key, digest)
+    return LoadedModel(pickle.loads(raw), path, key, digest)
+
+
+def clear_cache():
+    with _lock:
+        _cache.clear()
+
+
+def to_feature_matrix(readings, feature_names=SENSOR_FIELDS):
+    """
+    Builds the (n, n_features) matrix from a reading dict, a list of dicts,
+    a DataFrame or an array-like that is already in `feature_names` order.
+    """
+    feature_names = list(feature_names)
+    if isinstance(readings, dict):
+        readings = [readings]
+    if isinstance(readings, list) and readings and isinstance(readings[0], dict):
+        return np.array([[r[name] for name in feature_names] for r in readings], dtype=np.float64)
+    if hasattr(readings, "columns"):
+        return readings[feature_names].to_numpy(dtype=np.float64)
+    return np.atleast_2d(np.asarray(readings, dtype=np.float64))
+
+
+def feature_names(model):
+    """Features the model was fitted on (raw SENSOR_FIELDS unless trained on windowed features)."""
+    return list(getattr(model, "feature_names_in_", SENSOR_FIELDS))
+
+
+@timed("inference_predict_seconds", "predict_batch calls (feature matrix + predict_proba)")
+def predict_batch(readings, path=None):
+    """
+    Scores a batch of readings with a raw-channel model. Windowed-feature
+    models are scored by scoring_scheduler.py, which runs features.py.
+
+    Args:
+        readings: Anything accepted by `to_feature_matrix`.
+        path (str): Model file to use (default: active model).
+
+    Returns:
+        tuple: (labels, probabilities) where labels is an int array
+        (0 = Normal, 1 = Critical) and probabilities is (n, n_classes).
+
+    Raises:
+        ValueError: If the model takes windowed features.
+    """
+    model = get_model(path).model
+    names = feature_names(model)
+    if not set(names) <= set(SENSOR_FIELDS):
+        raise ValueError("Model was trained on windowed features; score it with scoring_scheduler.py")
+    X = to_feature_matrix(readings, names)
+    probs = model.predict_proba(X)
+    labels = model.classes_[np.argmax(probs, axis=1)]
+    _rows_scored.inc(len(X))
+    return labels, probs
+
+
+def benchmark(path=None, batch_sizes=(1, 10, 100, 1000, 10000), repeats=20, seed=0):
+    """Compares per-row cost of single-row scoring against batched scoring."""
+    rng = np.random.default_rng(seed)
+    path = path or resolve_model_path()
+    get_model(path)  # Warm the cache so load time is not counted
+
+    t = time.perf_counter()
+    clear_cache()
+    get_model(path)
+    print(f"Cold model load        : {(time.perf_counter() - t) * 1000:8.2f} ms")
+
+    t = time.perf_counter()
+    for _ in range(1000):
+        get_model(path)
+    print(f"Cached get_model       : {(time.perf_counter() - t) * 1000:8.4f} µs")
+
+    model = get_model(path).model
+    row = rng.random((1, len(SENSOR_FIELDS)))
+    t = time.perf_counter()
+    for _ in range(repeats):
+        model.predict(row)
+        model.predict_proba(row)
+    legacy = (time.perf_counter() - t) / repeats
+    print(f"Legacy predict+proba   : {legacy * 1000:8.2f} ms/row")
+
+    for n in batch_sizes:
+        X = rng.random((n, len(SENSOR_FIELDS)))
+        t = time.perf_counter()
+        for _ in range(repeats):
+            predict_batch(X, path)
+        elapsed = (time.perf_counter() - t) / repeats
+        print(f"predict_batch n={n:<6}: {elapsed * 1000:8.2f} ms/batch  {elapsed / n * 1e6:10.1f} µs/row")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SetuAayu inference utilities")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_bench = sub.add_parser("bench", help="Single-row vs batched latency")
+    p_bench.add_argument("--model", default=None, help="Model file (default: active model)")
+    args = parser.parse_args()
+    benchmark(args.model)
@@ -0,0 +1,583 @@
+"""
+SetuAayu Telemetry Ingest Service
+
+Serves the routes that `firmware.ino` POSTs to:
+
+* `/api/frames`: binary frames (wire_protocol.py), several samples each.
+  The samples are validated in place and kept as NumPy views until flush.
+* `/api/data`: JSON. A single reading, a JSON array of readings, or an
+  object of the form {"node_id": ..., "readings": [...]}.
+
+Readings are appended to a bounded in-memory buffer and flushed to storage
+in batches by one background task, so no request ever waits on disk I/O.
+Sinks receive each flush as one readings.ReadingBatch (compact structured
+array), not as a list of dicts.
+`GET /metrics` exposes request latencies and buffer counters in the
+Prometheus text format (instrumentation.py).
+
+Usage:
+    python ingest_server.py serve --port 8000 --output telemetry_ingest.csv
+    python ingest_server.py serve --port 8000 --store telemetry_store
+    python ingest_server.py serve --port 8000 --store telemetry_store --rollups rollups
+    python ingest_server.py bench --nodes 200 --seconds 10
+    python ingest_server.py bench --nodes 200 --batch 10 --protocol both
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import math
+import multiprocessing
+import os
+import random
+import socket
+import time
+from datetime import datetime
+
+import instrumentation
+from bridge_sim import SENSOR_FIELDS
+from wire_protocol import CONTENT_TYPE as FRAME_CONTENT_TYPE
+from readings import SCHEMAS, ReadingBatch
+from wire_protocol import decode_frames, encode_frame, frames_to_batch
+
+# Configurations
+DEFAULT_HOST = "0.0.0.0"
+DEFAULT_PORT = 8000
+QUEUE_SIZE = 200_000 # Max readings held in memory before requests get 503
+BATCH_SIZE = 5_000 # Flush as soon as this many readings are buffered
+FLUSH_INTERVAL_S = 1.0 # ...or at least this often
+MAX_BODY_BYTES = 1_000_000
+MAX_FLUSH_RETRIES = 3 # Failed sink writes retried on later flushes before the batch is dropped
+FLOAT32_MAX = 3.4028234663852886e38 # Sensor values are stored as float32
+MAX_TIMESTAMP_S = 9_223_372_036 # Last second datetime64[ns] can hold (2262-04-11)
+
+STORAGE_COLUMNS = SCHEMAS["ingest"]
+
+HTTP_REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found",
+                413: "Payload Too Large", 503: "Service Unavailable"}
+
+
+def _parse_timestamp(value, default):
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        raise ValueError("'timestamp' must be epoch seconds or an ISO string")
+    if isinstance(value, (int, float)):
+        try:
+            value = float(value)
+        except OverflowError:
+            raise ValueError("'timestamp' is out of range") from None
+    elif isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    else:
+        raise ValueError("'timestamp' must be epoch seconds or an ISO string")
+    # NaN / inf / far-future values would become NaT downstream and the row would vanish from storage
+    if not math.isfinite(value) or not 0 <= value <= MAX_TIMESTAMP_S:
+        raise ValueError("'timestamp' must be finite epoch seconds between 1970 and 2262")
+    return value
+
+
+def validate_reading(payload, node_id=None, received_at=None):
+    """
+    Validates one reading and normalises it to the storage schema.
+
+    Args:
+        payload (dict): Decoded JSON object with the five sensor fields.
+        node_id (str): Fallback node id if the payload does not carry one.
+        received_at (float): Fallback epoch timestamp (server receive time).
+
+    Returns:
+        dict: Reading with `timestamp`, `node_id` and float sensor values.
+
+    Raises:
+        ValueError: If a field is missing, non-numeric, not finite or
+            outside the float32 range it is stored in, or the timestamp is
+            not finite or outside 1970-2262.
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("each reading must be a JSON object")
+
+    reading = {
+        "timestamp": _parse_timestamp(payload.get("timestamp"), received_at),
+        "node_id": str(payload.get("node_id") or node_id or "unknown"),
+    }
+    for field in SENSOR_FIELDS:
+        value = payload.get(field)
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"'{field}' is missing or not a number")
+        try:
+            value = float(value)
+        except OverflowError: # JSON integers are unbounded
+            raise ValueError(f"'{field}' is out of range") from None
+        if not math.isfinite(value):
+            raise ValueError(f"'{field}' must be finite")
+        if abs(value) > FLOAT32_MAX:
+            raise ValueError(f"'{field}' is out of range")
+        reading[field] = value
+    return reading
+
+
+def parse_payload(body, node_id=None, received_at=None):
+    """
+    Decodes a request body into a list of validated readings.
+
+    Accepts a single reading, a list of readings, or {"node_id", "readings"}.
+    The whole body is rejected if any reading is invalid.
+    """
+    payload = json.loads(body)
+    if isinstance(payload, dict) and "readings" in payload:
+        node_id = payload.get("node_id") or node_id
+        payload = payload["readings"]
+    if isinstance(payload, dict):
+        payload = [payload]
+    if not isinstance(payload, list) or not payload:
+        raise ValueError("body must be a reading, a non-empty list, or {'readings': [...]}")
+    return [validate_reading(item, node_id, received_at) for item in payload]
+
+
+class CsvSink:
+    """Appends flushed batches to a CSV file (header written once, epoch-second timestamps)."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, batch):
+        write_header = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        df = batch.to_frame("ingest")
+        df["timestamp"] = batch.data["timestamp_ms"] / 1000.0
+        df.to_csv(self.path, mode="a", header=write_header, index=False)
+
+
+class NullSink:
+    """Discards batches. Used by the benchmark to isolate ingest cost."""
+
+    def __call__(self, batch):
+        pass
+
+
+class IngestService:
+    """
+    Bounded buffer + batched flusher behind a minimal asyncio HTTP/1.1 server.
+
+    Connections are kept alive, so a node can stream requests over one socket.
+    Routes are looked up in `self.routes`, keyed on (method, path).
+    """
+
+    def __init__(self, sink, queue_size=QUEUE_SIZE, batch_size=BATCH_SIZE,
+                 flush_interval=FLUSH_INTERVAL_S):
+        self.sink = sink
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.buffer = []
+        self.frames = [] # Decoded frames, expanded to readings at flush time
+        self.buffered = 0
+        self.stats = {"requests": 0, "accepted": 0, "rejected": 0, "dropped": 0,
+                      "flushed": 0, "batches": 0, "flush_errors": 0, "lost": 0}
+        self._failed_flushes = 0 # Consecutive failed sink writes
+        self.routes = {
+            ("POST", "/api/data"): self.handle_data,
+            ("POST", "/api/frames"): self.handle_frames,
+            ("GET", "/health"): self.handle_health,
+            ("GET", "/metrics"): self.handle_metrics,
+        }
+        self._flush_wanted = None
+        self._flush_task = None
+        self._stopping = False
+        self._server = None
+
+    # --- Buffer ---
+    def submit(self, readings):
+        """Queues readings without blocking. Returns False if the buffer is full."""
+        if not self._reserve(len(readings)):
+            return False
+        self.buffer.extend(readings)
+        return True
+
+    def submit_frames(self, frames):
+        """Queues decoded binary frames as-is. Returns False if the buffer is full."""
+        if not self._reserve(sum(len(frame.samples) for frame in frames)):
+            return False
+        self.frames.extend(frames)
+        return True
+
+    def _reserve(self, n):
+        if self.buffered + n > self.queue_size:
+            self.stats["dropped"] += n
+            return False
+        self.buffered += n
+        self.stats["accepted"] += n
+        if self.buffered >= self.batch_size:
+            self._flush_wanted.set()
+        return True
+
+    async def _flush_loop(self):
+        loop = asyncio.get_running_loop()
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._flush_wanted.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_wanted.clear()
+            await self._flush_once(loop)
+
+    async def _flush_once(self, loop):
+        if not self.buffered:
+            return
+        batch, frames, buffered = self.buffer, self.frames, self.buffered
+        self.buffer, self.frames, self.buffered = [], [], 0
+        # Frame expansion and storage writes run in a worker thread so the event loop keeps serving
+        try:
+            with instrumentation.timer("ingest_flush_seconds", "Batch expansion + sink write"):
+                flushed = await loop.run_in_executor(None, self._write, batch, frames)
+        except Exception as e: # A failing sink must not kill the flush loop
+            self.stats["flush_errors"] += 1
+            self._failed_flushes += 1
+            if self._failed_flushes <= MAX_FLUSH_RETRIES:
+                # Back in front of whatever arrived meanwhile; the next flush retries it
+                self.buffer[:0], self.frames[:0] = batch, frames
+                self.buffered += buffered
+                print(f"⚠️ Ingest flush failed ({e!r}); retry {self._failed_flushes}/{MAX_FLUSH_RETRIES}")
+            else:
+                self._failed_flushes = 0
+                self.stats["lost"] += buffered
+                print(f"❌ Ingest flush failed ({e!r}); dropped {buffered} readings")
+            return
+        self._failed_flushes = 0
+        self.stats["flushed"] += flushed
+        self.stats["batches"] += 1
+
+    def _write(self, batch, frames):
+        readings = ReadingBatch.concat([ReadingBatch.from_dicts(batch), frames_to_batch(frames)])
+        self.sink(readings)
+        return len(readings)
+
+    # --- Routes ---
+    def handle_data(self, headers, body, peer):
+        # Host only: the client's port changes on every reconnect
+        node_id = headers.get("x-node-id") or (peer[0] if peer else None)
+        try:
+            readings = parse_payload(body, node_id=node_id, received_at=time.time())
+        except (ValueError, OverflowError) as e:
+            self.stats["rejected"] += 1
+            return 400, {"error": str(e)}
+        if not self.submit(readings):
+            return 503, {"error": "ingest buffer full, retry later"}
+        return 202, {"accepted": len(readings)}
+
+    def handle_frames(self, headers, body, peer):
+        try:
+            frames = decode_frames(body, received_at=time.time())
+        except ValueError as e:
+            self.stats["rejected"] += 1
+            return 400, {"error": str(e)}
+        if not self.submit_frames(frames):
+            return 503, {"error": "ingest buffer full, retry later"}
+        return 202, {"accepted": sum(len(frame.samples) for frame in frames)}
+
+    def handle_health(self, headers, body, peer):
+        return 200, dict(self.stats, buffered=self.buffered, cpu_s=time.process_time())
+
+    def handle_metrics(self, headers, body, peer):
+        # Prometheus text format (str payloads are sent as text/plain)
+        gauges = {f"ingest_{key}": value for key, value in self.stats.items()}
+        gauges.update(ingest_buffered=self.buffered, process_cpu_seconds=time.process_time())
+        return 200, instrumentation.render_prometheus(gauges)
+
+    # --- HTTP ---
+    async def handle_client(self, reader, writer):
+        peer = writer.get_extra_info("peername")
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, version = request_line.decode("latin-1").rstrip().split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" and (version != "HTTP/1.0" or connection == "keep-alive")
+
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY_BYTES:
+                    status, payload, keep_alive = 413, {"error": "body too large"}, False
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    self.stats["requests"] += 1
+                    route = path.split("?", 1)[0]
+                    handler = self.routes.get((method, route))
+                    if handler is None:
+                        status, payload = 404, {"error": f"no route for {method} {path}"}
+                    else:
+                        with instrumentation.timer("ingest_request_seconds", "Ingest request handling",
+                                                   labels={"route": route}):
+                            status, payload = handler(headers, body, peer)
+
+                writer.write(_http_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self._flush_wanted = asyncio.Event()
+        self._flush_task = asyncio.create_task(self._flush_loop())
+        self._server = await asyncio.start_server(self.handle_client, host, port)
+        return self._server
+
+    async def stop(self):
+        """Stops accepting connections and flushes whatever is still buffered."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._flush_task is not None:
+            # Let the loop finish its current executor write instead of cancelling it
+            # mid-write, so the final flush and sink.close() never overlap it
+            self._stopping = True
+            self._flush_wanted.set()
+            await self._flush_task
+        await self._flush_once(asyncio.get_running_loop())
+        if hasattr(self.sink, "close"): # e.g. RollupSink writes its pending buckets
+            self.sink.close()
+
+
+def _http_response(status, payload, keep_alive):
+    if isinstance(payload, (bytes, str)):
+        body = payload.encode() if isinstance(payload, str) else payload
+        content_type = "text/plain; charset=utf-8"
+    else:
+        body = json.dumps(payload).encode()
+        content_type = "application/json"
+    head = (
+        f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    return head.encode("latin-1") + body
+
+
+async def serve(host, port, sink, **kwargs):
+    service = IngestService(sink, **kwargs)
+    server = await service.start(host, port)
+    print(f"📡 Ingest service listening on http://{host}:{port}/api/data")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+
+# --- Simulated Fleet (fake ESP32 nodes) ---
+
+def fake_reading(node_id):
+    return {
+        "node_id": node_id,
+        "vibration_x": round(random.uniform(0.001, 0.25), 4),
+        "vibration_y": round(random.uniform(0.001, 0.25), 4),
+        "vibration_z": round(random.uniform(0.001, 0.25), 4),
+        "strain": round(random.uniform(10, 100), 2),
+        "tilt": round(random.uniform(-0.5, 0.5), 2),
+    }
+
+
+async def _fake_node(host, port, index, deadline, rate_hz, batch, latencies, statuses, wire, protocol="json"):
+    node_id = f"NODE-{index:04d}"
+    reader, writer = await asyncio.open_connection(host, port)
+    period = 1.0 / rate_hz if rate_hz else 0.0
+    next_send = time.perf_counter()
+    seq = 0
+    try:
+        while time.perf_counter() < deadline:
+            if protocol == "binary":
+                samples = [[r[field] for field in SENSOR_FIELDS] for r in (fake_reading(node_id) for _ in range(batch))]
+                body = encode_frame(index, seq, int(time.time() * 1000), 100, samples)
+                path, content_type = "/api/frames", FRAME_CONTENT_TYPE
+                seq += 1
+            else:
+                if batch > 1:
+                    body = json.dumps({"node_id": node_id, "readings": [fake_reading(node_id) for _ in range(batch)]})
+                else:
+                    body = json.dumps(fake_reading(node_id))
+                body = body.encode()
+                path, content_type = "/api/data", "application/json"
+            request = (
+                f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n"
+            ).encode() + body
+
+            sent_at = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            status_line = await reader.readline()
+            status = int(status_line.split()[1])
+            received = len(status_line)
+            length = 0
+            while True:
+                line = await reader.readline()
+                received += len(line)
+                if line in (b"\r\n", b""):
+                    break
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":")[1])
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - sent_at)
+            statuses[status] = statuses.get(status, 0) + 1
+            wire["sent"] += len(request)
+            wire["received"] += received + length
+
+            if period:
+                next_send += period
+                delay = next_send - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+    finally:
+        writer.close()
+
+
+async def run_fleet(host, port, nodes, seconds, rate_hz=10.0, batch=1, protocol="json"):
+    """
+    Drives `nodes` fake ESP32 clients against a running ingest service.
+
+    Args:
+        protocol (str): "json" (POST /api/data) or "binary" (POST /api/frames,
+            one wire_protocol frame of `batch` samples per request).
+
+    Returns:
+        dict: requests/sec, readings/sec, latency percentiles (ms) and bytes
+        on the wire per reading (request + response, HTTP headers included).
+    """
+    latencies, statuses = [], {}
+    wire = {"sent": 0, "received": 0}
+    start = time.perf_counter()
+    deadline = start + seconds
+    await asyncio.gather(*[
+        _fake_node(host, port, i, deadline, rate_hz, batch, latencies, statuses, wire, protocol)
+        for i in range(nodes)
+    ])
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] * 1000 if latencies else float("nan")
+
+    readings = statuses.get(202, 0) * batch
+    return {
+        "nodes": nodes,
+        "protocol": protocol,
+        "requests": len(latencies),
+        "readings": readings,
+        "requests_per_s": len(latencies) / elapsed,
+        "readings_per_s": readings / elapsed,
+        "p50_ms": pct(50),
+        "p99_ms": pct(99),
+        "statuses": statuses,
+        "bytes_per_reading": (wire["sent"] + wire["received"]) / max(readings, 1),
+    }
+
+
+def _serve_in_child(port):
+    asyncio.run(serve("127.0.0.1", port, NullSink()))
+
+
+def _server_cpu(port):
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    conn.request("GET", "/health")
+    stats = json.loads(conn.getresponse().read())
+    conn.close()
+    return stats["cpu_s"]
+
+
+def benchmark(nodes, seconds, rate_hz, batch, port, protocol="json"):
+    """
+    Starts a server in a separate process (NullSink) and hammers it with the fake fleet.
+
+    Server CPU per reading comes from the server's own process time (`/health`)
+    before and after the run, and includes flushing.
+    """
+    server = multiprocessing.Process(target=_serve_in_child, args=(port,), daemon=True)
+    server.start()
+    try:
+        # Wait for the listener to come up
+        for _ in range(100):
+            try:
+                with socket.create_connection(("127.0.0.1", port), timeout=0.1):
+                    break
+            except OSError:
+                time.sleep(0.05)
+        cpu_before = _server_cpu(port)
+        result = asyncio.run(run_fleet("127.0.0.1", port, nodes, seconds, rate_hz, batch, protocol))
+        time.sleep(FLUSH_INTERVAL_S * 1.5) # Let the last flush happen
+        cpu = _server_cpu(port) - cpu_before
+        result["server_cpu_us_per_reading"] = cpu / max(result["readings"], 1) * 1e6
+        return result
+    finally:
+        server.terminate()
+        server.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SetuAayu telemetry ingest service")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_serve = sub.add_parser("serve", help="Run the ingest HTTP service")
+    p_serve.add_argument("--host", default=DEFAULT_HOST)
+    p_serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+    p_serve.add_argument("--output", default="telemetry_ingest.csv", help="CSV file batches are appended to")
+    p_serve.add_argument("--store", help="Write batches to this columnar store directory instead of CSV")
+    p_serve.add_argument("--rollups", help="Also maintain 1 s / 1 min / 1 h rollups in this directory")
+    p_serve.add_argument("--no-metrics", action="store_true", help="Skip per-request timing (/metrics keeps the counters)")
+
+    p_fleet = sub.add_parser("fleet", help="Run a fake node fleet against an existing server")
+    p_bench = sub.add_parser("bench", help="Start a local server and measure throughput / p99 latency")
+    for p in (p_fleet, p_bench):
+        p.add_argument("--nodes", type=int, default=200)
+        p.add_argument("--seconds", type=float, default=10.0)
+        p.add_argument("--rate", type=float, default=10.0, help="Requests/sec per node (0 = as fast as possible)")
+        p.add_argument("--batch", type=int, default=1, help="Readings per request")
+    p_fleet.add_argument("--protocol", choices=["json", "binary"], default="json")
+    p_bench.add_argument("--protocol", choices=["json", "binary", "both"], default="json")
+    p_fleet.add_argument("--host", default="127.0.0.1")
+    p_fleet.add_argument("--port", type=int, default=DEFAULT_PORT)
+    p_bench.add_argument("--port", type=int, default=8765)
+
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        instrumentation.enable(not args.no_metrics)
+        if args.store:
+            from telemetry_store import StoreSink, TelemetryStore
+            sink = StoreSink(TelemetryStore(args.store))
+        else:
+            sink = CsvSink(args.output)
+        if args.rollups:
+            from rollups import RollupSink, RollupStore
+            sink = RollupSink(RollupStore(args.rollups), sink)
+        asyncio.run(serve(args.host, args.port, sink))
+    else:
+        if args.command == "fleet":
+            results = [asyncio.run(run_fleet(args.host, args.port, args.nodes, args.seconds, args.rate,
+                                             args.batch, args.protocol))]
+        else:
+            protocols = ["json", "binary"] if args.protocol == "both" else [args.protocol]
+            results = [benchmark(args.nodes, args.seconds, args.rate, args.batch, args.port, protocol)
+                       for protocol in protocols]
+        for result in results:
+            print(f"--- Ingest Benchmark ({result['nodes']} nodes, {result['protocol']}) ---")
+            print(f"Requests/sec : {result['requests_per_s']:.0f}")
+            print(f"Readings/sec : {result['readings_per_s']:.0f}")
+            print(f"Latency p50  : {result['p50_ms']:.2f} ms")
+            print(f"Latency p99  : {result['p99_ms']:.2f} ms")
+            print(f"Wire bytes   : {result['bytes_per_reading']:.1f} B/reading")
+            if "server_cpu_us_per_reading" in result:
+                print(f"Server CPU   : {result['server_cpu_us_per_reading']:.2f} µs/reading")
+            print(f"Statuses     : {result['statuses']}")
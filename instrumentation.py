@@ -0,0 +1,330 @@
+"""
+SetuAayu Instrumentation
+
+Process-wide counters and latency histograms for the hot paths, with
+decorator and context-manager hooks:
+
+    from instrumentation import timed, timer, counter
+
+    @timed("inference_predict_seconds")
+    def predict_batch(...): ...
+
+    with timer("app_rerun_seconds"):
+        ...
+    counter("inference_rows_total").inc(len(X))
+
+Everything is off by default and costs one global flag check per call
+while off. Turn it on with SETUAAYU_METRICS=1 or `enable()` (the ingest and
+scoring services do). Metrics are exposed in the Prometheus text format via
+`render_prometheus()`: on the ingest service's `/metrics` route, or on a
+small standalone endpoint (`serve_in_thread`) for processes without an HTTP
+server, such as the dashboard.
+
+A per-thread trace (`start_trace` / `end_trace`) collects the individual
+timings of one unit of work, e.g. one Streamlit rerun, for the dashboard's
+timing panel.
+
+Usage:
+    python instrumentation.py overhead
+"""
+import argparse
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PREFIX = "setuaayu_"
+METRICS_PORT = 9108
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+ENABLED = os.environ.get("SETUAAYU_METRICS") == "1"
+
+_registry = {} # (name, labels) -> Counter / Histogram
+_help = {}
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def enable(flag=True):
+    global ENABLED
+    ENABLED = bool(flag)
+
+
+def enabled():
+    return ENABLED
+
+
+class Counter:
+    """Monotonic counter."""
+
+    kind = "counter"
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        if not ENABLED:
+            return
+        with self._lock:
+            self.value += amount
+
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus semantics: le = upper bound)."""
+
+    kind = "histogram"
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1) # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        if not ENABLED:
+            return
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+
+def _get(cls, name, help, labels, **kwargs):
+    key = (name, tuple(sorted(labels.items())) if labels else ())
+    metric = _registry.get(key)
+    if metric is None:
+        with _lock:
+            metric = _registry.get(key)
+            if metric is None:
+                metric = _registry[key] = cls(**kwargs)
+                if help:
+                    _help[name] = help
+    return metric
+
+
+def counter(name, help="", labels=None):
+    """Returns the counter for `name` (and `labels`), creating it on first use."""
+    return _get(Counter, name, help, labels)
+
+
+def histogram(name, help="", labels=None, buckets=LATENCY_BUCKETS):
+    """Returns the histogram for `name` (and `labels`), creating it on first use."""
+    return _get(Histogram, name, help, labels, buckets=buckets)
+
+
+def _record(hist, name, seconds):
+    hist.observe(seconds)
+    trace = getattr(_local, "trace", None)
+    if trace is not None:
+        trace.append((name, seconds))
+
+
+class _Timer:
+    __slots__ = ("hist", "name", "start")
+
+    def __init__(self, hist, name):
+        self.hist = hist
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        _record(self.hist, self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(name, help="", labels=None):
+    """Context manager that records its block's duration into a histogram."""
+    if not ENABLED:
+        return _NULL_TIMER
+    return _Timer(histogram(name, help, labels), name)
+
+
+def record(name, seconds, help="", labels=None):
+    """Records a duration measured by the caller (e.g. across a whole script run)."""
+    if ENABLED:
+        _record(histogram(name, help, labels), name, seconds)
+
+
+def timed(name, help=""):
+    """Decorator that records each call's duration into a histogram."""
+    def wrap(fn):
+        hist = histogram(name, help)
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _record(hist, name, time.perf_counter() - start)
+        return inner
+    return wrap
+
+
+# --- Per-request traces ---
+def start_trace():
+    """Starts collecting (name, seconds) for every timing on this thread."""
+    _local.trace = []
+
+
+def end_trace():
+    """Stops the current thread's trace and returns its timings, oldest first."""
+    trace = getattr(_local, "trace", None)
+    _local.trace = None
+    return trace or []
+
+
+# --- Exposition ---
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+def render_prometheus(gauges=None):
+    """
+    All metrics in the Prometheus text exposition format.
+
+    Args:
+        gauges (dict): Extra point-in-time values to include, name -> number
+            (e.g. a service's buffer depth).
+    """
+    lines = []
+    for name, value in (gauges or {}).items():
+        lines.append(f"# TYPE {PREFIX}{name} gauge")
+        lines.append(f"{PREFIX}{name} {value}")
+    by_name = {}
+    for (name, labels), metric in sorted(_registry.items(), key=lambda item: item[0]):
+        by_name.setdefault(name, []).append((labels, metric))
+    for name, series in by_name.items():
+        full = PREFIX + name
+        if name in _help:
+            lines.append(f"# HELP {full} {_help[name]}")
+        lines.append(f"# TYPE {full} {series[0][1].kind}")
+        for labels, metric in series:
+            if metric.kind == "counter":
+                lines.append(f"{full}{_format_labels(labels)} {metric.value}")
+                continue
+            with metric._lock:
+                counts, total, count = list(metric.counts), metric.sum, metric.count
+            cumulative = 0
+            for bound, n in zip(metric.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{full}_bucket{_format_labels(labels, [('le', le)])} {cumulative}")
+            lines.append(f"{full}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{full}_count{_format_labels(labels)} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def summary():
+    """{name: (count, total seconds)} for every histogram, summed over labels."""
+    out = {}
+    for (name, _labels), metric in list(_registry.items()):
+        if metric.kind == "histogram":
+            count, total = out.get(name, (0, 0.0))
+            out[name] = (count + metric.count, total + metric.sum)
+    return out
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve_in_thread(host="127.0.0.1", port=METRICS_PORT):
+    """
+    Serves GET /metrics on a daemon thread.
+
+    Raises:
+        OSError: If the port is already taken.
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def overhead_check(n=200_000):
+    """
+    Per-call cost of the hooks on a trivial function.
+
+    Returns:
+        dict: ns/call for the bare call, and for `timed` / `timer` disabled and enabled.
+    """
+    was_enabled = ENABLED
+
+    def bare():
+        return None
+
+    wrapped = timed("overhead_check_seconds")(bare)
+
+    def with_timer():
+        with timer("overhead_check_seconds"):
+            return None
+
+    def per_call(fn):
+        best = float("inf")
+        for _ in range(3):
+            start = time.perf_counter()
+            for _ in range(n):
+                fn()
+            best = min(best, (time.perf_counter() - start) / n * 1e9)
+        return best
+
+    try:
+        enable(False)
+        result = {"bare_ns": per_call(bare), "timed_off_ns": per_call(wrapped), "timer_off_ns": per_call(with_timer)}
+        enable(True)
+        result.update({"timed_on_ns": per_call(wrapped), "timer_on_ns": per_call(with_timer)})
+    finally:
+        enable(was_enabled)
+        with _lock:
+            _registry.pop(("overhead_check_seconds", ()), None)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SetuAayu instrumentation")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("overhead", help="Measure hook overhead with metrics off and on")
+    args = parser.parse_args()
+
+    result = overhead_check()
+    print("--- Instrumentation overhead (per call) ---")
+    for key, value in result.items():
+        print(f"{key:<14} {value:8.1f} ns")
@@ -0,0 +1,539 @@
+"""
+SetuAayu LLM Analysis
+
+Asyncio client for the dashboard's "Run AI Analysis" (OpenAI chat completions),
+built for many bridges at once rather than one blocking call per click:
+
+* Concurrency limit: at most `concurrency` requests in flight (asyncio.Semaphore).
+* Retries: 429 / 5xx / timeouts / dropped connections are retried with
+  exponential backoff and jitter, honouring Retry-After.
+* Coalescing: identical prompts that are already in flight share one request.
+* Cache: responses are content-addressed by SHA-256 of (model, prompt). The
+  prompt is built from readings quantized to engineering resolution, so
+  readings that only differ by sensor noise hit the same entry. Kept in
+  memory and, optionally, as one JSON file per key under `llm_cache/`.
+
+The dashboard shares one client per Streamlit process (running on its own
+event-loop thread), so the limit, the cache and coalescing apply across all
+sessions.
+
+`MockLLMServer` is a local OpenAI-compatible endpoint (POST
+/v1/chat/completions) with configurable latency, rate limiting and error
+rate, for working fully offline:
+
+    python llm_analysis.py mock --port 8765 --latency 0.3
+    OPENAI_API_KEY=mock OPENAI_BASE_URL=http://127.0.0.1:8765/v1 streamlit run app.py
+
+Usage:
+    python llm_analysis.py bench --bridges 1000 --rounds 3
+    python llm_analysis.py mock --port 8765
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+
+import instrumentation
+from anomaly import check_thresholds
+
+DEFAULT_MODEL = os.environ.get("SETUAAYU_LLM_MODEL", "gpt-4o-mini")
+CACHE_DIR = "llm_cache"
+CONCURRENCY = 8
+MAX_RETRIES = 4
+BACKOFF_S = 0.5 # First retry delay; doubles per attempt
+MAX_BACKOFF_S = 20.0
+TIMEOUT_S = 30.0 # Per attempt
+CALL_TIMEOUT_S = 90.0 # Whole analysis including retries, for synchronous callers
+MOCK_PORT = 8765
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+# Resolution each field is rounded to before it goes into the prompt (and so the cache key)
+QUANTA = {
+    "vibration_x": 0.05, # g
+    "vibration_y": 0.05,
+    "vibration_z": 0.05,
+    "strain": 25.0, # µε
+    "tilt": 0.25, # °
+    "traffic_load": 1000, # PCU/hr
+    "health_score": 5,
+}
+
+SYSTEM_PROMPT = (
+    "You are a bridge structural-health engineer. Given one set of sensor readings, "
+    "assess the structure's condition in at most five short bullet points: condition "
+    "(CRITICAL or NORMAL), the readings that drive it, and the recommended actions."
+)
+
+_READINGS_RE = re.compile(r"Readings: (\{.*?\})")
+
+
+class LLMError(Exception):
+    """The analysis request failed after all retries."""
+
+
+def quantize(reading):
+    """
+    Rounds the prompt fields of a reading to their QUANTA (missing fields are skipped).
+
+    Fields beyond an engineering limit (`check_thresholds`) are rounded away
+    from the limit, so a reading just over it (e.g. 0.32 g) can never be
+    rounded back onto it (0.3 g) and lose the exceedance.
+
+    Returns:
+        dict: field -> quantized value, in QUANTA order.
+    """
+    values = {field: float(reading[field]) for field in QUANTA if reading.get(field) is not None}
+    exceeded = {field for field, _, _ in check_thresholds(values)}
+    out = {}
+    for field, value in values.items():
+        step = QUANTA[field]
+        if field not in exceeded:
+            steps = round(value / step)
+        elif field == "health_score": # Lower limit
+            steps = math.floor(value / step)
+        else: # Upper limits (tilt on both sides): away from zero
+            steps = math.copysign(math.ceil(abs(value) / step), value)
+        value = steps * step
+        out[field] = int(value) if isinstance(step, int) else round(value, 4)
+    return out
+
+
+def build_messages(reading):
+    """Chat messages for one reading. Deterministic for equal quantized readings."""
+    readings = json.dumps(quantize(reading), sort_keys=True)
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": f"Readings: {readings}"},
+    ]
+
+
+def cache_key(model, messages):
+    """SHA-256 of the model and the exact messages (the prompt content address)."""
+    blob = json.dumps({"model": model, "messages": messages}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    Content-addressed response store: memory, backed by `directory` if given.
+
+    Entries are immutable (the key is the hash of the prompt), so there is no
+    invalidation; delete the directory to start over.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self._memory = {}
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                return self._memory[key]
+        if not self.directory:
+            return None
+        try:
+            with open(self._path(key)) as f:
+                content = json.load(f)["content"]
+        except (OSError, ValueError, KeyError):
+            return None
+        with self._lock:
+            self._memory[key] = content
+        return content
+
+    def put(self, key, content, meta=None):
+        with self._lock:
+            self._memory[key] = content
+        if not self.directory:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"content": content, **(meta or {})}, f)
+        os.replace(tmp, path) # Atomic: readers never see a half-written entry
+
+    def __len__(self):
+        return len(self._memory)
+
+
+class LLMClient:
+    """
+    Async, rate-limited, coalescing and caching chat-completions client.
+
+    Must be used from a single event loop (the semaphore and the in-flight
+    table belong to it); see `BackgroundRunner` for calling it from threads.
+
+    Args:
+        api_key (str): OpenAI key (default: $OPENAI_API_KEY).
+        base_url (str): API root (default: $OPENAI_BASE_URL or OpenAI), e.g. the mock server.
+        model (str): Chat model name.
+        concurrency (int): Maximum requests in flight.
+        max_retries (int): Retries per request after the first attempt.
+        backoff_s (float): First retry delay, doubled per attempt (with jitter).
+        timeout_s (float): Per-attempt timeout.
+        cache (ResponseCache): Response cache (default: in-memory only).
+    """
+
+    def __init__(self, api_key=None, base_url=None, model=DEFAULT_MODEL, concurrency=CONCURRENCY,
+                 max_retries=MAX_RETRIES, backoff_s=BACKOFF_S, timeout_s=TIMEOUT_S, cache=None):
+        from openai import AsyncOpenAI # Lazy: ~0.5 s import, only needed once a client is made
+
+        # The SDK's own retries are off so attempts, backoff and stats are ours
+        self._openai = AsyncOpenAI(api_key=api_key or os.environ.get("OPENAI_API_KEY"),
+                                   base_url=base_url or os.environ.get("OPENAI_BASE_URL"),
+                                   max_retries=0, timeout=timeout_s)
+        self.model = model
+        self.max_retries = max_retries
+        self.backoff_s = backoff_s
+        self.cache = cache if cache is not None else ResponseCache()
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._inflight = {} # cache key -> Task
+        self.stats = {"requests": 0, "cache_hits": 0, "coalesced": 0, "api_calls": 0,
+                      "retries": 0, "errors": 0, "tokens": 0}
+
+    async def analyze(self, reading):
+        """
+        Analysis text for one reading.
+
+        Raises:
+            LLMError: If the API still fails after all retries.
+        """
+        return await self.complete(build_messages(reading))
+
+    async def analyze_many(self, readings):
+        """
+        Analyses for many readings, in input order. Failures come back as
+        LLMError instances instead of aborting the whole batch.
+        """
+        return await asyncio.gather(*(self.analyze(r) for r in readings), return_exceptions=True)
+
+    async def complete(self, messages):
+        """Cached / coalesced completion of `messages` (see the module docstring)."""
+        self.stats["requests"] += 1
+        key = cache_key(self.model, messages)
+        content = self.cache.get(key)
+        if content is not None:
+            self.stats["cache_hits"] += 1
+            instrumentation.counter("llm_cache_hits_total", "LLM analyses served from the cache").inc()
+            return content
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+        else:
+            task = asyncio.ensure_future(self._fetch(key, messages))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _t: self._inflight.pop(key, None))
+        # Shielded: one waiter being cancelled must not cancel the request for the others
+        return await asyncio.shield(task)
+
+    async def _fetch(self, key, messages):
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    self.stats["api_calls"] += 1
+                    with instrumentation.timer("llm_request_seconds", "LLM API request latency"):
+                        response = await self._openai.chat.completions.create(
+                            model=self.model, messages=messages, temperature=0)
+                break
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    self.stats["errors"] += 1
+                    raise LLMError(f"LLM request failed after {attempt + 1} attempt(s): {e}") from e
+                attempt += 1
+                self.stats["retries"] += 1
+                await asyncio.sleep(delay)
+
+        content = response.choices[0].message.content or ""
+        if response.usage is not None:
+            self.stats["tokens"] += response.usage.total_tokens
+        self.cache.put(key, content, {"model": self.model, "messages": messages, "created": int(time.time())})
+        return content
+
+    def _retry_delay(self, error, attempt):
+        """Seconds to wait before retrying `error`, or None if it is not retryable."""
+        from openai import APIConnectionError, APIStatusError
+
+        if attempt >= self.max_retries:
+            return None
+        if isinstance(error, APIStatusError):
+            if error.status_code not in RETRY_STATUSES:
+                return None
+            retry_after = error.response.headers.get("retry-after")
+            if retry_after:
+                try: # Jittered so rate-limited requests do not all come back at once
+                    return min(float(retry_after), MAX_BACKOFF_S) * random.uniform(1.0, 1.5)
+                except ValueError:
+                    pass
+        elif not isinstance(error, (APIConnectionError, asyncio.TimeoutError)): # Includes APITimeoutError
+            return None
+        return min(self.backoff_s * 2 ** attempt, MAX_BACKOFF_S) * random.uniform(0.5, 1.5)
+
+    def hit_rate(self):
+        """Share of requests answered without an API call of their own (cache + coalesced)."""
+        served = self.stats["cache_hits"] + self.stats["coalesced"]
+        return served / self.stats["requests"] if self.stats["requests"] else 0.0
+
+    async def aclose(self):
+        await self._openai.close()
+
+
+class BackgroundRunner:
+    """
+    An LLMClient on a private event-loop thread, callable from synchronous
+    code (Streamlit script threads): `runner.analyze(reading, timeout)`.
+    """
+
+    def __init__(self, **client_kwargs):
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, name="llm-analysis", daemon=True).start()
+        self.client = self.call(self._make_client(client_kwargs))
+
+    async def _make_client(self, kwargs):
+        return LLMClient(**kwargs) # Created on the loop that will use it
+
+    def call(self, coro, timeout=None):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def analyze(self, reading, timeout=CALL_TIMEOUT_S):
+        return self.call(self.client.analyze(reading), timeout)
+
+
+# --- Local mock server ---
+def mock_analysis(messages):
+    """The mock's reply: a rule-based assessment of the readings in the prompt."""
+    match = _READINGS_RE.search(messages[-1]["content"]) if messages else None
+    if not match:
+        return "Unable to parse readings."
+    reading = json.loads(match.group(1))
+    violations = check_thresholds(reading)
+    if not violations:
+        return ("- **Condition:** NORMAL\n- All readings are within engineering limits.\n"
+                "- **Action:** Routine inspection as scheduled.")
+    lines = ["- **Condition:** CRITICAL"]
+    lines += [f"- **{field}** at {value} exceeds the limit of {limit}." for field, value, limit in violations]
+    lines.append("- **Action:** Restrict heavy vehicles and schedule non-destructive testing this week.")
+    return "\n".join(lines)
+
+
+class MockLLMServer:
+    """
+    Minimal OpenAI-compatible chat-completions endpoint on asyncio streams.
+
+    Args:
+        latency_s (float): Response delay (plus up to 50% jitter), like a real model.
+        max_concurrency (int): Requests beyond this many in flight get 429 + Retry-After.
+        error_rate (float): Share of requests answered with a random 500 / 503.
+    """
+
+    def __init__(self, latency_s=0.3, max_concurrency=16, error_rate=0.0, seed=None):
+        self.latency_s = latency_s
+        self.max_concurrency = max_concurrency
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._active = 0
+        self.server = None
+        self.stats = {"requests": 0, "completions": 0, "rate_limited": 0, "errors": 0, "peak_concurrency": 0}
+
+    async def start(self, host="127.0.0.1", port=MOCK_PORT):
+        self.server = await asyncio.start_server(self._handle_client, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def _handle_client(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                status, payload, extra = await self._route(method, path.split("?", 1)[0], body)
+                data = json.dumps(payload).encode()
+                head = f"HTTP/1.1 {status} {_REASONS.get(status, 'Error')}\r\nContent-Type: application/json\r\n"
+                head += "".join(f"{k}: {v}\r\n" for k, v in extra.items())
+                head += f"Content-Length: {len(data)}\r\n\r\n"
+                writer.write(head.encode() + data)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method, path, body):
+        if (method, path) != ("POST", "/v1/chat/completions"):
+            return 404, {"error": {"message": f"No route {method} {path}", "type": "invalid_request_error"}}, {}
+        self.stats["requests"] += 1
+        if self._active >= self.max_concurrency:
+            self.stats["rate_limited"] += 1
+            return 429, {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}}, {"Retry-After": "0.2"}
+        self._active += 1
+        self.stats["peak_concurrency"] = max(self.stats["peak_concurrency"], self._active)
+        try:
+            await asyncio.sleep(self.latency_s * (1 + 0.5 * self._random.random()))
+            if self._random.random() < self.error_rate:
+                self.stats["errors"] += 1
+                return self._random.choice((500, 503)), {"error": {"message": "Mock failure", "type": "server_error"}}, {}
+            request = json.loads(body)
+            content = mock_analysis(request.get("messages", []))
+            self.stats["completions"] += 1
+            prompt_tokens = sum(len(m.get("content", "")) for m in request.get("messages", [])) // 4
+            completion_tokens = len(content) // 4
+            return 200, {
+                "id": f"chatcmpl-mock-{self.stats['completions']}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", DEFAULT_MODEL),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens},
+            }, {}
+        finally:
+            self._active -= 1
+
+
+_REASONS = {200: "OK", 404: "Not Found", 429: "Too Many Requests", 500: "Internal Server Error",
+            503: "Service Unavailable"}
+
+
+# --- Fleet benchmark ---
+def fleet_readings(bridges, rounds, interval_s=900, seed=0):
+    """
+    Fleet-wide sweeps: one reading per bridge every `interval_s`, `rounds` times
+    (fleet_sim.py physics, sampled at the sweep interval), round-major.
+    """
+    from fleet_sim import FleetSimulator
+
+    block = FleetSimulator(bridges, seed=seed, fs=1.0 / interval_s).step_block(rounds)
+    fields = list(QUANTA)
+    return [{field: float(block[field][t, i]) for field in fields} for t in range(rounds) for i in range(bridges)]
+
+
+async def _bench(bridges, rounds, concurrency, latency_s, error_rate, baseline):
+    # 1. Mock endpoint, rate-limited a little above the client's concurrency
+    mock = MockLLMServer(latency_s=latency_s, max_concurrency=concurrency * 2, error_rate=error_rate, seed=0)
+    port = await mock.start(port=0)
+    base_url = f"http://127.0.0.1:{port}/v1"
+    readings = fleet_readings(bridges, rounds)
+    results = {"bridges": bridges, "rounds": rounds, "readings": len(readings), "concurrency": concurrency}
+
+    try:
+        # 2. Naive: one uncached request at a time (what a per-click synchronous call does)
+        if baseline:
+            naive = LLMClient(api_key="mock", base_url=base_url, concurrency=1, backoff_s=0.05)
+            sample = readings[:baseline]
+            start = time.perf_counter()
+            for reading in sample:
+                await naive.complete(build_messages(reading) + [{"role": "user", "content": str(random.random())}])
+            elapsed = time.perf_counter() - start
+            results["naive_per_s"] = len(sample) / elapsed
+            results["naive_fleet_s"] = len(readings) / results["naive_per_s"]
+            await naive.aclose()
+
+        # 3. Async client, cold cache, then a warm repeat of the same sweep
+        client = LLMClient(api_key="mock", base_url=base_url, concurrency=concurrency, backoff_s=0.05)
+        for phase in ("cold", "warm"):
+            before = dict(client.stats)
+            start = time.perf_counter()
+            out = await client.analyze_many(readings)
+            elapsed = time.perf_counter() - start
+            delta = {k: client.stats[k] - before[k] for k in client.stats}
+            results[phase] = {
+                "seconds": elapsed,
+                "per_s": len(readings) / elapsed,
+                "api_calls": delta["api_calls"],
+                "cache_hits": delta["cache_hits"],
+                "coalesced": delta["coalesced"],
+                "retries": delta["retries"],
+                "failures": sum(isinstance(r, Exception) for r in out),
+                "hit_rate": (delta["cache_hits"] + delta["coalesced"]) / delta["requests"],
+            }
+        results["unique_prompts"] = len(client.cache)
+        results["server"] = dict(mock.stats)
+        await client.aclose()
+    finally:
+        await mock.stop()
+    return results
+
+
+def benchmark(bridges=1000, rounds=3, concurrency=CONCURRENCY, latency_s=0.2, error_rate=0.02, baseline=20):
+    """
+    Fleet-wide analysis against the local mock: naive sequential calls vs.
+    the async client, cold and warm cache.
+
+    Returns:
+        dict: Throughput (analyses/s), API calls, cache hit rate, retries, mock server stats.
+    """
+    return asyncio.run(_bench(bridges, rounds, concurrency, latency_s, error_rate, baseline))
+
+
+async def _serve_mock(host, port, latency_s, max_concurrency, error_rate):
+    mock = MockLLMServer(latency_s=latency_s, max_concurrency=max_concurrency, error_rate=error_rate)
+    port = await mock.start(host, port)
+    print(f"🤖 Mock LLM endpoint on http://{host}:{port}/v1 (latency {latency_s}s, limit {max_concurrency})")
+    print(f"   OPENAI_API_KEY=mock OPENAI_BASE_URL=http://{host}:{port}/v1 streamlit run app.py")
+    async with mock.server:
+        await mock.server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SetuAayu LLM analysis")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_bench = sub.add_parser("bench", help="Fleet-wide analysis throughput and cache hit rate against the mock")
+    p_bench.add_argument("--bridges", type=int, default=1000)
+    p_bench.add_argument("--rounds", type=int, default=3, help="Readings per bridge")
+    p_bench.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    p_bench.add_argument("--latency", type=float, default=0.2, help="Mock response time (s)")
+    p_bench.add_argument("--error-rate", type=float, default=0.02, help="Share of mock 5xx responses")
+    p_bench.add_argument("--baseline", type=int, default=20, help="Sequential uncached requests to time (0 = skip)")
+
+    p_mock = sub.add_parser("mock", help="Run the OpenAI-compatible mock endpoint")
+    p_mock.add_argument("--host", default="127.0.0.1")
+    p_mock.add_argument("--port", type=int, default=MOCK_PORT)
+    p_mock.add_argument("--latency", type=float, default=0.3)
+    p_mock.add_argument("--max-concurrency", type=int, default=16)
+    p_mock.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    if args.command == "mock":
+        try:
+            asyncio.run(_serve_mock(args.host, args.port, args.latency, args.max_concurrency, args.error_rate))
+        except KeyboardInterrupt:
+            pass
+    else:
+        r = benchmark(args.bridges, args.rounds, args.concurrency, args.latency, args.error_rate, args.baseline)
+        print(f"--- Fleet analysis: {r['bridges']} bridges x {r['rounds']} readings = {r['readings']} "
+              f"(mock latency {args.latency}s, concurrency {r['concurrency']}) ---")
+        if "naive_per_s" in r:
+            print(f"Naive sequential:  {r['naive_per_s']:8.1f} analyses/s  "
+                  f"(fleet sweep ≈ {r['naive_fleet_s']:.0f} s, {r['readings']} API calls)")
+        for phase in ("cold", "warm"):
+            p = r[phase]
+            print(f"Async, {phase} cache: {p['per_s']:8.1f} analyses/s  ({p['seconds']:.2f} s, "
+                  f"{p['api_calls']} API calls, {p['retries']} retries, {p['failures']} failed, "
+                  f"hit rate {p['hit_rate']:.1%} = {p['cache_hits']} cached + {p['coalesced']} coalesced)")
+        print(f"Unique quantized prompts: {r['unique_prompts']}  |  mock: {r['server']}")
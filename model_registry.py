@@ -0,0 +1,204 @@
+"""
+SetuAayu Model Registry
+
+Versioned, append-only store of trained models:
+
+    model_registry/
+        registry.json            # {"active": "v0003", "pinned": false}
+        v0003/model.pkl
+        v0003/model_forest/      # compact export (see forest_model.py)
+        v0003/metadata.json      # params, metrics, data fingerprint, timings
+
+New versions become active automatically unless a version is pinned.
+`inference.py` loads whichever version is active.
+
+Usage:
+    python model_registry.py list
+    python model_registry.py pin v0002
+    python model_registry.py unpin
+    python model_registry.py rollback
+"""
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import shutil
+from datetime import datetime
+
+REGISTRY_DIR = "model_registry"
+
+
+def fingerprint_files(paths):
+    """SHA-256 over the contents of data files (or file names + sizes for directories)."""
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        if os.path.isdir(path):
+            for root, _, files in sorted(os.walk(path)):
+                for name in sorted(files):
+                    full = os.path.join(root, name)
+                    digest.update(f"{os.path.relpath(full, path)}:{os.path.getsize(full)}".encode())
+        else:
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+    def __init__(self, root=REGISTRY_DIR):
+        self.root = root
+
+    # --- State ---
+    def _state_path(self):
+        return os.path.join(self.root, "registry.json")
+
+    def _read_state(self):
+        try:
+            with open(self._state_path()) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"active": None, "pinned": False}
+
+    def _write_state(self, state):
+        os.makedirs(self.root, exist_ok=True)
+        tmp = self._state_path() + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp, self._state_path())
+
+    # --- Versions ---
+    def versions(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(d for d in os.listdir(self.root)
+                      if d.startswith("v") and os.path.isfile(os.path.join(self.root, d, "metadata.json")))
+
+    def metadata(self, version):
+        with open(os.path.join(self.root, version, "metadata.json")) as f:
+            return json.load(f)
+
+    def model_path(self, version):
+        return os.path.join(self.root, version, "model.pkl")
+
+    def active_version(self):
+        return self._read_state()["active"]
+
+    def active_model_path(self):
+        """Path of the active model, or None if the registry is empty."""
+        version = self.active_version()
+        return self.model_path(version) if version else None
+
+    def register(self, model, metadata, extra_files=None, activate=True):
+        """
+        Stores a new model version and activates it (unless a version is pinned).
+
+        Args:
+            model: Fitted estimator (pickled as model.pkl).
+            metadata (dict): Params, metrics, data fingerprint, timings...
+            extra_files (dict): name -> source file or directory copied next to the model.
+            activate (bool): Make this the served version.
+
+        Returns:
+            str: The new version id.
+        """
+        existing = self.versions()
+        version = f"v{int(existing[-1][1:]) + 1 if existing else 1:04d}"
+        directory = os.path.join(self.root, version)
+        os.makedirs(directory)
+
+        with open(os.path.join(directory, "model.pkl"), "wb") as f:
+            pickle.dump(model, f)
+        for name, src in (extra_files or {}).items():
+            if os.path.isdir(src):
+                shutil.copytree(src, os.path.join(directory, name), copy_function=shutil.copyfile)
+            else:
+                shutil.copyfile(src, os.path.join(directory, name))
+
+        metadata = dict(metadata, version=version, created_at=datetime.now().isoformat(), activated=activate)
+        with open(os.path.join(directory, "metadata.json"), "w") as f:
+            json.dump(metadata, f, indent=2, default=str)
+
+        state = self._read_state()
+        if activate and not state.get("pinned"):
+            state["active"] = version
+            self._write_state(state)
+        return version
+
+    def servable(self, version):
+        """
+        Whether inference can serve `version`: it was activatable when
+        registered and takes the raw sensor channels (windowed-feature models
+        need a feature pipeline the dashboard's `predict_batch` does not run).
+        """
+        meta = self.metadata(version)
+        return meta.get("activated", True) and meta.get("features", "raw") == "raw"
+
+    def pin(self, version):
+        """
+        Serves `version` until unpinned.
+
+        Raises:
+            ValueError: If the version is unknown or cannot be served.
+        """
+        if version not in self.versions():
+            raise ValueError(f"Unknown model version '{version}'")
+        if not self.servable(version):
+            meta = self.metadata(version)
+            raise ValueError(f"Model version '{version}' cannot be served "
+                             f"(features: {meta.get('features', 'raw')}, activated: {meta.get('activated', True)})")
+        self._write_state({"active": version, "pinned": True})
+
+    def unpin(self):
+        """Serves the newest version that was activated when registered."""
+        served = [v for v in self.versions() if self.servable(v)]
+        self._write_state({"active": served[-1] if served else None, "pinned": False})
+
+    def rollback(self):
+        """
+        Pins the newest servable version before the active one.
+
+        Raises:
+            ValueError: If there is no such version.
+        """
+        versions = self.versions()
+        active = self.active_version()
+        earlier = [v for v in versions[:versions.index(active)] if self.servable(v)] if active in versions else []
+        if not earlier:
+            raise ValueError("No earlier servable version to roll back to")
+        self.pin(earlier[-1])
+        return earlier[-1]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SetuAayu model registry")
+    parser.add_argument("--root", default=REGISTRY_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="List versions and their metrics")
+    p_pin = sub.add_parser("pin", help="Serve a specific version")
+    p_pin.add_argument("version")
+    sub.add_parser("unpin", help="Serve the latest version again")
+    sub.add_parser("rollback", help="Pin the version before the active one")
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.root)
+    if args.command == "list":
+        state = registry._read_state()
+        for version in registry.versions():
+            meta = registry.metadata(version)
+            marker = "*" if version == state["active"] else " "
+            metrics = ", ".join(f"{k}={v:.4f}" for k, v in meta.get("metrics", {}).items())
+            print(f"{marker} {version}  {meta.get('created_at', '')}  {metrics}")
+        if state.get("pinned"):
+            print(f"(pinned to {state['active']})")
+    elif args.command == "unpin":
+        registry.unpin()
+        print(f"✅ Serving latest version {registry.active_version()}")
+    else:
+        try:
+            if args.command == "pin":
+                registry.pin(args.version)
+                print(f"📌 Pinned {args.version}")
+            else:
+                print(f"↩️  Rolled back to {registry.rollback()}")
+        except ValueError as e:
+            raise SystemExit(f"❌ {e}")
@@ -0,0 +1,314 @@
+"""
+SetuAayu Compact Readings
+
+Typed, columnar representation of sensor readings: one NumPy structured
+array row (40 bytes) per reading instead of a dict of Python objects
+(~700 bytes). Repeated strings are stored as small integer codes:
+
+* `source`: location name (simulation / CSV) or node id (ingest), interned
+  per batch in `ReadingBatch.sources`
+* `scenario`, `prediction_window`, `defect_type`: codes into the fixed
+  simulator vocabularies below (code 0 = not provided)
+* `timestamp_ms`: integer epoch milliseconds instead of an ISO string
+
+Two dict/CSV schemas are supported for conversion:
+
+* "sim": the 13 keys of `generate_bridge_data` / bridge_data.csv
+* "ingest": the storage schema of ingest_server.py (timestamp in epoch
+  seconds, node_id, five sensor fields)
+
+Usage:
+    python readings.py bench --rows 100000      # memory per million readings
+"""
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from bridge_sim import SENSOR_FIELDS
+
+READING_DTYPE = np.dtype([
+    ("timestamp_ms", "<i8"),
+    ("source", "<u2"),
+    ("vibration_x", "<f4"),
+    ("vibration_y", "<f4"),
+    ("vibration_z", "<f4"),
+    ("strain", "<f4"),
+    ("stress_mpa", "<f4"),
+    ("tilt", "<f4"),
+    ("health_score", "u1"),
+    ("traffic_load", "<u2"),
+    ("scenario", "u1"),
+    ("prediction_window", "u1"),
+    ("defect_type", "u1"),
+])
+
+SCENARIOS = ["", "normal", "critical"]
+PREDICTION_WINDOWS = ["", "None (Safe)", "45-60 days"]
+DEFECT_TYPES = ["", "None", "Early-stage Rebar Corrosion"]
+CODE_TABLES = {"scenario": SCENARIOS, "prediction_window": PREDICTION_WINDOWS, "defect_type": DEFECT_TYPES}
+
+SCHEMAS = {
+    "sim": ["timestamp", "location"] + SENSOR_FIELDS[:4] + ["stress_mpa", "tilt", "health_score",
+                                                           "prediction_window", "defect_type", "traffic_load",
+                                                           "scenario"],
+    "ingest": ["timestamp", "node_id"] + SENSOR_FIELDS,
+}
+SOURCE_COLUMN = {"sim": "location", "ingest": "node_id"}
+SOURCE_ALIASES = ["node_id", "location", "location_id", "location_name"] # First one present wins
+FLOAT_FIELDS = SENSOR_FIELDS[:4] + ["stress_mpa", "tilt"]
+INT_FIELDS = ["health_score", "traffic_load"]
+
+
+def encode_codes(values, table):
+    """
+    Maps strings to their codes in `table` (missing values -> 0).
+
+    Raises:
+        ValueError: On a value that is not in the table.
+    """
+    lookup = {value: code for code, value in enumerate(table)}
+    try:
+        return np.array([lookup[v] if isinstance(v, str) else 0 for v in values], dtype=np.uint8)
+    except KeyError as e:
+        raise ValueError(f"unknown value {e.args[0]!r} (expected one of {table[1:]})") from None
+
+
+def _timestamps_ms(values):
+    # Epoch seconds (ingest) or ISO strings (simulation / CSV); naive times are taken as-is
+    values = list(values)
+    if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+        return np.round(np.asarray(values, dtype=np.float64) * 1000).astype(np.int64)
+    return pd.to_datetime(pd.Series(values), format="ISO8601").to_numpy("datetime64[ms]").astype(np.int64)
+
+
+class ReadingBatch:
+    """
+    A batch of readings as a structured array plus its interned source names.
+
+    Attributes:
+        data (np.ndarray): READING_DTYPE rows.
+        sources (list): Source name per `source` code.
+    """
+
+    __slots__ = ("data", "sources")
+
+    def __init__(self, data, sources):
+        self.data = data
+        self.sources = list(sources)
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def nbytes(self):
+        """Array bytes plus the interned source strings."""
+        return self.data.nbytes + sum(sys.getsizeof(s) for s in self.sources)
+
+    # --- Construction ---
+    @classmethod
+    def empty(cls, n=0):
+        return cls(np.zeros(n, dtype=READING_DTYPE), [])
+
+    @classmethod
+    def from_columns(cls, timestamp_ms, sources, source_codes=None, **fields):
+        """
+        Builds a batch from column arrays.
+
+        Args:
+            timestamp_ms: Epoch milliseconds per reading.
+            sources: Source name per reading, or the names table when
+                `source_codes` is given.
+            **fields: Any other READING_DTYPE fields. Categorical fields may
+                be strings (encoded here) or codes.
+        """
+        timestamp_ms = np.asarray(timestamp_ms)
+        batch = cls.empty(len(timestamp_ms))
+        batch.data["timestamp_ms"] = timestamp_ms
+        if source_codes is None:
+            codes, uniques = pd.factorize(np.asarray(sources, dtype=object))
+            source_codes, sources = codes, list(uniques)
+        batch.data["source"] = source_codes
+        batch.sources = list(sources)
+        for name, values in fields.items():
+            if name in CODE_TABLES and not np.issubdtype(np.asarray(values).dtype, np.integer):
+                values = encode_codes(values, CODE_TABLES[name])
+            batch.data[name] = values
+        for name in FLOAT_FIELDS:
+            if name not in fields:
+                batch.data[name] = np.nan
+        return batch
+
+    @classmethod
+    def from_dicts(cls, readings):
+        """
+        Builds a batch from reading dicts in either schema.
+
+        Raises:
+            KeyError: If a reading lacks a sensor field.
+            ValueError: On an unknown scenario / prediction window / defect type.
+        """
+        if not readings:
+            return cls.empty()
+        first = readings[0]
+        fields = {name: [r[name] for r in readings] for name in SENSOR_FIELDS}
+        for name in ["stress_mpa"] + INT_FIELDS + list(CODE_TABLES):
+            if name in first:
+                fields[name] = [r.get(name) for r in readings]
+        sources = [next((r[name] for name in SOURCE_ALIASES if r.get(name)), "unknown") for r in readings]
+        return cls.from_columns(_timestamps_ms(r["timestamp"] for r in readings), sources, **fields)
+
+    @classmethod
+    def from_frame(cls, df):
+        """Builds a batch from a DataFrame in either schema (extra columns are ignored)."""
+        if df.empty:
+            return cls.empty()
+        if pd.api.types.is_numeric_dtype(df["timestamp"]):
+            timestamp_ms = _timestamps_ms(df["timestamp"].tolist())
+        else:
+            timestamp_ms = pd.to_datetime(df["timestamp"], format="ISO8601").to_numpy("datetime64[ms]").astype(np.int64)
+        source = next((name for name in SOURCE_ALIASES if name in df.columns), None)
+        if source is None:
+            raise KeyError(f"no source column (one of {SOURCE_ALIASES})")
+        codes, uniques = pd.factorize(df[source])
+        fields = {name: df[name].to_numpy() for name in FLOAT_FIELDS + INT_FIELDS if name in df.columns}
+        for name, table in CODE_TABLES.items():
+            if name in df.columns:
+                fields[name] = encode_codes(df[name].astype(object).tolist(), table)
+        return cls.from_columns(timestamp_ms, list(uniques), source_codes=codes, **fields)
+
+    @classmethod
+    def read_csv(cls, path, chunk_rows=None):
+        """Reads a CSV in either schema; with `chunk_rows`, yields one batch per chunk."""
+        # keep_default_na=False: "None" is a real defect type / prediction window, not a missing value
+        if chunk_rows:
+            return (cls.from_frame(chunk) for chunk in pd.read_csv(path, keep_default_na=False, chunksize=chunk_rows))
+        return cls.from_frame(pd.read_csv(path, keep_default_na=False))
+
+    @classmethod
+    def concat(cls, batches):
+        """Concatenates batches, merging their source tables."""
+        batches = [b for b in batches if len(b)]
+        if not batches:
+            return cls.empty()
+        if len(batches) == 1:
+            return batches[0]
+        names = {}
+        parts = []
+        for batch in batches:
+            remap = np.array([names.setdefault(s, len(names)) for s in batch.sources], dtype=np.uint16)
+            part = batch.data.copy()
+            part["source"] = remap[part["source"]] if len(remap) else 0
+            parts.append(part)
+        return cls(np.concatenate(parts), list(names))
+
+    # --- Views ---
+    def source_names(self):
+        """Source name per reading (object array; the strings themselves are shared)."""
+        return np.asarray(self.sources, dtype=object)[self.data["source"]]
+
+    def features(self, names=SENSOR_FIELDS):
+        """(n, len(names)) float64 feature matrix."""
+        return np.column_stack([self.data[name].astype(np.float64) for name in names])
+
+    def to_frame(self, schema="sim"):
+        """
+        DataFrame with the schema's columns: datetime64 timestamps and
+        categorical source / code columns.
+        """
+        data = self.data
+        columns = {}
+        for name in SCHEMAS[schema]:
+            if name == "timestamp":
+                columns[name] = pd.to_datetime(data["timestamp_ms"], unit="ms")
+            elif name == SOURCE_COLUMN[schema]:
+                columns[name] = pd.Categorical.from_codes(data["source"].astype(np.int32), categories=self.sources)
+            elif name in CODE_TABLES:
+                columns[name] = pd.Categorical.from_codes(data[name].astype(np.int32), categories=CODE_TABLES[name])
+            else:
+                columns[name] = data[name]
+        return pd.DataFrame(columns)
+
+    def to_dicts(self, schema="sim"):
+        """
+        Reading dicts as the rest of the code base produced them: ISO
+        timestamps for "sim", epoch seconds for "ingest".
+        """
+        data = self.data
+        columns = {}
+        for name in SCHEMAS[schema]:
+            if name == "timestamp":
+                ms = data["timestamp_ms"]
+                columns[name] = (np.datetime_as_string(ms.astype("datetime64[ms]")).tolist() if schema == "sim"
+                                 else (ms / 1000.0).tolist())
+            elif name == SOURCE_COLUMN[schema]:
+                columns[name] = self.source_names().tolist()
+            elif name in CODE_TABLES:
+                columns[name] = np.asarray(CODE_TABLES[name], dtype=object)[data[name]].tolist()
+            elif name in FLOAT_FIELDS:
+                # Round-trips the float32 value's shortest repr (0.2121, not 0.21209999918937683)
+                columns[name] = data[name].astype("U16").astype(np.float64).tolist()
+            else:
+                columns[name] = data[name].tolist()
+        names = list(columns)
+        return [dict(zip(names, row)) for row in zip(*columns.values())]
+
+    def to_csv(self, path, schema="sim", **kwargs):
+        self.to_frame(schema).to_csv(path, index=False, **kwargs)
+
+
+# --- Memory Benchmark ---
+def deep_sizeof(objects):
+    """Bytes held by a list of dicts, counting shared objects (e.g. interned strings) once."""
+    seen = set()
+    total = sys.getsizeof(objects)
+    for obj in objects:
+        for item in (obj, *obj.values()):
+            if id(item) not in seen:
+                seen.add(id(item))
+                total += sys.getsizeof(item)
+        for key in obj:
+            if id(key) not in seen:
+                seen.add(id(key))
+                total += sys.getsizeof(key)
+    return total
+
+
+def benchmark(rows=100_000, seed=0):
+    """
+    Memory per reading for the same simulated readings as dicts, as a
+    categorical DataFrame and as a ReadingBatch.
+
+    Returns:
+        dict: representation -> bytes per reading
+    """
+    import random
+
+    from bridge_sim import generate_bridge_batch, generate_bridge_data
+
+    random.seed(seed)
+    dicts = [generate_bridge_data("critical" if random.random() < 0.05 else "normal") for _ in range(rows)]
+    batch = ReadingBatch.from_dicts(dicts)
+    ingest_dicts = batch.to_dicts("ingest")
+    return {
+        "sim dicts (generate_bridge_data)": deep_sizeof(dicts) / rows,
+        "ingest dicts (validate_reading)": deep_sizeof(ingest_dicts) / rows,
+        "generate_bridge_batch DataFrame": generate_bridge_batch(rows, seed=seed).memory_usage(deep=True).sum() / rows,
+        "ReadingBatch": batch.nbytes / rows,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SetuAayu compact readings")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_bench = sub.add_parser("bench", help="Memory per reading: dicts vs. DataFrame vs. ReadingBatch")
+    p_bench.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    results = benchmark(args.rows)
+    baseline = results["sim dicts (generate_bridge_data)"]
+    print(f"--- Memory per reading ({args.rows} simulated readings) ---")
+    for name, per_reading in results.items():
+        print(f"{name:<34} {per_reading:8.1f} B  {per_reading * 1e6 / 2**20:8.1f} MB/million  "
+              f"{baseline / per_reading:5.1f}x less than sim dicts")
@@ -0,0 +1,491 @@
+"""
+SetuAayu Telemetry Rollups
+
+Incremental downsampling of raw readings into fixed buckets per bridge at
+1 s, 1 min and 1 h. Each bucket keeps count, min, max, sum and sum of
+squares per sensor, so partial buckets from different batches merge exactly
+and mean / RMS are derived on read:
+
+    rollups/
+        res=1min/location_id=BLR_SB_01/part-<ns>-<id>.parquet
+        ...
+
+New data is aggregated in memory (1 s from the readings, 1 min from 1 s,
+1 h from 1 min) and flushed as files of partial buckets per bridge; reads
+merge them, and `compact` folds them into one file per bridge. History charts ask `query_range` for a time range and a pixel width
+and get back at most ~width points from the coarsest resolution that still
+has a bucket per pixel, so any range renders from a bounded number of rows.
+Live ingest maintains the rollups through `RollupSink` (`ingest_server.py
+serve --rollups`); backfills replace the 1 s buckets they cover and rebuild
+the coarser levels from them, so they can be re-run safely.
+
+Usage:
+    python rollups.py backfill bridge_data.csv synthetic_bridge.csv
+    python rollups.py backfill --store telemetry_store
+    python rollups.py query --location BLR_SB_01 --width 800
+    python rollups.py migrate
+"""
+import argparse
+import hashlib
+import os
+import tempfile
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from bridge_sim import SENSOR_FIELDS
+from telemetry_store import CSV_CHUNK_ROWS, batch_frame, location_slug
+
+DEFAULT_ROOT = "rollups"
+RESOLUTIONS = {"1s": 1, "1min": 60, "1h": 3600} # Name -> bucket seconds, finest first
+PARTIALS = ["min", "max", "sum", "sumsq"]
+AGGREGATES = ["min", "max", "mean", "rms"]
+FLUSH_ROWS = 500_000 # Pending partial buckets (all resolutions) before a write
+FLUSH_INTERVAL_S = 60.0
+
+ROLLUP_SCHEMA = pa.schema(
+    [("bucket", pa.int64()), ("count", pa.int64())]
+    + [(f"{field}_{part}", pa.float64()) for field in SENSOR_FIELDS for part in PARTIALS]
+)
+
+
+def _group(location_ids, bucket):
+    """Sort order and group starts for (location_id, bucket) runs."""
+    codes, uniques = pd.factorize(np.asarray(location_ids), sort=True)
+    order = np.lexsort((bucket, codes))
+    codes, bucket = codes[order], bucket[order]
+    starts = np.flatnonzero(np.r_[True, (codes[1:] != codes[:-1]) | (bucket[1:] != bucket[:-1])])
+    return order, starts, np.asarray(uniques)[codes[starts]], bucket[starts]
+
+
+def _frame(location_ids, bucket, count, mins, maxs, sums, sumsqs):
+    out = {"location_id": location_ids, "bucket": bucket, "count": count}
+    for j, field in enumerate(SENSOR_FIELDS):
+        out[f"{field}_min"] = mins[:, j]
+        out[f"{field}_max"] = maxs[:, j]
+        out[f"{field}_sum"] = sums[:, j]
+        out[f"{field}_sumsq"] = sumsqs[:, j]
+    return pd.DataFrame(out)
+
+
+def rollup_frame(df, seconds):
+    """
+    Aggregates raw readings into `seconds`-wide buckets per location_id.
+
+    Args:
+        df (pd.DataFrame): Needs `timestamp`, `location_id` and the sensor fields.
+        seconds (int): Bucket width.
+
+    Returns:
+        pd.DataFrame: location_id, bucket (epoch seconds of the bucket start),
+        count and min/max/sum/sumsq per sensor.
+    """
+    epoch = pd.to_datetime(df["timestamp"]).to_numpy().astype("datetime64[s]").astype(np.int64)
+    order, starts, locations, buckets = _group(df["location_id"], epoch - epoch % seconds)
+    values = df[SENSOR_FIELDS].to_numpy(dtype=np.float64)[order]
+    count = np.diff(np.r_[starts, len(order)])
+    return _frame(locations, buckets, count,
+                  np.minimum.reduceat(values, starts), np.maximum.reduceat(values, starts),
+                  np.add.reduceat(values, starts), np.add.reduceat(values * values, starts))
+
+
+def merge_partials(df, seconds=None):
+    """
+    Merges partial buckets (same bucket in several rows) and optionally
+    re-buckets them into coarser `seconds`-wide buckets. Exact, since
+    count/min/max/sum/sumsq all combine without loss.
+    """
+    if df.empty:
+        return df
+    bucket = df["bucket"].to_numpy(dtype=np.int64)
+    if seconds is not None:
+        bucket = bucket - bucket % seconds
+    location_ids = df["location_id"] if "location_id" in df.columns else np.zeros(len(df), dtype=np.int64)
+    order, starts, locations, buckets = _group(location_ids, bucket)
+
+    def reduce(ufunc, part):
+        columns = [f"{field}_{part}" for field in SENSOR_FIELDS]
+        return ufunc.reduceat(df[columns].to_numpy(dtype=np.float64)[order], starts)
+
+    count = np.add.reduceat(df["count"].to_numpy(dtype=np.int64)[order], starts)
+    out = _frame(locations, buckets, count, reduce(np.minimum, "min"), reduce(np.maximum, "max"),
+                 reduce(np.add, "sum"), reduce(np.add, "sumsq"))
+    return out if "location_id" in df.columns else out.drop(columns="location_id")
+
+
+def finalize(df):
+    """Turns partial sums into timestamp, count and min/max/mean/RMS per sensor."""
+    out = pd.DataFrame({"timestamp": pd.to_datetime(df["bucket"], unit="s"), "count": df["count"]})
+    if "location_id" in df.columns:
+        out.insert(1, "location_id", df["location_id"].to_numpy())
+    count = df["count"].to_numpy(dtype=np.float64)
+    for field in SENSOR_FIELDS:
+        out[f"{field}_min"] = df[f"{field}_min"].to_numpy()
+        out[f"{field}_max"] = df[f"{field}_max"].to_numpy()
+        out[f"{field}_mean"] = df[f"{field}_sum"].to_numpy() / count
+        out[f"{field}_rms"] = np.sqrt(df[f"{field}_sumsq"].to_numpy() / count)
+    return out
+
+
+def choose_resolution(start, end, width_px):
+    """
+    Coarsest resolution that still gives one bucket per pixel, i.e. the
+    widest bucket no wider than (end - start) / width_px.
+
+    Returns:
+        tuple: (resolution name, re-bucket seconds or None). The second value
+        is set when even the coarsest stored resolution has more buckets than
+        pixels and has to be merged further on read.
+    """
+    span = max((pd.Timestamp(end) - pd.Timestamp(start)).total_seconds(), 1.0)
+    per_pixel = span / max(int(width_px), 1)
+    fitting = [name for name, seconds in RESOLUTIONS.items() if seconds <= per_pixel]
+    name = fitting[-1] if fitting else next(iter(RESOLUTIONS))
+    seconds = RESOLUTIONS[name]
+    if span / seconds > width_px:
+        # Coarsest stored level is still too fine: merge to a multiple of it
+        return name, int(np.ceil(per_pixel / seconds)) * seconds
+    return name, None
+
+
+class RollupStore:
+    """Append-only store of partial rollup buckets, one directory per resolution and bridge."""
+
+    def __init__(self, root=DEFAULT_ROOT, resolutions=RESOLUTIONS, flush_rows=FLUSH_ROWS,
+                 flush_interval=FLUSH_INTERVAL_S):
+        self.root = root
+        self.resolutions = dict(sorted(resolutions.items(), key=lambda item: item[1]))
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self._pending = {name: [] for name in self.resolutions}
+        self._pending_rows = 0
+        self._pending_since = None
+
+    # --- Writes ---
+    def add(self, df):
+        """
+        Rolls a batch of raw readings up into every resolution.
+
+        The finest level is aggregated from the readings, each coarser level
+        from the one below it. Partial buckets are held in memory and written
+        once `flush_rows` are pending or `flush_interval` seconds have passed.
+
+        Args:
+            df (pd.DataFrame): Needs `timestamp`, `location_id` and the sensor columns.
+
+        Returns:
+            int: Number of files written by this call.
+        """
+        if df.empty:
+            return 0
+        rolled = None
+        for name, seconds in self.resolutions.items():
+            rolled = rollup_frame(df, seconds) if rolled is None else merge_partials(rolled, seconds)
+            self._pending[name].append(rolled)
+            self._pending_rows += len(rolled)
+        if self._pending_since is None:
+            self._pending_since = time.monotonic()
+        if self._pending_rows >= self.flush_rows or time.monotonic() - self._pending_since >= self.flush_interval:
+            return self.flush()
+        return 0
+
+    def flush(self):
+        """Writes pending partial buckets: one file per resolution and bridge."""
+        files = 0
+        for name, frames in self._pending.items():
+            if not frames:
+                continue
+            rolled = merge_partials(pd.concat(frames, ignore_index=True))
+            for location_id, part in rolled.groupby("location_id", sort=False):
+                self._write(name, location_id, part)
+                files += 1
+            frames.clear()
+        self._pending_rows = 0
+        self._pending_since = None
+        return files
+
+    def compact(self):
+        """Flushes, then merges each bridge's partial files into one file per resolution."""
+        self.flush()
+        merged = 0
+        for name in self.resolutions:
+            for location_id in self.locations(name):
+                paths = self._paths(name, location_id)
+                if len(paths) < 2:
+                    continue
+                self._write(name, location_id, merge_partials(self._read(paths)))
+                for p in paths:
+                    os.remove(p)
+                merged += 1
+        return merged
+
+    def replace(self, staged):
+        """
+        Swaps in the finest-level buckets held by `staged` (another
+        RollupStore, e.g. a backfill built in a scratch directory). This
+        store's rows for those buckets are dropped instead of merged, so
+        re-running a backfill does not double the counts. Coarser levels of
+        each touched bridge are then rebuilt from the finest one, so 1 min / 1 h
+        buckets shared with other data keep it.
+
+        Returns:
+            int: Number of bridges rewritten.
+        """
+        self.flush()
+        staged.flush()
+        finest = next(iter(self.resolutions))
+        rewritten = 0
+        for location_id in staged.locations(finest):
+            new = staged._read(staged._paths(finest, location_id))
+            paths = self._paths(finest, location_id)
+            if paths:
+                old = self._read(paths)
+                new = pd.concat([old[~old["bucket"].isin(new["bucket"])], new], ignore_index=True)
+            rolled = None
+            for name, seconds in self.resolutions.items():
+                rolled = merge_partials(new) if rolled is None else merge_partials(rolled, seconds)
+                paths = self._paths(name, location_id)
+                self._write(name, location_id, rolled)
+                for p in paths:
+                    os.remove(p)
+            rewritten += 1
+        return rewritten
+
+    def migrate(self):
+        """
+        Moves bridges rolled up under name slugs (before locations resolved
+        to asset IDs) into their asset's directory, then compacts, which
+        merges any buckets both directories hold.
+
+        Returns:
+            dict: Old location id -> asset id, for every directory moved.
+        """
+        self.flush()
+        moved = {}
+        for name in self.resolutions:
+            for location_id in self.locations(name):
+                target = location_slug(location_id)
+                if target == location_id:
+                    continue
+                directory = self._dir(name, target)
+                os.makedirs(directory, exist_ok=True)
+                for p in self._paths(name, location_id):
+                    os.replace(p, os.path.join(directory, os.path.basename(p)))
+                os.rmdir(self._dir(name, location_id))
+                moved[location_id] = target
+        if moved:
+            self.compact()
+        return moved
+
+    # --- Reads ---
+    def locations(self, resolution=None):
+        directory = os.path.join(self.root, f"res={resolution or next(iter(self.resolutions))}")
+        if not os.path.isdir(directory):
+            return []
+        return sorted(d.split("=", 1)[1] for d in os.listdir(directory) if d.startswith("location_id="))
+
+    def query(self, location_id, resolution, start=None, end=None, rebucket=None):
+        """
+        Reads one bridge at one resolution over [start, end).
+
+        Returns:
+            pd.DataFrame: See `finalize` (one row per bucket, oldest first).
+        """
+        paths = self._paths(resolution, location_id)
+        if not paths:
+            return finalize(pd.DataFrame(columns=ROLLUP_SCHEMA.names))
+        expression = None
+        if start is not None:
+            expression = ds.field("bucket") >= _epoch(start) - RESOLUTIONS.get(resolution, 0) + 1
+        if end is not None:
+            upper = ds.field("bucket") < _epoch(end)
+            expression = upper if expression is None else expression & upper
+        table = ds.dataset(paths, schema=ROLLUP_SCHEMA, format="parquet").to_table(filter=expression)
+        return finalize(merge_partials(table.to_pandas(), rebucket))
+
+    def bounds(self, location_id):
+        """(first, last) timestamps covered for a bridge, from the coarsest level, or None."""
+        coarsest = list(self.resolutions)[-1]
+        df = self.query(location_id, coarsest)
+        if df.empty:
+            return None
+        return df["timestamp"].iloc[0], df["timestamp"].iloc[-1] + pd.Timedelta(seconds=self.resolutions[coarsest])
+
+    def signature(self, location_id, resolution=None):
+        """
+        Cheap change marker for a bridge: its file names and sizes at one
+        resolution (default: coarsest). Files are append-only, so new data
+        always changes it; `compact` changes it once without new data.
+        """
+        paths = self._paths(resolution or list(self.resolutions)[-1], location_id)
+        return hashlib.sha1("|".join(f"{os.path.basename(p)}:{os.path.getsize(p)}" for p in paths).encode()).hexdigest()
+
+    def query_range(self, location_id, start=None, end=None, width_px=1000):
+        """
+        Reads the best-fitting resolution for a chart `width_px` pixels wide.
+
+        A missing start/end defaults to the start/end of the bridge's history.
+
+        Returns:
+            tuple: (DataFrame, resolution label)
+        """
+        if start is None or end is None:
+            bounds = self.bounds(location_id)
+            if bounds is None:
+                return finalize(pd.DataFrame(columns=ROLLUP_SCHEMA.names)), None
+            start = bounds[0] if start is None else start
+            end = bounds[1] if end is None else end
+        name, rebucket = choose_resolution(start, end, width_px)
+        label = name if rebucket is None else _label(rebucket)
+        return self.query(location_id, name, start, end, rebucket), label
+
+    def _dir(self, resolution, location_id):
+        return os.path.join(self.root, f"res={resolution}", f"location_id={location_id}")
+
+    def _read(self, paths):
+        return pa.concat_tables(pq.read_table(p, schema=ROLLUP_SCHEMA) for p in paths).to_pandas()
+
+    def _write(self, resolution, location_id, df):
+        """Writes one file of partial buckets (under a temporary name, then renamed into place)."""
+        table = pa.Table.from_pandas(df[ROLLUP_SCHEMA.names], schema=ROLLUP_SCHEMA, preserve_index=False)
+        directory = self._dir(resolution, location_id)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"part-{time.time_ns()}-{uuid.uuid4().hex[:8]}.parquet")
+        pq.write_table(table, path + ".tmp")
+        os.replace(path + ".tmp", path)
+
+    def _paths(self, resolution, location_id):
+        directory = self._dir(resolution, location_id)
+        if not os.path.isdir(directory):
+            return []
+        return [os.path.join(directory, f) for f in sorted(os.listdir(directory)) if f.endswith(".parquet")]
+
+
+def _label(seconds):
+    if seconds % 3600 == 0:
+        return f"{seconds // 3600}h"
+    if seconds % 60 == 0:
+        return f"{seconds // 60}min"
+    return f"{seconds}s"
+
+
+def _epoch(value):
+    return int(pd.Timestamp(value).value // 1_000_000_000)
+
+
+class RollupSink:
+    """
+    Ingest sink (see ingest_server.py) that rolls flushed batches up and then
+    forwards them to another sink (e.g. StoreSink), if any. `close` writes
+    the buckets still pending in memory (called when ingest shuts down).
+    """
+
+    def __init__(self, rollups, inner=None):
+        self.rollups = rollups
+        self.inner = inner
+
+    def __call__(self, batch):
+        self.rollups.add(batch_frame(batch))
+        if self.inner is not None:
+            self.inner(batch)
+
+    def close(self):
+        self.rollups.flush()
+        if hasattr(self.inner, "close"):
+            self.inner.close()
+
+
+def _backfill(rollups, frames):
+    """
+    Rolls DataFrames up in a scratch store, then swaps the result in with
+    `RollupStore.replace`, so re-running a backfill replaces the buckets it
+    covers instead of adding to them.
+
+    Returns:
+        int: Rows rolled up.
+    """
+    rows = 0
+    with tempfile.TemporaryDirectory(prefix="rollup_backfill_") as scratch:
+        staged = RollupStore(scratch, rollups.resolutions, rollups.flush_rows, rollups.flush_interval)
+        for df in frames:
+            staged.add(df)
+            rows += len(df)
+        staged.compact()
+        rollups.replace(staged)
+    rollups.compact()
+    return rows
+
+
+def backfill_csv(path, rollups, chunk_rows=CSV_CHUNK_ROWS):
+    """
+    Rolls up a legacy CSV (bridge_data.csv / synthetic_bridge.csv).
+
+    Rows without a `location_id` column get one derived from `location`.
+    """
+    dtypes = {field: "float32" for field in SENSOR_FIELDS}
+
+    def chunks():
+        for chunk in pd.read_csv(path, chunksize=chunk_rows, dtype=dtypes):
+            if "location_id" not in chunk.columns:
+                chunk["location_id"] = chunk["location"].map(location_slug)
+            yield chunk
+    return _backfill(rollups, chunks())
+
+
+def backfill_store(store, rollups):
+    """Rolls up everything in a TelemetryStore, one bridge-day at a time."""
+    columns = ["timestamp", "location_id"] + SENSOR_FIELDS
+
+    def days():
+        for location_id in store.locations():
+            for day in store.days(location_id):
+                day_start = pd.Timestamp(day)
+                yield store.scan(location_id, day_start, day_start + pd.Timedelta(days=1), columns=columns)
+    return _backfill(rollups, days())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SetuAayu telemetry rollups")
+    parser.add_argument("--root", default=DEFAULT_ROOT, help="Rollup directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_backfill = sub.add_parser("backfill", help="Roll up legacy CSVs and/or a telemetry store")
+    p_backfill.add_argument("csv", nargs="*")
+    p_backfill.add_argument("--store", help="Telemetry store directory to roll up")
+
+    p_query = sub.add_parser("query", help="Read one bridge at the best resolution for a chart width")
+    p_query.add_argument("--location", required=True)
+    p_query.add_argument("--start")
+    p_query.add_argument("--end")
+    p_query.add_argument("--width", type=int, default=1000, help="Chart width in pixels")
+
+    sub.add_parser("migrate", help="Move name-slug bridges into their asset ID directories")
+
+    args = parser.parse_args()
+    rollups = RollupStore(args.root)
+
+    if args.command == "backfill":
+        for path in args.csv:
+            t = time.perf_counter()
+            rows = backfill_csv(path, rollups)
+            print(f"✅ Rolled up {rows} rows from '{path}' in {time.perf_counter() - t:.2f}s")
+        if args.store:
+            from telemetry_store import TelemetryStore
+            t = time.perf_counter()
+            rows = backfill_store(TelemetryStore(args.store), rollups)
+            print(f"✅ Rolled up {rows} rows from '{args.store}' in {time.perf_counter() - t:.2f}s")
+    elif args.command == "migrate":
+        moved = rollups.migrate()
+        for old, new in moved.items():
+            print(f"✅ {old} -> {new}")
+        print(f"Migrated {len(moved)} bridge(s)")
+    else:
+        t = time.perf_counter()
+        df, label = rollups.query_range(args.location, args.start, args.end, args.width)
+        print(df)
+        print(f"{len(df)} buckets at {label} in {time.perf_counter() - t:.3f}s")
@@ -0,0 +1,576 @@
+"""
+SetuAayu Fleet Scoring Scheduler
+
+Scores every monitored bridge continuously instead of one reading per button
+click:
+
+* Ingest (or the fleet simulator) writes each bridge's latest feature row into
+  a preallocated (bridges x features) array. Bridges that changed since the
+  last cycle are marked dirty, so a bridge is scored at most once per cycle
+  however fast it reports.
+* Every `cadence_s` the scheduler snapshots the dirty rows, cuts them into
+  micro-batches and puts them on a bounded queue. A pool of worker threads
+  scores the batches with the active model (see inference.py). A bridge is
+  in at most one cycle at a time, and its risk state is updated under the
+  scheduler lock, so concurrent workers never interleave updates. A batch
+  that fails to score is logged and counted, its bridges are released and
+  the worker carries on.
+* Each result row carries a health score (100 x P(normal)), the failure
+  probability and a predicted failure window: the hours until the smoothed
+  risk trend crosses 50 %.
+* Back-pressure: if the queue is still full at the next tick the cycle is
+  deferred (dirty rows keep coalescing), and `update` blocks until a worker
+  frees a slot. Put behind the ingest service, that stalls its flusher and
+  nodes start getting 503s instead of memory growing without bound.
+
+Models trained on windowed features (train_model.py --features windowed) are
+fed through features.FeatureStreams; raw models score the latest reading.
+
+Usage:
+    python scoring_scheduler.py bench --bridges 100 1000 10000
+    python scoring_scheduler.py serve --port 8000 --scores bridge_scores
+"""
+import argparse
+import asyncio
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from bridge_sim import SENSOR_FIELDS
+from inference import feature_names, get_model, resolve_model_path
+from readings import READING_DTYPE, ReadingBatch
+
+SCORES_DIR = "bridge_scores"
+CADENCE_S = 1.0
+WORKERS = 4
+BATCH_SIZE = 1024
+MAX_QUEUED_BATCHES = 64
+FAILURE_PROBABILITY = 0.5 # Risk level a "failure window" counts down to
+TREND_ALPHA = 0.2 # EWMA weight for the risk trend
+METRIC_HISTORY = 1000 # Cycles kept for the latency / batch size metrics
+SCORE_FLUSH_ROWS = 200_000 # ScoreSink: pending score rows before a write
+SCORE_FLUSH_INTERVAL_S = 60.0 # ...or at least this often (~1,440 files a day at any cadence)
+
+
+class ScoreSink:
+    """
+    Appends scored cycles to a Parquet dataset partitioned by date.
+
+    Cycles are buffered and written together once `flush_rows` are pending
+    or `flush_interval` seconds have passed, instead of one file per cycle;
+    `close` writes the rest (ScoringScheduler.stop calls it).
+    """
+
+    def __init__(self, root=SCORES_DIR, flush_rows=SCORE_FLUSH_ROWS, flush_interval=SCORE_FLUSH_INTERVAL_S):
+        self.root = root
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self._pending = []
+        self._pending_rows = 0
+        self._pending_since = None
+        self._lock = threading.Lock() # Called from every scoring worker
+
+    def __call__(self, frame):
+        with self._lock:
+            self._pending.append(frame)
+            self._pending_rows += len(frame)
+            if self._pending_since is None:
+                self._pending_since = time.monotonic()
+            if self._pending_rows >= self.flush_rows or time.monotonic() - self._pending_since >= self.flush_interval:
+                self._flush()
+
+    def close(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        frame = pd.concat(self._pending, ignore_index=True)
+        self._pending, self._pending_rows, self._pending_since = [], 0, None
+        days = pd.to_datetime(frame["scored_at"], unit="s").dt.strftime("%Y-%m-%d")
+        for day, part in frame.groupby(days, sort=False):
+            directory = os.path.join(self.root, f"date={day}")
+            os.makedirs(directory, exist_ok=True)
+            part.to_parquet(os.path.join(directory, f"part-{time.time_ns()}-{uuid.uuid4().hex[:8]}.parquet"),
+                            index=False)
+
+
+class _Cycle:
+    """Book-keeping for the batches of one scheduling cycle."""
+
+    def __init__(self, started, batches):
+        self.started = started
+        self.remaining = batches
+        self.parts = []
+        self.lock = threading.Lock()
+
+
+class ScoringScheduler:
+    """
+    Continuous, batched scoring of the latest window of every bridge.
+
+    Args:
+        sink (callable): Receives one DataFrame of scores per cycle (or None).
+        model_path (str): Model file (default: active registry version / model.pkl).
+        cadence_s (float): Seconds between scheduling cycles.
+        workers (int): Scoring threads.
+        batch_size (int): Max bridges per micro-batch.
+        max_queued_batches (int): Bound on batches waiting for a worker.
+    """
+
+    def __init__(self, sink=None, model_path=None, cadence_s=CADENCE_S, workers=WORKERS,
+                 batch_size=BATCH_SIZE, max_queued_batches=MAX_QUEUED_BATCHES, capacity=1024):
+        self.sink = sink
+        self.model_path = model_path or resolve_model_path()
+        self.cadence_s = cadence_s
+        self.batch_size = batch_size
+        self.features = feature_names(get_model(self.model_path).model)
+        self.streams = None
+        if self.features != SENSOR_FIELDS:
+            from features import FeatureStreams
+            self.streams = FeatureStreams()
+
+        # Per-bridge state, one row per bridge
+        self.ids = []
+        self.index = {}
+        self.X = np.zeros((capacity, len(self.features)))
+        self.reading_ts = np.zeros(capacity)
+        self.dirty = np.zeros(capacity, dtype=bool)
+        self.inflight = np.zeros(capacity, dtype=bool) # Queued or being scored; never in two cycles at once
+        self.risk = np.full(capacity, np.nan)
+        self.risk_trend = np.zeros(capacity) # Smoothed d(risk)/dt per second
+        self.scored_ts = np.full(capacity, np.nan)
+        self._cursor = 0
+        self._lock = threading.Lock()
+
+        self.queue = queue.Queue(maxsize=max_queued_batches)
+        self.workers = [threading.Thread(target=self._worker, name=f"scorer-{i}", daemon=True)
+                        for i in range(workers)]
+        self.stats = {"cycles": 0, "deferred_cycles": 0, "partial_cycles": 0, "batches": 0, "scored": 0,
+                      "failed_batches": 0, "readings": 0, "blocked_updates": 0, "blocked_s": 0.0}
+        self.cycle_latency = deque(maxlen=METRIC_HISTORY)
+        self.batch_sizes = deque(maxlen=METRIC_HISTORY)
+        self.queue_depth = deque(maxlen=METRIC_HISTORY)
+        self._stop = threading.Event()
+        self._ticker = None
+
+    # --- Bridge registry ---
+    def register(self, bridge_ids):
+        """
+        Returns the row index of every bridge id, adding unknown ones.
+
+        Returns:
+            np.ndarray: int row indices, usable with `update_rows`.
+        """
+        rows = np.empty(len(bridge_ids), dtype=np.int64)
+        with self._lock:
+            for i, bridge in enumerate(bridge_ids):
+                row = self.index.get(bridge)
+                if row is None:
+                    row = self.index[bridge] = len(self.ids)
+                    self.ids.append(bridge)
+                rows[i] = row
+            if len(self.ids) > len(self.dirty):
+                self._grow(len(self.ids))
+        return rows
+
+    def _grow(self, needed):
+        size = max(needed, 2 * len(self.dirty))
+        extra = size - len(self.dirty)
+        self.X = np.vstack([self.X, np.zeros((extra, self.X.shape[1]))])
+        self.reading_ts = np.concatenate([self.reading_ts, np.zeros(extra)])
+        self.dirty = np.concatenate([self.dirty, np.zeros(extra, dtype=bool)])
+        self.inflight = np.concatenate([self.inflight, np.zeros(extra, dtype=bool)])
+        self.risk = np.concatenate([self.risk, np.full(extra, np.nan)])
+        self.risk_trend = np.concatenate([self.risk_trend, np.zeros(extra)])
+        self.scored_ts = np.concatenate([self.scored_ts, np.full(extra, np.nan)])
+
+    # --- Input ---
+    def wait_for_capacity(self, timeout=None):
+        """Blocks while the batch queue is full. Returns False on timeout."""
+        if not self.queue.full():
+            return True
+        self.stats["blocked_updates"] += 1
+        start = time.perf_counter()
+        deadline = None if timeout is None else start + timeout
+        while self.queue.full() and not self._stop.is_set():
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            time.sleep(0.005)
+        self.stats["blocked_s"] += time.perf_counter() - start
+        return not self.queue.full()
+
+    def update_rows(self, rows, X, timestamps):
+        """
+        Vectorized update: the latest feature row for each bridge in `rows`.
+
+        Args:
+            rows (np.ndarray): Row indices from `register`.
+            X (np.ndarray): (len(rows), n_features) in `self.features` order.
+            timestamps: Epoch seconds of the readings (scalar or per row).
+        """
+        self.wait_for_capacity()
+        with self._lock:
+            self.X[rows] = X
+            self.reading_ts[rows] = timestamps
+            self.dirty[rows] = True
+        self.stats["readings"] += len(rows)
+
+    def update(self, readings):
+        """
+        Adds a readings.ReadingBatch or reading dicts (as produced by
+        ingest_server.validate_reading).
+
+        Each dict needs `node_id` or `location_id`, `timestamp` and the sensor
+        fields. With a windowed model only readings that complete a window
+        produce a feature row.
+        """
+        if isinstance(readings, ReadingBatch):
+            if self.streams is None and set(self.features) <= set(READING_DTYPE.names):
+                # Columnar fast path: one register call per distinct source
+                if len(readings):
+                    rows = self.register(readings.sources)[readings.data["source"]]
+                    self.update_rows(rows, readings.features(self.features), readings.data["timestamp_ms"] / 1000.0)
+                return
+            readings = readings.to_dicts("ingest")
+        ids, rows, stamps = [], [], []
+        for reading in readings:
+            bridge = reading.get("location_id") or reading["node_id"]
+            if self.streams is not None:
+                features = self.streams.push(bridge, reading)
+                if features is None:
+                    continue
+                row = [features[name] for name in self.features]
+            else:
+                row = [reading[name] for name in self.features]
+            ids.append(bridge)
+            rows.append(row)
+            stamps.append(reading.get("timestamp", time.time()))
+        if ids:
+            self.update_rows(self.register(ids), np.asarray(rows, dtype=np.float64), np.asarray(stamps))
+
+    # --- Scheduling ---
+    def run_cycle(self):
+        """
+        Snapshots the dirty rows and queues them as micro-batches.
+
+        Returns:
+            int: Bridges queued (0 if nothing changed or the cycle was deferred).
+        """
+        depth = self.queue.qsize()
+        self.queue_depth.append(depth)
+        free = self.queue.maxsize - depth
+        with self._lock:
+            # Rows still in flight stay dirty and go out with the next cycle
+            n = len(self.ids)
+            rows = np.flatnonzero(self.dirty[:n] & ~self.inflight[:n])
+            if not len(rows):
+                return 0
+            # Queue full: leave rows dirty, they coalesce into the next cycle
+            if free <= 0:
+                self.stats["deferred_cycles"] += 1
+                return 0
+            # Room for part of the cycle: take what fits, starting where the
+            # last partial cycle stopped so no bridge is starved
+            if len(rows) > free * self.batch_size:
+                self.stats["partial_cycles"] += 1
+                rows = np.roll(rows, -np.searchsorted(rows, self._cursor))[:free * self.batch_size]
+                self._cursor = rows[-1] + 1
+            X = self.X[rows]
+            stamps = self.reading_ts[rows]
+            self.dirty[rows] = False
+            self.inflight[rows] = True
+
+        cycle = _Cycle(time.perf_counter(), -(-len(rows) // self.batch_size))
+        for start in range(0, len(rows), self.batch_size):
+            end = start + self.batch_size
+            self.queue.put((cycle, rows[start:end], X[start:end], stamps[start:end]))
+        self.stats["cycles"] += 1
+        return len(rows)
+
+    def score_dirty(self):
+        """
+        Scores every dirty bridge on the calling thread and hands the frame
+        to the sink. Deterministic replays (replay.py) call this on their
+        virtual clock instead of starting the ticker and workers.
+
+        Returns:
+            pd.DataFrame: The scores, or None if nothing changed.
+        """
+        with self._lock:
+            n = len(self.ids)
+            rows = np.flatnonzero(self.dirty[:n] & ~self.inflight[:n])
+            if not len(rows):
+                return None
+            X, stamps = self.X[rows], self.reading_ts[rows]
+            self.dirty[rows] = False
+            self.inflight[rows] = True
+        frame = self._score_or_release(rows, X, stamps)
+        with self._lock:
+            self.stats["cycles"] += 1
+            self.stats["scored"] += len(rows)
+        if self.sink is not None:
+            self.sink(frame)
+        return frame
+
+    def _worker(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            cycle, rows, X, stamps = item
+            try:
+                part = self._score_or_release(rows, X, stamps)
+                self.batch_sizes.append(len(rows))
+                with self._lock:
+                    self.stats["batches"] += 1
+                    self.stats["scored"] += len(rows)
+            except Exception as e:
+                # A bad model file or a shape mismatch must not kill the worker: the
+                # rows are released (see _score_or_release) and the cycle still completes
+                part = None
+                with self._lock:
+                    self.stats["failed_batches"] += 1
+                print(f"⚠️ Scoring a batch of {len(rows)} bridges failed: {e}")
+            try:
+                with cycle.lock:
+                    if part is not None:
+                        cycle.parts.append(part)
+                    cycle.remaining -= 1
+                    done = cycle.remaining == 0
+                if done:
+                    self.cycle_latency.append(time.perf_counter() - cycle.started)
+                    if self.sink is not None and cycle.parts:
+                        self.sink(pd.concat(cycle.parts, ignore_index=True))
+            except Exception as e:
+                print(f"⚠️ Score sink failed: {e}")
+            finally:
+                self.queue.task_done()
+
+    def _score_or_release(self, rows, X, stamps):
+        """`_score`, but clears the rows' in-flight flags if it raises."""
+        try:
+            return self._score(rows, X, stamps)
+        except Exception:
+            with self._lock:
+                self.inflight[rows] = False
+            raise
+
+    def _score(self, rows, X, stamps):
+        model = get_model(self.model_path).model
+        probs = model.predict_proba(X)
+        critical = list(model.classes_).index(1) if 1 in model.classes_ else probs.shape[1] - 1
+        risk = probs[:, critical]
+        now = time.time()
+
+        # Risk trend per bridge (EWMA of the slope between consecutive scores).
+        # Workers run concurrently, so the read-modify-write holds the lock;
+        # `inflight` keeps a row out of other cycles until it is written back
+        with self._lock:
+            previous, last = self.risk[rows], self.scored_ts[rows]
+            dt = stamps - last
+            seen = np.isfinite(previous) & (dt > 0)
+            slope = np.zeros(len(rows))
+            slope[seen] = (risk[seen] - previous[seen]) / dt[seen]
+            trend = np.where(seen, (1 - TREND_ALPHA) * self.risk_trend[rows] + TREND_ALPHA * slope, 0.0)
+            self.risk[rows] = risk
+            self.risk_trend[rows] = trend
+            self.scored_ts[rows] = stamps
+            self.inflight[rows] = False
+            ids = [self.ids[r] for r in rows]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            hours = np.where(trend > 0, (FAILURE_PROBABILITY - risk) / trend / 3600, np.inf)
+        hours = np.where(risk >= FAILURE_PROBABILITY, 0.0, hours)
+
+        return pd.DataFrame({
+            "bridge_id": ids,
+            "reading_ts": stamps,
+            "scored_at": now,
+            "health_score": np.round(100 * (1 - risk), 1),
+            "failure_probability": risk,
+            "failure_window_h": hours,
+        })
+
+    def start(self):
+        for worker in self.workers:
+            worker.start()
+        self._ticker = threading.Thread(target=self._tick_loop, name="scoring-ticker", daemon=True)
+        self._ticker.start()
+        return self
+
+    def _tick_loop(self):
+        next_tick = time.perf_counter()
+        while not self._stop.is_set():
+            self.run_cycle()
+            next_tick += self.cadence_s
+            delay = next_tick - time.perf_counter()
+            if delay < 0: # Fell behind: skip the missed ticks instead of bursting
+                next_tick = time.perf_counter()
+            self._stop.wait(max(0.0, delay))
+
+    def stop(self, drain=True):
+        """Stops the ticker; with `drain`, scores what is still dirty first."""
+        self._stop.set()
+        if self._ticker is not None:
+            self._ticker.join()
+        if drain:
+            self.queue.join() # Finish in-flight rows so run_cycle can take them again
+            while self.run_cycle():
+                self.queue.join()
+        for _ in self.workers:
+            self.queue.put(None)
+        for worker in self.workers:
+            worker.join()
+        if hasattr(self.sink, "close"): # e.g. ScoreSink writes its buffered rows
+            self.sink.close()
+
+    # --- Output ---
+    def latest(self):
+        """Current score of every bridge that has been scored at least once."""
+        n = len(self.ids)
+        risk = self.risk[:n]
+        scored = np.isfinite(risk)
+        trend = self.risk_trend[:n][scored]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            hours = np.where(trend > 0, (FAILURE_PROBABILITY - risk[scored]) / trend / 3600, np.inf)
+        return pd.DataFrame({
+            "bridge_id": np.asarray(self.ids, dtype=object)[scored],
+            "reading_ts": self.scored_ts[:n][scored],
+            "health_score": np.round(100 * (1 - risk[scored]), 1),
+            "failure_probability": risk[scored],
+            "failure_window_h": np.where(risk[scored] >= FAILURE_PROBABILITY, 0.0, hours),
+        })
+
+    def metrics(self):
+        """Counters plus batch size, queue depth and per-cycle latency summaries."""
+        def summary(values, scale=1.0):
+            if not values:
+                return {"p50": None, "p95": None, "max": None}
+            a = np.asarray(values) * scale
+            return {"p50": float(np.percentile(a, 50)), "p95": float(np.percentile(a, 95)), "max": float(a.max())}
+
+        return dict(
+            self.stats,
+            bridges=len(self.ids),
+            queue_depth_now=self.queue.qsize(),
+            pending_bridges=int(self.dirty[:len(self.ids)].sum()),
+            batch_size=summary(self.batch_sizes),
+            queue_depth=summary(self.queue_depth),
+            cycle_latency_ms=summary(self.cycle_latency, 1000),
+        )
+
+
+class SchedulerSink:
+    """
+    Ingest sink (see ingest_server.py) that feeds the scheduler and then
+    forwards the batch to another sink (e.g. StoreSink), if any.
+
+    The sink runs on the ingest flusher's worker thread, so a full scoring
+    queue blocks the flush and ingest answers 503 once its buffer fills.
+    """
+
+    def __init__(self, scheduler, inner=None):
+        self.scheduler = scheduler
+        self.inner = inner
+
+    def __call__(self, batch):
+        self.scheduler.update(batch)
+        if self.inner is not None:
+            self.inner(batch)
+
+
+def benchmark(n_bridges, seconds=10.0, cadence_s=CADENCE_S, workers=WORKERS, batch_size=BATCH_SIZE,
+              model_path=None, sink=None, seed=0):
+    """
+    Feeds a simulated fleet in real time (10 Hz per bridge) through the scheduler.
+
+    Returns:
+        dict: Scheduler metrics plus ingest rate and cycle cost vs. cadence.
+    """
+    from fleet_sim import FleetSimulator
+
+    scheduler = ScoringScheduler(sink, model_path, cadence_s, workers, batch_size, capacity=n_bridges)
+    if scheduler.streams is not None:
+        raise ValueError("benchmark needs a raw-feature model; windowed models score through `update`")
+    sim = FleetSimulator(n_bridges, seed=seed)
+    rows = scheduler.register(sim.ids)
+    columns = [SENSOR_FIELDS.index(name) for name in scheduler.features]
+
+    scheduler.start()
+    start = time.perf_counter()
+    sim_s = 0.0
+    # One simulated second per block, paced to wall-clock time
+    for block in sim.run(seconds, block_seconds=1.0):
+        values = np.stack([block[field] for field in SENSOR_FIELDS], axis=-1)[:, :, columns]
+        for i, ts in enumerate(block["timestamp"]):
+            scheduler.update_rows(rows, values[i], ts)
+        sim_s += len(block["timestamp"]) / sim.fs
+        delay = sim_s - (time.perf_counter() - start)
+        if delay > 0:
+            time.sleep(delay)
+    elapsed = time.perf_counter() - start
+    scheduler.stop()
+
+    result = scheduler.metrics()
+    result["readings_per_s"] = result["readings"] / elapsed
+    result["real_time_factor"] = sim_s / elapsed
+    return result
+
+
+def _serve(args):
+    from ingest_server import serve
+
+    inner = None
+    if args.store:
+        from telemetry_store import StoreSink, TelemetryStore
+        inner = StoreSink(TelemetryStore(args.store))
+    scheduler = ScoringScheduler(ScoreSink(args.scores), cadence_s=args.cadence, workers=args.workers,
+                                 batch_size=args.batch_size).start()
+    print(f"🧮 Scoring every {args.cadence:g}s with {args.workers} workers -> '{args.scores}'")
+    try:
+        asyncio.run(serve(args.host, args.port, SchedulerSink(scheduler, inner)))
+    finally:
+        scheduler.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SetuAayu fleet scoring scheduler")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_serve = sub.add_parser("serve", help="Ingest service that also scores every bridge continuously")
+    p_serve.add_argument("--host", default="0.0.0.0")
+    p_serve.add_argument("--port", type=int, default=8000)
+    p_serve.add_argument("--scores", default=SCORES_DIR, help="Parquet directory for score rows")
+    p_serve.add_argument("--store", help="Also keep the raw readings in this columnar store")
+    p_bench = sub.add_parser("bench", help="Score simulated fleets of increasing size")
+    p_bench.add_argument("--bridges", type=int, nargs="+", default=[100, 1000, 10000])
+    p_bench.add_argument("--seconds", type=float, default=10.0)
+    for p in (p_serve, p_bench):
+        p.add_argument("--cadence", type=float, default=CADENCE_S)
+        p.add_argument("--workers", type=int, default=WORKERS)
+        p.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        _serve(args)
+    else:
+        print(f"--- Scoring scheduler benchmark ({args.seconds:g}s per fleet, cadence {args.cadence:g}s, "
+              f"{args.workers} workers, batch {args.batch_size}) ---")
+        print(f"{'bridges':>8} {'readings/s':>11} {'cycles':>7} {'deferred':>9} {'batch p50':>10} "
+              f"{'queue max':>10} {'cycle p50':>10} {'cycle p95':>10} {'cycle max':>10}")
+        for n in args.bridges:
+            m = benchmark(n, args.seconds, args.cadence, args.workers, args.batch_size)
+            lat, batch, depth = m["cycle_latency_ms"], m["batch_size"], m["queue_depth"]
+            if lat["p50"] is None:
+                print(f"{n:>8,} no cycle completed")
+                continue
+            print(f"{n:>8,} {m['readings_per_s']:>11,.0f} {m['cycles']:>7} {m['deferred_cycles']:>9} "
+                  f"{batch['p50']:>10.0f} {depth['max']:>10.0f} "
+                  f"{lat['p50']:>8.1f}ms {lat['p95']:>8.1f}ms {lat['max']:>8.1f}ms")
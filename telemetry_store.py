@@ -0,0 +1,336 @@
+"""
+SetuAayu Columnar Telemetry Store
+
+Readings are written as Parquet files partitioned by bridge and day:
+
+    telemetry_store/location_id=BLR_SB_01/date=2025-12-05/part-....parquet
+
+Sensor channels are stored as float32 and every file is sorted by timestamp,
+so scans only open the partitions for the requested bridge/days and Parquet
+row-group statistics skip everything outside the requested time range.
+
+Usage:
+    python telemetry_store.py convert bridge_data.csv synthetic_bridge.csv
+    python telemetry_store.py query --location BLR_SB_01 --start 2025-12-05 --end 2025-12-06
+    python telemetry_store.py bench --days 30
+    python telemetry_store.py migrate
+"""
+import argparse
+import os
+import re
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from asset_registry import get_registry
+from bridge_sim import SENSOR_FIELDS
+
+DEFAULT_ROOT = "telemetry_store"
+CSV_CHUNK_ROWS = 500_000
+
+# Columns stored inside each file (location_id and date live in the path)
+FILE_SCHEMA = pa.schema(
+    [("timestamp", pa.timestamp("ms")), ("node_id", pa.string())]
+    + [(field, pa.float32()) for field in SENSOR_FIELDS]
+    + [("health_score", pa.float32()), ("scenario", pa.string())]
+)
+PARTITION_SCHEMA = pa.schema([("location_id", pa.string()), ("date", pa.string())])
+PARTITIONING = ds.partitioning(PARTITION_SCHEMA, flavor="hive")
+DATASET_SCHEMA = pa.unify_schemas([FILE_SCHEMA, PARTITION_SCHEMA])
+
+
+def location_slug(name):
+    """
+    Partition id for a location: its asset ID if the name, alias, ID or node
+    is registered (asset_registry.py), else a partition-safe slug of the name.
+    """
+    asset_id = get_registry().resolve_id(name)
+    if asset_id is not None:
+        return asset_id
+    return re.sub(r"[^A-Za-z0-9]+", "_", str(name)).strip("_").upper()
+
+
+class TelemetryStore:
+    """Append-only, partitioned Parquet store for sensor readings."""
+
+    def __init__(self, root=DEFAULT_ROOT):
+        self.root = root
+
+    # --- Writes ---
+    def append(self, df):
+        """
+        Appends readings to the store.
+
+        Args:
+            df (pd.DataFrame): Needs `timestamp`, `location_id` and the sensor
+                columns. `node_id`, `health_score` and `scenario` are optional.
+
+        Returns:
+            int: Number of files written.
+        """
+        if df.empty:
+            return 0
+        df = df.copy()
+        df["timestamp"] = pd.to_datetime(df["timestamp"])
+        for column in FILE_SCHEMA.names:
+            if column not in df.columns:
+                df[column] = None
+        df["_date"] = df["timestamp"].dt.strftime("%Y-%m-%d")
+
+        files = 0
+        for (location_id, day), part in df.groupby(["location_id", "_date"], sort=False, observed=True):
+            part = part.sort_values("timestamp", kind="stable")
+            table = pa.Table.from_pandas(part[FILE_SCHEMA.names], schema=FILE_SCHEMA, preserve_index=False, safe=False)
+            directory = self._partition_dir(location_id, day)
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"part-{time.time_ns()}-{uuid.uuid4().hex[:8]}.parquet")
+            pq.write_table(table, path)
+            files += 1
+        return files
+
+    def compact(self, location_id=None):
+        """
+        Merges the small files left by frequent appends into one file per
+        partition. Not crash-atomic, see the comment below.
+        """
+        merged = 0
+        for location in ([location_id] if location_id else self.locations()):
+            for day in self.days(location):
+                directory = self._partition_dir(location, day)
+                paths = sorted(os.path.join(directory, f) for f in os.listdir(directory) if f.endswith(".parquet"))
+                if len(paths) < 2:
+                    continue
+                table = pa.concat_tables(pq.read_table(p, schema=FILE_SCHEMA) for p in paths)
+                table = table.sort_by("timestamp")
+                # Temporary name first, so a crash mid-write never leaves a truncated file. Not
+                # crash-atomic as a whole: a crash after the rename but before the removals
+                # leaves the originals next to the merged file and duplicates their rows
+                path = os.path.join(directory, f"part-{time.time_ns()}-{uuid.uuid4().hex[:8]}.parquet")
+                pq.write_table(table, path + ".tmp")
+                os.replace(path + ".tmp", path)
+                for p in paths:
+                    os.remove(p)
+                merged += 1
+        return merged
+
+    def migrate(self):
+        """
+        Moves partitions written under name slugs (before locations resolved
+        to asset IDs) into their asset's partition, then compacts it.
+
+        Returns:
+            dict: Old location id -> asset id, for every partition moved.
+        """
+        moved = {}
+        for location in self.locations():
+            target = location_slug(location)
+            if target == location:
+                continue
+            for day in self.days(location):
+                source = self._partition_dir(location, day)
+                directory = self._partition_dir(target, day)
+                os.makedirs(directory, exist_ok=True)
+                for f in os.listdir(source):
+                    os.replace(os.path.join(source, f), os.path.join(directory, f))
+                os.rmdir(source)
+            os.rmdir(os.path.join(self.root, f"location_id={location}"))
+            moved[location] = target
+        for target in sorted(set(moved.values())):
+            self.compact(target)
+        return moved
+
+    # --- Reads ---
+    def locations(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(d.split("=", 1)[1] for d in os.listdir(self.root) if d.startswith("location_id="))
+
+    def days(self, location_id):
+        directory = os.path.join(self.root, f"location_id={location_id}")
+        if not os.path.isdir(directory):
+            return []
+        return sorted(d.split("=", 1)[1] for d in os.listdir(directory) if d.startswith("date="))
+
+    def scan(self, location_id=None, start=None, end=None, columns=None, filter=None):
+        """
+        Reads readings for one or all bridges over [start, end).
+
+        Args:
+            location_id (str or list): Bridge id(s) to read (default: all).
+            start, end (datetime or str): Time range; either may be omitted.
+            columns (list): Columns to project (default: all).
+            filter (pyarrow.dataset.Expression): Extra predicate pushed down
+                to the Parquet reader, e.g. `ds.field("strain") > 500`.
+
+        Returns:
+            pd.DataFrame
+        """
+        dataset = self.dataset(location_id, start, end)
+        if dataset is None:
+            return pd.DataFrame(columns=columns or DATASET_SCHEMA.names)
+        expression = _time_filter(start, end)
+        if filter is not None:
+            expression = filter if expression is None else expression & filter
+        table = dataset.to_table(columns=columns, filter=expression)
+        return table.to_pandas()
+
+    def dataset(self, location_id=None, start=None, end=None):
+        """Builds a pyarrow dataset over only the partitions that can match."""
+        if location_id is None:
+            locations = self.locations()
+        elif isinstance(location_id, str):
+            locations = [location_id]
+        else:
+            locations = list(location_id)
+
+        first_day = pd.Timestamp(start).strftime("%Y-%m-%d") if start is not None else None
+        last_day = pd.Timestamp(end).strftime("%Y-%m-%d") if end is not None else None
+
+        paths = []
+        for location in locations:
+            for day in self.days(location):
+                if (first_day and day < first_day) or (last_day and day > last_day):
+                    continue
+                directory = self._partition_dir(location, day)
+                paths.extend(os.path.join(directory, f) for f in sorted(os.listdir(directory)) if f.endswith(".parquet"))
+        if not paths:
+            return None
+        return ds.dataset(paths, schema=DATASET_SCHEMA, format="parquet",
+                          partitioning=PARTITIONING, partition_base_dir=self.root)
+
+    def _partition_dir(self, location_id, day):
+        return os.path.join(self.root, f"location_id={location_id}", f"date={day}")
+
+
+def _time_filter(start, end):
+    expression = None
+    if start is not None:
+        expression = ds.field("timestamp") >= pa.scalar(pd.Timestamp(start).to_pydatetime(), pa.timestamp("ms"))
+    if end is not None:
+        upper = ds.field("timestamp") < pa.scalar(pd.Timestamp(end).to_pydatetime(), pa.timestamp("ms"))
+        expression = upper if expression is None else expression & upper
+    return expression
+
+
+class StoreSink:
+    """
+    Ingest sink (see ingest_server.py) that appends flushed batches
+    (readings.ReadingBatch) to the store, partitioned by node id.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def __call__(self, batch):
+        self.store.append(batch_frame(batch))
+
+
+def batch_frame(batch):
+    """Ingest ReadingBatch -> DataFrame with `location_id` slugs (computed once per node)."""
+    df = batch.to_frame("ingest")
+    slugs = np.asarray([location_slug(source) for source in batch.sources], dtype=object)
+    df["location_id"] = slugs[batch.data["source"]]
+    df["node_id"] = batch.source_names()
+    return df
+
+
+def convert_csv(path, store, chunk_rows=CSV_CHUNK_ROWS):
+    """
+    One-shot conversion of a legacy CSV (bridge_data.csv / synthetic_bridge.csv).
+
+    Rows without a `location_id` column get one derived from `location`.
+    """
+    dtypes = {field: "float32" for field in SENSOR_FIELDS}
+    rows = 0
+    for chunk in pd.read_csv(path, chunksize=chunk_rows, dtype=dtypes):
+        if "location_id" not in chunk.columns:
+            chunk["location_id"] = chunk["location"].map(location_slug)
+        store.append(chunk)
+        rows += len(chunk)
+    store.compact()
+    return rows
+
+
+def benchmark(days, hz=10, location_id="BENCH_01"):
+    """Writes `days` of `hz` data for one bridge to a scratch store, then times typical queries."""
+    with tempfile.TemporaryDirectory(prefix="setuaayu_bench_") as root:
+        _benchmark(TelemetryStore(root), days, hz, location_id)
+
+
+def _benchmark(store, days, hz, location_id):
+    rng = np.random.default_rng(0)
+    per_day = int(86400 * hz)
+    start = datetime(2025, 1, 1)
+
+    t0 = time.perf_counter()
+    for d in range(days):
+        day_start = np.datetime64(start + timedelta(days=d), "ms")
+        df = pd.DataFrame({
+            "timestamp": day_start + (np.arange(per_day) * (1000 / hz)).astype("timedelta64[ms]"),
+            "location_id": location_id,
+        })
+        for field in SENSOR_FIELDS:
+            df[field] = rng.random(per_day, dtype=np.float32)
+        store.append(df)
+    write_s = time.perf_counter() - t0
+
+    def timed(label, **kwargs):
+        t = time.perf_counter()
+        out = store.scan(location_id, **kwargs)
+        print(f"{label:<38} {len(out):>12,} rows  {time.perf_counter() - t:8.3f}s")
+
+    print(f"Wrote {days * per_day:,} rows in {write_s:.2f}s")
+    mid = start + timedelta(days=days // 2)
+    timed("1 hour, all columns", start=mid, end=mid + timedelta(hours=1))
+    timed("1 day, strain only", start=mid, end=mid + timedelta(days=1), columns=["timestamp", "strain"])
+    timed("full history, strain only", columns=["strain"])
+    timed("full history, strain > 0.999", columns=["timestamp", "strain"], filter=ds.field("strain") > 0.999)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SetuAayu columnar telemetry store")
+    parser.add_argument("--root", default=DEFAULT_ROOT, help="Store directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_convert = sub.add_parser("convert", help="Convert legacy CSVs into the store")
+    p_convert.add_argument("csv", nargs="+")
+
+    p_query = sub.add_parser("query", help="Scan one bridge over a time range")
+    p_query.add_argument("--location")
+    p_query.add_argument("--start")
+    p_query.add_argument("--end")
+    p_query.add_argument("--columns", help="Comma separated column list")
+
+    p_bench = sub.add_parser("bench", help="Write synthetic 10 Hz history to a scratch store and time queries")
+    p_bench.add_argument("--days", type=int, default=30)
+
+    sub.add_parser("migrate", help="Move name-slug partitions into their asset ID partitions")
+
+    args = parser.parse_args()
+    store = TelemetryStore(args.root)
+
+    if args.command == "convert":
+        for path in args.csv:
+            t = time.perf_counter()
+            rows = convert_csv(path, store)
+            print(f"✅ Converted {rows} rows from '{path}' in {time.perf_counter() - t:.2f}s")
+    elif args.command == "query":
+        t = time.perf_counter()
+        columns = args.columns.split(",") if args.columns else None
+        df = store.scan(args.location, args.start, args.end, columns=columns)
+        print(df)
+        print(f"{len(df)} rows in {time.perf_counter() - t:.3f}s")
+    elif args.command == "migrate":
+        moved = store.migrate()
+        for old, new in moved.items():
+            print(f"✅ {old} -> {new}")
+        print(f"Migrated {len(moved)} partition(s)")
+    else:
+        benchmark(args.days)
@@ -1,42 +1,417 @@
-import pandas as pd
-import numpy as np
+"""
+SetuAayu Training Pipeline
+
+Loads one or more datasets (CSV files are read in chunks with explicit dtypes,
+directories are read from the columnar telemetry store), optionally runs a
+cross-validated hyperparameter search across all cores, fits the final
+Random Forest and registers it in `model_registry/` with its metrics, data
+fingerprint and per-stage timings. The trees are also exported to the compact
+NumPy format (forest_model.py) used by the serving path, and `model.pkl` is
+refreshed so existing tooling keeps working.
+
+`--streaming` trains on data larger than RAM: the sources are read chunk by
+chunk and each row is routed to a hold-out sample or to one of `--members`
+fixed-size uniform samples (reservoirs). Each member fits its share of the
+trees, and the trees are merged into one forest. Memory is bounded by the
+reservoirs plus one chunk, whatever the number of rows. Every stage reports
+the process's peak RSS.
+
+Usage:
+    python train_model.py                                   # bridge_data.csv, default params
+    python train_model.py --data synthetic_bridge.csv --search
+    python train_model.py --data big.csv --features windowed --search --workers 8
+    python train_model.py --data synthetic_bridge.csv --streaming
+    python train_model.py --data generated:100000000 --streaming --member-rows 250000
+"""
+import argparse
+import hashlib
+import itertools
+import math
+import os
 import pickle
-from sklearn.model_selection import train_test_split
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import classification_report, accuracy_score
+from sklearn.metrics import accuracy_score, classification_report, f1_score
+from sklearn.model_selection import StratifiedKFold, train_test_split
+
+from bridge_sim import SENSOR_FIELDS, generate_bridge_batch
+from forest_model import FOREST_DIR, export_forest, forest_dir, parity_check
+from model_registry import ModelRegistry, fingerprint_files
+
+RANDOM_STATE = 42
+CSV_CHUNK_ROWS = 500_000
+GENERATED_PREFIX = "generated:" # --data generated:<rows> streams fixed-seed simulator output
+STREAM_MEMBERS = 4
+STREAM_MEMBER_ROWS = 250_000
+STREAM_TEST_ROWS = 200_000
+TEST_SIZE = 0.2
+# Explicit dtypes: float32 sensors, categorical labels and locations
+CSV_DTYPES = dict({field: "float32" for field in SENSOR_FIELDS},
+                  scenario="category", location="category", location_id="category")
+DEFAULT_PARAMS = {"n_estimators": 100, "max_depth": None, "min_samples_leaf": 1}
+PARAM_GRID = {
+    "n_estimators": [50, 100, 200],
+    "max_depth": [None, 8, 16],
+    "min_samples_leaf": [1, 5],
+}
+
+stage_times = {}
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB (None if unavailable)."""
+    try:
+        import resource
+    except ImportError: # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024 # bytes on macOS, KB on Linux
+
+
+@contextmanager
+def stage(name):
+    """Records wall-clock time (and reports peak memory) for one pipeline stage."""
+    print(f"▶ {name}...")
+    start = time.perf_counter()
+    yield
+    stage_times[name] = time.perf_counter() - start
+    peak = peak_rss_mb()
+    print(f"  done in {stage_times[name]:.2f}s" + (f" (peak RSS {peak:.0f} MB)" if peak else ""))
+
 
 # 1. Load Data
-print("Loading dataset...")
-try:
-    df = pd.read_csv("bridge_data.csv")
-except FileNotFoundError:
-    print("Error: 'bridge_data.csv' not found. Run 'generate_dataset.py' first.")
-    exit()
-
-# 2. Preprocessing
-# Features
-X = df[['vibration_x', 'vibration_y', 'vibration_z', 'strain', 'tilt']]
-# Target (Convert 'critical'/'normal' to 1/0)
-y = df['scenario'].apply(lambda x: 1 if x == 'critical' else 0)
-
-# 3. Split Data
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-# 4. Train Model
-print(f"Training Random Forest on {len(X_train)} samples...")
-model = RandomForestClassifier(n_estimators=100, random_state=42)
-model.fit(X_train, y_train)
-
-# 5. Verify (Test)
-print("\n--- Model Verification Results ---")
-y_pred = model.predict(X_test)
-accuracy = accuracy_score(y_test, y_pred)
-print(f"Accuracy: {accuracy * 100:.2f}%")
-print("\nClassification Report:")
-print(classification_report(y_test, y_pred, target_names=['Normal', 'Critical']))
-
-# 6. Save Model
-with open("model.pkl", "wb") as f:
-    pickle.dump(model, f)
-    
-print("\n✅ Model saved to 'model.pkl'. Ready for app integration.")
+def load_dataset(paths, features="raw", chunk_rows=CSV_CHUNK_ROWS):
+    """
+    Loads and concatenates datasets.
+
+    Returns:
+        tuple: (X DataFrame, y Series with 1 = critical)
+    """
+    columns = SENSOR_FIELDS + ["scenario"]
+    if features == "windowed":
+        columns += ["timestamp", "location", "location_id"]
+
+    frames = []
+    for path in paths:
+        if os.path.isdir(path):
+            from telemetry_store import TelemetryStore
+            df = TelemetryStore(path).scan(columns=[c for c in columns if c != "location"])
+        else:
+            dtypes = {field: "float32" for field in SENSOR_FIELDS}
+            dtypes["scenario"] = "category"
+            reader = pd.read_csv(path, usecols=lambda c: c in columns, dtype=dtypes, chunksize=chunk_rows)
+            df = pd.concat(reader, ignore_index=True)
+        if "location_id" not in df.columns and "location" in df.columns:
+            df["location_id"] = df["location"]
+        frames.append(df)
+    df = pd.concat(frames, ignore_index=True)
+
+    if features == "windowed":
+        from features import extract_batch
+        df = df.sort_values(["location_id", "timestamp"], kind="stable")
+        windows = extract_batch(df, group_col="location_id", keep_cols=("scenario",))
+        X = windows.drop(columns=["location_id", "scenario"])
+        y = (windows["scenario"] == "critical").astype(np.int8)
+    else:
+        X = df[SENSOR_FIELDS]
+        y = (df["scenario"] == "critical").astype(np.int8)
+    return X, y.rename("critical")
+
+
+# 1b. Streaming Load (out-of-core)
+def iter_chunks(paths, chunk_rows=CSV_CHUNK_ROWS, seed=RANDOM_STATE):
+    """
+    Yields (X float32 array, y int8 array) chunks of raw sensor features.
+
+    Args:
+        paths (list): CSV files, telemetry store directories, or
+            "generated:<rows>" for fixed-seed simulator output.
+    """
+    columns = SENSOR_FIELDS + ["scenario"]
+
+    def split(df):
+        X = df[SENSOR_FIELDS].to_numpy(dtype=np.float32)
+        return X, (df["scenario"] == "critical").to_numpy(dtype=np.int8)
+
+    for path in paths:
+        if path.startswith(GENERATED_PREFIX):
+            total = int(path[len(GENERATED_PREFIX):])
+            for i, offset in enumerate(range(0, total, chunk_rows)):
+                yield split(generate_bridge_batch(min(chunk_rows, total - offset), seed=seed + i))
+        elif os.path.isdir(path):
+            from telemetry_store import TelemetryStore
+            dataset = TelemetryStore(path).dataset()
+            if dataset is None:
+                continue
+            for batch in dataset.to_batches(columns=columns, batch_size=chunk_rows):
+                yield split(batch.to_pandas())
+        else:
+            reader = pd.read_csv(path, usecols=lambda c: c in columns,
+                                 dtype={c: t for c, t in CSV_DTYPES.items() if c in columns},
+                                 chunksize=chunk_rows)
+            for chunk in reader:
+                yield split(chunk)
+
+
+class Reservoir:
+    """
+    Uniform random sample of at most `capacity` rows from a stream.
+
+    Every row gets a random key and the `capacity` smallest keys are kept
+    (equivalent to sampling without replacement), so each chunk is merged
+    with a few vectorized calls. Once full, rows whose key is above the
+    current maximum are dropped before any copying.
+    """
+
+    def __init__(self, capacity, n_features, rng):
+        self.capacity = capacity
+        self.rng = rng
+        self.X = np.empty((0, n_features), dtype=np.float32)
+        self.y = np.empty(0, dtype=np.int8)
+        self.keys = np.empty(0)
+        self.seen = 0
+
+    def add(self, X, y):
+        keys = self.rng.random(len(X))
+        self.seen += len(X)
+        if len(self.keys) == self.capacity:
+            candidates = keys < self.keys.max()
+            X, y, keys = X[candidates], y[candidates], keys[candidates]
+        if not len(keys):
+            return
+        self.X = np.concatenate([self.X, X])
+        self.y = np.concatenate([self.y, y])
+        self.keys = np.concatenate([self.keys, keys])
+        if len(self.keys) > self.capacity:
+            keep = np.sort(np.argpartition(self.keys, self.capacity)[:self.capacity])
+            self.X, self.y, self.keys = self.X[keep], self.y[keep], self.keys[keep]
+
+
+def stream_samples(chunks, members=STREAM_MEMBERS, member_rows=STREAM_MEMBER_ROWS,
+                   test_rows=STREAM_TEST_ROWS, test_size=TEST_SIZE, seed=RANDOM_STATE):
+    """
+    Routes every streamed row to the hold-out reservoir (with probability
+    `test_size`) or to one of `members` training reservoirs.
+
+    Returns:
+        tuple: (list of member Reservoirs, hold-out Reservoir, rows seen)
+    """
+    rng = np.random.default_rng(seed)
+    n_features = len(SENSOR_FIELDS)
+    train = [Reservoir(member_rows, n_features, rng) for _ in range(members)]
+    test = Reservoir(test_rows, n_features, rng)
+    rows = 0
+    for X, y in chunks:
+        rows += len(X)
+        # Holds out ~test_size of the rows, then deals the rest out to the members
+        route = np.where(rng.random(len(X)) < test_size, -1, rng.integers(0, members, len(X)))
+        test.add(X[route == -1], y[route == -1])
+        for k, reservoir in enumerate(train):
+            reservoir.add(X[route == k], y[route == k])
+    return train, test, rows
+
+
+def fit_subsampled_ensemble(samples, params, feature_names=SENSOR_FIELDS):
+    """
+    Fits one forest per sample and merges their trees into a single
+    RandomForestClassifier (soft voting over all trees, as in a plain forest).
+
+    Raises:
+        ValueError: If a sample does not contain both classes.
+    """
+    params = dict(params)
+    per_member = math.ceil(params.pop("n_estimators") / len(samples))
+    forests = []
+    for k, sample in enumerate(samples):
+        if len(np.unique(sample.y)) < 2:
+            raise ValueError(f"member {k} sampled only one class; use more data or fewer members")
+        X = pd.DataFrame(sample.X, columns=feature_names)
+        forest = RandomForestClassifier(n_estimators=per_member, random_state=RANDOM_STATE + k, n_jobs=-1, **params)
+        forests.append(forest.fit(X, sample.y))
+    model = forests[0]
+    model.estimators_ = [tree for forest in forests for tree in forest.estimators_]
+    model.n_estimators = len(model.estimators_)
+    return model
+
+
+# 2. Hyperparameter Search
+_worker_data = {}
+
+
+def _init_worker(X, y, splits):
+    # Data is shipped once per worker process, not once per job
+    _worker_data.update(X=X, y=y, splits=splits)
+
+
+def _evaluate(job):
+    """Fits one (params, fold) pair. Runs in a worker process."""
+    params, fold = job
+    X, y = _worker_data["X"], _worker_data["y"]
+    train_idx, test_idx = _worker_data["splits"][fold]
+    model = RandomForestClassifier(random_state=RANDOM_STATE, n_jobs=1, **params)
+    model.fit(X[train_idx], y[train_idx])
+    pred = model.predict(X[test_idx])
+    return params, fold, f1_score(y[test_idx], pred, zero_division=0)
+
+
+def grid_search(X, y, grid=PARAM_GRID, folds=3, workers=None):
+    """
+    Cross-validated search over `grid` on a process pool.
+
+    Folds are fixed by RANDOM_STATE, so results are reproducible for any
+    worker count.
+
+    Returns:
+        tuple: (best params dict, list of (params, mean F1) sorted best first)
+    """
+    Xv, yv = X.to_numpy(), y.to_numpy()
+    splits = list(StratifiedKFold(folds, shuffle=True, random_state=RANDOM_STATE).split(Xv, yv))
+    candidates = [dict(zip(grid, values)) for values in itertools.product(*grid.values())]
+    jobs = [(params, fold) for params in candidates for fold in range(len(splits))]
+
+    scores = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(Xv, yv, splits)) as pool:
+        for params, fold, score in pool.map(_evaluate, jobs, chunksize=1):
+            scores.setdefault(tuple(sorted(params.items(), key=str)), []).append(score)
+
+    ranked = sorted(((dict(k), float(np.mean(v))) for k, v in scores.items()),
+                    key=lambda item: (-item[1], str(item[0])))
+    return ranked[0][0], ranked
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the SetuAayu structural risk model")
+    parser.add_argument("--data", nargs="+", default=["bridge_data.csv"],
+                        help=f"CSV files, telemetry store directories and/or {GENERATED_PREFIX}<rows>")
+    parser.add_argument("--features", choices=["raw", "windowed"], default="raw",
+                        help="Raw instantaneous channels or sliding-window features (features.py)")
+    parser.add_argument("--search", action="store_true", help="Run the cross-validated grid search")
+    parser.add_argument("--folds", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=None, help="Process pool size (default: all cores)")
+    parser.add_argument("--registry", default="model_registry")
+    parser.add_argument("--output", default="model.pkl", help="Also write the final model here")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Out-of-core: sample the data chunk by chunk into bounded reservoirs")
+    parser.add_argument("--members", type=int, default=STREAM_MEMBERS, help="Streaming: ensemble members")
+    parser.add_argument("--member-rows", type=int, default=STREAM_MEMBER_ROWS,
+                        help="Streaming: training rows kept per member")
+    parser.add_argument("--chunk-rows", type=int, default=CSV_CHUNK_ROWS)
+    args = parser.parse_args()
+    if args.streaming and args.features != "raw":
+        parser.error("--streaming supports raw features only (windows would span chunk boundaries)")
+
+    print("Loading dataset...")
+    missing = [p for p in args.data if not p.startswith(GENERATED_PREFIX) and not os.path.exists(p)]
+    if missing:
+        print(f"Error: {missing} not found. Run 'generate_dataset.py' first.")
+        raise SystemExit(1)
+
+    if args.streaming:
+        with stage("Stream data into reservoirs"):
+            samples, holdout, rows = stream_samples(iter_chunks(args.data, args.chunk_rows),
+                                                    args.members, args.member_rows)
+            kept = sum(len(s.y) for s in samples)
+            print(f"  {rows} rows streamed; kept {kept} for training ({args.members} members), "
+                  f"{len(holdout.y)} for testing")
+        feature_columns = list(SENSOR_FIELDS)
+        X_test, y_test = pd.DataFrame(holdout.X, columns=feature_columns), holdout.y
+    else:
+        with stage("Load data"):
+            X, y = load_dataset(args.data, args.features)
+            rows = len(X)
+            print(f"  {len(X)} rows, {X.shape[1]} features, {int(y.sum())} critical")
+        feature_columns = list(X.columns)
+
+    with stage("Fingerprint data"):
+        # Generated data is identified by its spec (the simulator is seeded)
+        fingerprint = fingerprint_files([p for p in args.data if not p.startswith(GENERATED_PREFIX)])
+
+    # 3. Split Data
+    if args.streaming:
+        # The search runs on the first member's sample, which is a uniform subsample
+        X_train = pd.DataFrame(samples[0].X, columns=feature_columns)
+        y_train = pd.Series(samples[0].y, name="critical")
+    else:
+        X_train, X_test, y_train, y_test = train_test_split(
+            X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE, stratify=y if y.nunique() > 1 else None
+        )
+
+    params = dict(DEFAULT_PARAMS)
+    search_results = None
+    if args.search:
+        with stage(f"Grid search ({args.folds}-fold, {args.workers or os.cpu_count()} workers)"):
+            params, search_results = grid_search(X_train, y_train, folds=args.folds, workers=args.workers)
+        print(f"  Best params: {params} (F1 {search_results[0][1]:.4f})")
+
+    # 4. Train Model
+    if args.streaming:
+        with stage(f"Train subsampled ensemble ({args.members} x {max(len(s.y) for s in samples)} samples)"):
+            model = fit_subsampled_ensemble(samples, params, feature_columns)
+    else:
+        with stage(f"Train final model on {len(X_train)} samples"):
+            model = RandomForestClassifier(random_state=RANDOM_STATE, n_jobs=-1, **params)
+            model.fit(X_train, y_train)
+
+    # 5. Verify (Test)
+    with stage("Evaluate"):
+        y_pred = model.predict(X_test)
+        accuracy = accuracy_score(y_test, y_pred)
+        f1 = f1_score(y_test, y_pred, zero_division=0)
+
+    print("\n--- Model Verification Results ---")
+    print(f"Accuracy: {accuracy * 100:.2f}%")
+    print("\nClassification Report:")
+    print(classification_report(y_test, y_pred, labels=[0, 1], target_names=['Normal', 'Critical'], zero_division=0))
+
+    # 6. Save Model
+    # Windowed models need windowed inputs, so they are registered but not
+    # served until explicitly pinned (python model_registry.py pin <version>)
+    serve = args.features == "raw"
+    with stage("Export compact forest"):
+        # The export is named after its pickle and records the pickle's hash,
+        # so inference never pairs a pickle with another model's trees
+        raw = pickle.dumps(model)
+        export_dir = forest_dir(os.path.abspath(args.output)) if serve else tempfile.mkdtemp(prefix="forest_")
+        export_forest(model, export_dir, hashlib.sha256(raw).hexdigest())
+        proba_ok, labels_ok = parity_check(model, export_dir)
+        print(f"  Parity with sklearn: probabilities {'identical' if proba_ok else 'DIFFER'}, "
+              f"labels {'identical' if labels_ok else 'DIFFER'}")
+
+    with stage("Register model"):
+        if serve:
+            with open(args.output, "wb") as f:
+                f.write(raw)
+        version = ModelRegistry(args.registry).register(model, {
+            "params": params,
+            "features": args.features,
+            "feature_names": feature_columns,
+            "metrics": {"accuracy": accuracy, "f1": f1},
+            "data": {"paths": args.data, "fingerprint": fingerprint, "rows": rows},
+            "training": {"mode": "streaming", "members": args.members, "member_rows": args.member_rows}
+            if args.streaming else {"mode": "in-memory"},
+            "peak_rss_mb": peak_rss_mb(),
+            "search": [{"params": p, "f1": s} for p, s in search_results] if search_results else None,
+            "timings_s": dict(stage_times),
+        }, extra_files={FOREST_DIR: export_dir}, activate=serve)
+        if not serve:
+            shutil.rmtree(export_dir)
+
+    print("\n--- Stage Timings ---")
+    for name, seconds in stage_times.items():
+        print(f"{name:<55} {seconds:8.2f}s")
+    if serve:
+        print(f"\n✅ Model saved to '{args.output}' and registered as {version}. Ready for app integration.")
+    else:
+        print(f"\n✅ Model registered as {version} (windowed features, not activated).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+SetuAayu Digital Twin Stream
+
+Minimal WebSocket server (RFC 6455, stdlib asyncio) that pushes live sensor
+values to the Three.js viewer at 10 Hz. Each message is one 24-byte binary
+frame of little-endian float32:
+
+    vibration_x, vibration_y, vibration_z, strain, tilt, health_score
+
+The viewer loads once and animates from these frames, so the dashboard no
+longer re-injects and reloads the whole page when a value changes. Frames
+come from a `LiveFeed`, which ticks the simulator at most RATE_HZ times a
+second per location and scenario; the dashboard reads its metric cards from
+the same feed, so the 3D twin and the cards show one live stream.
+
+    ws://<host>:8766/twin?location=<name>&scenario=normal|critical
+
+The server binds to 127.0.0.1 unless `--host` says otherwise.
+
+Usage:
+    python twin_stream.py --port 8766
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import struct
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from bridge_sim import SENSOR_FIELDS, generate_bridge_data
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8766
+RATE_HZ = 10.0
+FRAME_FIELDS = SENSOR_FIELDS + ["health_score"]
+FRAME = struct.Struct("<6f")
+MAX_CLIENT_FRAME_BYTES = 4096 # Viewers only send control frames (<= 125 bytes)
+CLOSE_TOO_BIG = 1009
+
+_WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+def encode_frame(reading):
+    return FRAME.pack(*(float(reading[field]) for field in FRAME_FIELDS))
+
+
+def simulated_source(location, scenario):
+    """Default data source: the same simulator the dashboard cards use."""
+    return generate_bridge_data(scenario=scenario, location_name=location)
+
+
+class LiveFeed:
+    """
+    Shared live data source. Each (location, scenario) is ticked at most
+    `rate_hz` times a second, on a fixed time grid, and every viewer and
+    dashboard rerun in between reads that same tick.
+    """
+
+    def __init__(self, source=simulated_source, rate_hz=RATE_HZ):
+        self.source = source
+        self.period = 1.0 / rate_hz
+        self._latest = {} # (location, scenario) -> (tick number, reading)
+        self._lock = threading.Lock()
+
+    def __call__(self, location, scenario):
+        key = (location, scenario)
+        tick = int(time.monotonic() // self.period)
+        with self._lock:
+            entry = self._latest.get(key)
+            if entry is None or entry[0] != tick:
+                entry = self._latest[key] = (tick, self.source(location, scenario))
+        return dict(entry[1])
+
+
+def _ws_frame(payload, opcode=0x2):
+    # Server-to-client frames are never masked
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, length)
+    elif length < 1 << 16:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    return header + payload
+
+
+async def _read_ws_frame(reader):
+    """
+    Returns (opcode, payload) of the next client frame.
+
+    Raises:
+        ValueError: If the declared payload exceeds MAX_CLIENT_FRAME_BYTES.
+    """
+    b1, b2 = await reader.readexactly(2)
+    length = b2 & 0x7F
+    if length == 126:
+        (length,) = struct.unpack("!H", await reader.readexactly(2))
+    elif length == 127:
+        (length,) = struct.unpack("!Q", await reader.readexactly(8))
+    if length > MAX_CLIENT_FRAME_BYTES:
+        raise ValueError(f"client frame of {length} bytes")
+    mask = await reader.readexactly(4) if b2 & 0x80 else b"\0\0\0\0"
+    data = await reader.readexactly(length)
+    return b1 & 0x0F, bytes(b ^ mask[i % 4] for i, b in enumerate(data))
+
+
+class TwinStreamServer:
+    """Streams one frame per tick to every connected viewer."""
+
+    def __init__(self, source=None, rate_hz=RATE_HZ):
+        self.source = source or LiveFeed(rate_hz=rate_hz)
+        self.period = 1.0 / rate_hz
+        self.clients = 0
+
+    async def handle(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                key, _, value = line.decode("latin-1").partition(":")
+                headers[key.strip().lower()] = value.strip()
+
+            key = headers.get("sec-websocket-key")
+            if "websocket" not in headers.get("upgrade", "").lower() or not key:
+                writer.write(b"HTTP/1.1 426 Upgrade Required\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+                await writer.drain()
+                return
+
+            accept = base64.b64encode(hashlib.sha1((key + _WS_GUID).encode()).digest()).decode()
+            writer.write((
+                "HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+            ).encode())
+            await writer.drain()
+
+            query = parse_qs(urlsplit(request_line.decode("latin-1").split(" ")[1]).query)
+            location = query.get("location", [None])[0]
+            scenario = query.get("scenario", ["normal"])[0].lower()
+
+            self.clients += 1
+            closed = asyncio.Event()
+            watcher = asyncio.create_task(self._watch_client(reader, writer, closed))
+            try:
+                await self._push(writer, location, scenario, closed)
+            finally:
+                watcher.cancel()
+                self.clients -= 1
+        except (asyncio.IncompleteReadError, ConnectionError, IndexError):
+            pass
+        finally:
+            writer.close()
+
+    async def _watch_client(self, reader, writer, closed):
+        # Answers pings and notices close frames / disconnects
+        try:
+            while True:
+                opcode, payload = await _read_ws_frame(reader)
+                if opcode == 0x8:
+                    writer.write(_ws_frame(payload[:2], opcode=0x8))
+                    break
+                if opcode == 0x9:
+                    writer.write(_ws_frame(payload, opcode=0xA))
+        except ValueError: # Oversized frame: close with "message too big" instead of buffering it
+            writer.write(_ws_frame(struct.pack("!H", CLOSE_TOO_BIG), opcode=0x8))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        closed.set()
+
+    async def _push(self, writer, location, scenario, closed):
+        next_tick = time.perf_counter()
+        while not closed.is_set():
+            writer.write(_ws_frame(encode_frame(self.source(location, scenario))))
+            await writer.drain()
+            next_tick += self.period
+            await asyncio.sleep(max(0.0, next_tick - time.perf_counter()))
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+def start_in_thread(host=DEFAULT_HOST, port=DEFAULT_PORT, source=None):
+    """
+    Runs the stream server on a daemon thread (used by the dashboard).
+
+    Raises:
+        OSError: If the port is already taken.
+    """
+    server = TwinStreamServer(source)
+    loop = asyncio.new_event_loop()
+    # Bind synchronously so a busy port is reported to the caller
+    listener = loop.run_until_complete(asyncio.start_server(server.handle, host, port))
+    thread = threading.Thread(target=loop.run_forever, name="twin-stream", daemon=True)
+    thread.start()
+    return listener
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SetuAayu digital twin WebSocket stream")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Use 0.0.0.0 to accept remote viewers")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+    print(f"🧊 Twin stream on ws://{args.host}:{args.port}/twin")
+    asyncio.run(TwinStreamServer().serve(args.host, args.port))
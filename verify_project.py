@@ -1,7 +1,7 @@
 import os
-import pickle
 import pandas as pd
 from bridge_sim import generate_bridge_data
+from inference import get_model, predict_batch
 
 def check_file(filename):
     if os.path.exists(filename):
@@ -21,9 +21,14 @@ files_to_check = [
     "firmware.ino",
     "generate_dataset.py",
     "train_model.py",
+    "inference.py",
+    "features.py",
+    "forest_model.py",
     "bridge_data.csv",
     "model.pkl",
-    "DATASETS.md"
+    "DATASETS.md",
+    "bridge_assets.csv",
+    "crack_model.json"
 ]
 
 all_files = True
@@ -50,15 +55,311 @@ except Exception as e:
 # 3. Model Loading Check
 print("\n--- Testing ML Model ---")
 try:
-    with open("model.pkl", "rb") as f:
-        model = pickle.load(f)
+    get_model()
     print("✅ Model loaded successfully.")
     
     # Simple Inference Test
     test_input = [[0.5, 0.5, 0.5, 600, 3.0]] # High values
-    pred = model.predict(test_input)[0]
+    labels, probs = predict_batch(test_input)
+    pred = labels[0]
     print(f"✅ Model Inference Test: Input=High Values -> Prediction={pred} (Expected 1)")
 except Exception as e:
     print(f"❌ Model Check Failed: {str(e)}")
 
+# 4. Compact Model Check (NumPy evaluator must match sklearn bit-for-bit)
+print("\n--- Testing Compact Model Export ---")
+try:
+    import pickle
+    from forest_model import FOREST_DIR, file_sha256, is_current, parity_check
+    if os.path.exists(os.path.join(FOREST_DIR, "meta.json")):
+        with open("model.pkl", "rb") as f:
+            sk_model = pickle.load(f)
+        proba_ok, labels_ok = parity_check(sk_model, FOREST_DIR)
+        if not is_current(FOREST_DIR, file_sha256("model.pkl")):
+            print("❌ Compact forest was not exported from this model.pkl. Re-run 'python forest_model.py export'.")
+        elif proba_ok and labels_ok:
+            print("✅ Compact forest matches sklearn (bit-identical probabilities)")
+        else:
+            print("❌ Compact forest differs from sklearn. Re-run 'python forest_model.py export'.")
+    else:
+        print(f"⚠️ No '{FOREST_DIR}' export found. Run 'python forest_model.py export'.")
+except Exception as e:
+    print(f"❌ Compact Model Check Failed: {str(e)}")
+
+# 5. Feature Pipeline Check (streaming and batch must agree)
+print("\n--- Testing Feature Pipeline ---")
+try:
+    from features import parity_check
+    diff = parity_check()
+    if diff < 1e-6:
+        print(f"✅ Streaming and batch features match (max rel. diff {diff:.1e})")
+    else:
+        print(f"❌ Streaming and batch features differ (max rel. diff {diff:.1e})")
+except Exception as e:
+    print(f"❌ Feature Check Failed: {str(e)}")
+
+# 6. Wire Protocol Check (binary frames must round-trip exactly)
+print("\n--- Testing Binary Wire Protocol ---")
+try:
+    import numpy as np
+    from wire_protocol import decode_frames, encode_frame, frames_to_readings
+    samples = np.random.default_rng(0).random((10, 5), dtype=np.float32)
+    body = encode_frame(7, 42, 1764892800000, 100, samples) * 2
+    frames = decode_frames(body)
+    readings = frames_to_readings(frames)
+    if (len(frames) == 2 and np.array_equal(frames[0].samples.view("<f4").reshape(10, 5), samples)
+            and readings[9]["timestamp"] == 1764892800.9 and frames[1].seq == 42):
+        print(f"✅ Binary frames round-trip ({len(body) // 2} bytes per 10 samples)")
+    else:
+        print("❌ Binary frames did not round-trip")
+except Exception as e:
+    print(f"❌ Wire Protocol Check Failed: {str(e)}")
+
+# 7. Instrumentation Check (hooks must be near-free while metrics are off)
+print("\n--- Testing Instrumentation Overhead ---")
+try:
+    import instrumentation
+    overhead = instrumentation.overhead_check()
+    added_ns = overhead["timed_off_ns"] - overhead["bare_ns"]
+    if added_ns < 1000:
+        print(f"✅ Disabled hooks add {added_ns:.0f} ns/call "
+              f"(enabled: {overhead['timed_on_ns'] - overhead['bare_ns']:.0f} ns/call)")
+    else:
+        print(f"❌ Disabled hooks add {added_ns:.0f} ns/call (budget 1000 ns)")
+except Exception as e:
+    print(f"❌ Instrumentation Check Failed: {str(e)}")
+
+# 8. Compact Readings Check (dict/CSV schema must round-trip through ReadingBatch)
+print("\n--- Testing Compact Readings ---")
+try:
+    import numpy as np
+    from readings import READING_DTYPE, ReadingBatch
+    reference = pd.read_csv("bridge_data.csv", keep_default_na=False)
+    batch = ReadingBatch.read_csv("bridge_data.csv")
+    restored = pd.DataFrame(batch.to_dicts())
+    same = all(
+        np.allclose(restored[c], reference[c]) if pd.api.types.is_numeric_dtype(reference[c])
+        else (restored[c] == reference[c]).all()
+        for c in reference.columns if c != "timestamp"
+    )
+    if same:
+        print(f"✅ bridge_data.csv round-trips through ReadingBatch ({READING_DTYPE.itemsize} bytes per reading)")
+    else:
+        print("❌ ReadingBatch round-trip changed values")
+except Exception as e:
+    print(f"❌ Compact Readings Check Failed: {str(e)}")
+
+# 9. LLM Analysis Check (offline against the mock: retries, coalescing and cache)
+print("\n--- Testing LLM Analysis (mock endpoint) ---")
+try:
+    import asyncio
+    from llm_analysis import LLMClient, MockLLMServer
+
+    async def llm_check():
+        mock = MockLLMServer(latency_s=0.01, error_rate=0.3, seed=0)
+        port = await mock.start(port=0)
+        client = LLMClient(api_key="mock", base_url=f"http://127.0.0.1:{port}/v1", backoff_s=0.01, max_retries=8)
+        critical = dict(generate_bridge_data("critical"), strain=612.0)
+        # Same reading 5x (coalesced) plus a copy with sensor-noise-sized differences (same quantized prompt)
+        noisy = dict(critical, strain=609.4)
+        out = await client.analyze_many([critical] * 5 + [noisy])
+        again = await client.analyze(critical)
+        await client.aclose()
+        await mock.stop()
+        return out, again, client.stats
+
+    out, again, stats = asyncio.run(llm_check())
+    if all(o == again and "CRITICAL" in o for o in out) and stats["api_calls"] - stats["retries"] == 1:
+        print(f"✅ 7 analyses -> 1 API request ({stats['retries']} retried), "
+              f"{stats['coalesced']} coalesced, {stats['cache_hits']} cached")
+    else:
+        print(f"❌ Unexpected LLM client behaviour: {stats}")
+    # Readings just over each limit must stay over it after quantization
+    from anomaly import check_thresholds
+    from llm_analysis import build_messages, mock_analysis, quantize
+    just_over = [{"vibration_x": 0.32}, {"strain": 310.0}, {"tilt": 2.1}, {"tilt": -2.1},
+                 {"traffic_load": 4400}, {"health_score": 69}]
+    hidden = [r for r in just_over if not check_thresholds(quantize(r))
+              or "CRITICAL" not in mock_analysis(build_messages(r))]
+    if not hidden:
+        print(f"✅ Quantized prompts keep all {len(just_over)} just-over-the-limit exceedances")
+    else:
+        print(f"❌ Quantization hides exceedances: {hidden}")
+except Exception as e:
+    print(f"❌ LLM Analysis Check Failed: {str(e)}")
+
+# 10. Modal Analysis Check (Welch PSD must match scipy; simulated softening must be flagged)
+print("\n--- Testing Modal Frequency Tracking ---")
+try:
+    import numpy as np
+    from scipy.signal import welch
+    from modal_analysis import ModalTracker, validate
+    rng = np.random.default_rng(0)
+    signal = rng.standard_normal((7000, 2, 3)).astype(np.float32) + 0.1
+    tracker = ModalTracker(2)
+    for piece in np.array_split(signal, 3): # Incremental updates must equal one batch Welch
+        tracker.update(piece)
+    used = (tracker.segments_per_window + 1) * tracker.step
+    _, reference = welch(signal[:used].transpose(1, 2, 0), fs=10, nperseg=tracker.nperseg, axis=-1)
+    psd_ok = np.allclose(tracker.last_psd, reference.mean(axis=1), rtol=1e-4)
+    result = validate(bridges=4, hours=8, degraded=1)
+    if psd_ok and result["alerts_hit"] == 1 and result["false_alarms"] == 0:
+        print(f"✅ Welch PSD matches scipy; simulated softening {result['true_drift_pct_mean']:+.1f}% "
+              f"tracked as {result['degraded_drift_pct_mean']:+.1f}%")
+    else:
+        print(f"❌ Modal tracking mismatch (PSD ok: {psd_ok}, {result})")
+except Exception as e:
+    print(f"❌ Modal Analysis Check Failed: {str(e)}")
+
+# 11. Asset Registry Check (every dataset naming scheme must resolve to one asset)
+print("\n--- Testing Asset Registry ---")
+try:
+    import numpy as np
+    from asset_registry import get_registry, haversine_km, synthetic_registry
+    registry = get_registry()
+    synthetic = pd.read_csv("synthetic_bridge.csv", usecols=["location_id", "location_name"]).drop_duplicates()
+    names_ok = all(registry.resolve_id(name) == asset_id
+                   for asset_id, name in synthetic.itertuples(index=False))
+    sim_ok = registry.lookup(generate_bridge_data()["location"]) is not None
+    large = synthetic_registry(20_000)
+    spatial_ok = all(
+        sorted(a.asset_id for a, _ in large.within_km(lat, lon, 25))
+        == sorted(np.asarray(large.ids)[haversine_km(lat, lon, large.lat, large.lon) <= 25])
+        for lat, lon in [(12.97, 77.59), (28.61, 77.21), (19.07, 72.88)]
+    )
+    if names_ok and sim_ok and spatial_ok:
+        print(f"✅ {len(registry)} assets; synthetic_bridge.csv and simulator names resolve; "
+              f"radius queries match a linear scan on 20k assets")
+    else:
+        print(f"❌ Registry mismatch (dataset names: {names_ok}, simulator: {sim_ok}, spatial: {spatial_ok})")
+except Exception as e:
+    print(f"❌ Asset Registry Check Failed: {str(e)}")
+
+# 12. Image Cache & Crack Detection Check (content-addressed store; tiled inspection cached per hash)
+print("\n--- Testing Image Cache & Crack Detection ---")
+try:
+    import tempfile
+    from crack_detection import CrackModel, inspect_image, synthetic_images
+    from image_cache import ImageCache
+    with tempfile.TemporaryDirectory() as folder:
+        cache = ImageCache(os.path.join(folder, "images"))
+        samples = synthetic_images(folder, 4, width=1920, height=1080, seed=1)
+        model = CrackModel.load()
+        results, cache_ok = [], True
+        for path, _ in samples:
+            with open(path, "rb") as f:
+                data = f.read()
+            sha = cache.put(data)
+            cache_ok &= cache.put(data) == sha and all(os.path.exists(cache.thumb_path(sha, w)) for w in cache.thumb_widths)
+            results.append(inspect_image(data, model, os.path.join(folder, "results")))
+        again = inspect_image(samples[0][0], model, os.path.join(folder, "results"))
+    verdicts_ok = all((r["verdict"] == "crack") == truth for r, (_, truth) in zip(results, samples))
+    if cache_ok and verdicts_ok and again["cached"]:
+        print(f"✅ Thumbnails cached by content hash; {len(samples)} synthetic scans classified correctly "
+              f"({results[0]['rows'] * results[0]['cols']} tiles each), re-inspection served from cache")
+    else:
+        print(f"❌ Image pipeline mismatch (cache: {cache_ok}, verdicts: {[r['verdict'] for r in results]}, "
+              f"cached re-run: {again['cached']})")
+except Exception as e:
+    print(f"❌ Image Cache & Crack Detection Check Failed: {str(e)}")
+
+# 13. Forecasting Check (incremental sufficient statistics == one-shot fit; intervals cover the truth)
+print("\n--- Testing Remaining-Life Forecasting ---")
+try:
+    from forecasting import validate as validate_forecasts
+    result = validate_forecasts(1000, 60, seed=1)
+    if result["incremental_max_rel_diff"] < 1e-9 and result["coverage"] >= 0.8 and result["false_alarms_1y"] == 0:
+        print(f"✅ Incremental fit matches a full refit; {result['coverage']:.0%} of "
+              f"{result['degrading']} health-limit crossings inside the 90% interval")
+    else:
+        print(f"❌ Forecast mismatch ({result})")
+except Exception as e:
+    print(f"❌ Forecasting Check Failed: {str(e)}")
+
+# 14. Replay Check (merged output time-ordered; two replays of the same history write identical outputs)
+print("\n--- Testing Telemetry Replay ---")
+try:
+    import tempfile
+    import numpy as np
+    from replay import Replay, csv_stream, merge_streams
+    merged = np.concatenate([b.data["timestamp_ms"] for b in merge_streams(
+        [csv_stream("synthetic_bridge.csv", 1000), csv_stream("bridge_data.csv", 1000)])])
+    with tempfile.TemporaryDirectory() as folder:
+        runs = []
+        for name in ("a", "b"):
+            replay = Replay()
+            replay.run([csv_stream("synthetic_bridge.csv")])
+            runs.append(replay.write(os.path.join(folder, name)))
+    same = all(runs[0][f"{n}_sha256"] == runs[1][f"{n}_sha256"] for n in ("alerts", "scores"))
+    if same and (np.diff(merged) >= 0).all() and runs[0]["readings"] and runs[0]["score_rows"]:
+        print(f"✅ {len(merged):,} readings merged in time order; two replays gave identical "
+              f"{runs[0]['alerts']:,} alerts and {runs[0]['score_rows']:,} scores "
+              f"({runs[0]['readings_per_s']:,.0f} readings/s)")
+    else:
+        print(f"❌ Replay mismatch (identical: {same}, digests: {[r['alerts_sha256'][:12] for r in runs]})")
+except Exception as e:
+    print(f"❌ Replay Check Failed: {str(e)}")
+
+# 15. Rollup Check (backfills replace their own buckets; every resolution holds every reading once)
+print("\n--- Testing Telemetry Rollups ---")
+try:
+    import tempfile
+    import pandas as pd
+    from rollups import RollupStore, backfill_csv
+    with tempfile.TemporaryDirectory() as folder:
+        rollups = RollupStore(os.path.join(folder, "rollups"))
+        history = pd.read_csv("synthetic_bridge.csv")
+        parts = []
+        for i in range(3): # Disjoint slices that share minute and hour buckets
+            parts.append(os.path.join(folder, f"part{i}.csv"))
+            history.iloc[i::3].to_csv(parts[-1], index=False)
+        for path in parts + ["bridge_data.csv", parts[0]]: # The last one is a re-run
+            backfill_csv(path, rollups)
+        sums = {name: int(sum(rollups.query(l, name)["count"].sum() for l in rollups.locations(name)))
+                for name in rollups.resolutions}
+    expected = len(history) + len(pd.read_csv("bridge_data.csv"))
+    if set(sums.values()) == {expected}:
+        print(f"✅ {expected:,} readings at every resolution after overlapping and repeated backfills")
+    else:
+        print(f"❌ Rollup counts differ across resolutions ({sums}, expected {expected:,})")
+except Exception as e:
+    print(f"❌ Rollup Check Failed: {str(e)}")
+
+# 16. Scoring Scheduler Check (a failing model must not kill the workers or strand bridges in flight)
+print("\n--- Testing Scoring Scheduler ---")
+try:
+    import contextlib
+    import io
+    import tempfile
+    import time
+    from bridge_sim import generate_bridge_data
+    from scoring_scheduler import ScoringScheduler
+    readings = [dict(generate_bridge_data(), node_id=f"VERIFY_{i}", timestamp=1e9 + i) for i in range(50)]
+    scheduler = ScoringScheduler(cadence_s=0.05, workers=2, batch_size=8)
+    good_model = scheduler.model_path
+    with tempfile.TemporaryDirectory() as folder:
+        scheduler.model_path = os.path.join(folder, "broken.pkl")
+        with open(scheduler.model_path, "wb") as f:
+            f.write(b"not a pickle")
+        scheduler.start()
+        with contextlib.redirect_stdout(io.StringIO()): # The expected failure warnings
+            scheduler.update(readings)
+            scheduler.queue.join()
+            time.sleep(0.2)
+            scheduler.queue.join()
+        failed = scheduler.stats["failed_batches"]
+        stranded = int(scheduler.inflight.sum())
+        scheduler.model_path = good_model
+        scheduler.update(readings)
+        scheduler.stop()
+    alive = scheduler.stats["scored"] == len(readings)
+    if failed and not stranded and alive:
+        print(f"✅ {failed} failing batches logged; no bridge left in flight, workers went on to score "
+              f"{scheduler.stats['scored']} bridges")
+    else:
+        print(f"❌ Scheduler did not recover (failed batches: {failed}, in flight: {stranded}, "
+              f"scored after recovery: {scheduler.stats['scored']})")
+except Exception as e:
+    print(f"❌ Scoring Scheduler Check Failed: {str(e)}")
+
 print("\n--- Check Complete ---")
@@ -0,0 +1,52 @@
+"""
+SetuAayu 3D Viewer Rendering
+
+Fills `bridge_viewer_template.html` with sensor values in a single regex pass.
+Kept out of app.py so it can be benchmarked without starting Streamlit.
+"""
+import re
+
+from anomaly import STRAIN_CRITICAL, STRAIN_WARNING
+from instrumentation import timed
+
+TEMPLATE_PATH = "bridge_viewer_template.html"
+TEMPLATE_FIELDS = re.compile(r"\{\{(\w+)\}\}")
+
+
+def read_template(path=TEMPLATE_PATH):
+    """Returns the template text, or None if the file is missing."""
+    try:
+        with open(path, "r") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+@timed("viewer_render_seconds", "3D viewer HTML template rendering")
+def render_viewer_html(html_template, data, stream_port=None, stream_query=""):
+    """
+    Injects a reading (and optional live-stream settings) into the template.
+
+    Args:
+        html_template (str): Template text from `read_template`.
+        data (dict): Reading with the five sensor fields.
+        stream_port (int): twin_stream.py port, or None for a static snapshot.
+        stream_query (str): Query string for the stream URL.
+
+    Returns:
+        str: HTML for `components.html`.
+    """
+    if html_template is None:
+        return "<div>Template not found</div>"
+    values = {
+        "VIB_X": data['vibration_x'],
+        "VIB_Y": data['vibration_y'],
+        "VIB_Z": data['vibration_z'],
+        "STRESS": data['strain'],
+        "TILT": data['tilt'],
+        "STREAM_PORT": stream_port or "",
+        "STREAM_QUERY": stream_query,
+        "STRAIN_CRITICAL": STRAIN_CRITICAL,
+        "STRAIN_WARNING": STRAIN_WARNING,
+    }
+    return TEMPLATE_FIELDS.sub(lambda m: str(values.get(m.group(1), m.group(0))), html_template)
@@ -0,0 +1,207 @@
+"""
+SetuAayu Binary Uplink Protocol
+
+Fixed-layout frame the ESP32 firmware sends instead of one JSON object per
+sample. All fields are little-endian (the ESP32's native byte order), so the
+firmware fills the frame with memcpy and the server reads the samples in
+place with `np.frombuffer`, without copying or parsing text:
+
+    offset  size  field
+    0       2     magic  b"SA"
+    2       1     version (1)
+    3       1     flags (reserved, 0)
+    4       4     node_id    uint32 (ESP32 chip id)
+    8       4     seq        uint32, +1 per frame (gaps = lost frames)
+    12      8     t0_ms      uint64, epoch ms of the first sample (0 = not synced)
+    20      2     period_ms  uint16, spacing between samples
+    22      2     n_samples  uint16
+    24      20*n  samples    float32 x5 per sample, in SENSOR_FIELDS order
+
+A request body may hold several frames back to back. Ten samples (one
+second at 10 Hz) make a 224-byte frame vs ~1.1 KB of JSON.
+
+Usage:
+    python wire_protocol.py bench          # in-process decode cost vs JSON
+"""
+import argparse
+import json
+import struct
+import time
+
+import numpy as np
+
+from bridge_sim import SENSOR_FIELDS
+
+MAGIC = b"SA"
+VERSION = 1
+HEADER = struct.Struct("<2sBBIIQHH")
+SAMPLE_DTYPE = np.dtype([(field, "<f4") for field in SENSOR_FIELDS])
+MAX_SAMPLES = 1000
+CONTENT_TYPE = "application/octet-stream"
+
+
+def node_name(node_id):
+    """String node id used in storage for a numeric frame node id."""
+    return f"NODE-{node_id:08X}"
+
+
+def encode_frame(node_id, seq, t0_ms, period_ms, samples):
+    """
+    Builds one frame.
+
+    Args:
+        samples: (n, 5) array-like in SENSOR_FIELDS order, or a structured
+            array with SAMPLE_DTYPE.
+
+    Returns:
+        bytes
+    """
+    samples = np.asarray(samples)
+    if samples.dtype != SAMPLE_DTYPE:
+        samples = np.ascontiguousarray(samples, dtype="<f4").view(SAMPLE_DTYPE).reshape(-1)
+    return HEADER.pack(MAGIC, VERSION, 0, node_id, seq, t0_ms, period_ms, len(samples)) + samples.tobytes()
+
+
+class Frame:
+    """One decoded frame. `samples` is a read-only view into the request body."""
+
+    __slots__ = ("node_id", "seq", "t0_ms", "period_ms", "samples", "received_at")
+
+    def __init__(self, node_id, seq, t0_ms, period_ms, samples, received_at=None):
+        self.node_id = node_id
+        self.seq = seq
+        self.t0_ms = t0_ms
+        self.period_ms = period_ms
+        self.samples = samples
+        self.received_at = received_at
+
+    def timestamps(self):
+        """Epoch seconds per sample; unsynced clocks count back from `received_at`."""
+        return _timestamps([self])
+
+
+def _timestamps(frames):
+    # Vectorized over all frames: base time of each frame + i * period
+    counts = np.array([len(f.samples) for f in frames])
+    period = np.array([f.period_ms for f in frames], dtype=np.float64) / 1000.0
+    base = np.array([f.t0_ms / 1000.0 if f.t0_ms else
+                     (f.received_at or time.time()) - (len(f.samples) - 1) * f.period_ms / 1000.0
+                     for f in frames])
+    starts = np.cumsum(counts) - counts
+    index = np.arange(counts.sum()) - np.repeat(starts, counts)
+    return np.repeat(base, counts) + index * np.repeat(period, counts)
+
+
+def decode_frames(body, received_at=None):
+    """
+    Decodes every frame in a request body without copying the samples.
+
+    Returns:
+        list: Frame objects.
+
+    Raises:
+        ValueError: On a bad magic/version, a truncated frame, too many
+            samples or non-finite values.
+    """
+    view = memoryview(body)
+    frames = []
+    offset = 0
+    while offset < len(view):
+        if len(view) - offset < HEADER.size:
+            raise ValueError("truncated frame header")
+        magic, version, _flags, node_id, seq, t0_ms, period_ms, n = HEADER.unpack_from(view, offset)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a SetuAayu v1 frame")
+        if n == 0 or n > MAX_SAMPLES:
+            raise ValueError(f"frame must carry 1..{MAX_SAMPLES} samples")
+        offset += HEADER.size
+        end = offset + n * SAMPLE_DTYPE.itemsize
+        if end > len(view):
+            raise ValueError("truncated frame samples")
+        samples = np.frombuffer(view, dtype=SAMPLE_DTYPE, count=n, offset=offset)
+        frames.append(Frame(node_id, seq, t0_ms, period_ms, samples, received_at))
+        offset = end
+    if not frames:
+        raise ValueError("empty body")
+    # One vectorized finiteness check per frame instead of per value
+    for frame in frames:
+        if not np.isfinite(frame.samples.view("<f4")).all():
+            raise ValueError("sensor values must be finite")
+    return frames
+
+
+def frames_to_batch(frames):
+    """
+    Expands decoded frames into a readings.ReadingBatch.
+
+    All frames are concatenated first, so the NumPy work is a handful of
+    calls per flush rather than per frame. Node ids are interned once per
+    distinct node.
+    """
+    from readings import ReadingBatch
+    if not frames:
+        return ReadingBatch.empty()
+    # Plain float32 views concatenate much faster than structured arrays (no per-array field promotion)
+    samples = np.concatenate([frame.samples.view("<f4") for frame in frames]).reshape(-1, len(SENSOR_FIELDS))
+    node_ids, frame_codes = np.unique([frame.node_id for frame in frames], return_inverse=True)
+    counts = [len(frame.samples) for frame in frames]
+    return ReadingBatch.from_columns(
+        np.round(_timestamps(frames) * 1000).astype(np.int64), [node_name(int(n)) for n in node_ids],
+        source_codes=np.repeat(frame_codes, counts),
+        **{field: samples[:, i] for i, field in enumerate(SENSOR_FIELDS)})
+
+
+def frames_to_readings(frames):
+    """Expands decoded frames into reading dicts in the ingest storage schema."""
+    return frames_to_batch(frames).to_dicts("ingest")
+
+
+def benchmark(samples_per_frame=10, frames=2000, seed=0):
+    """Server-side decode cost and body size per reading: JSON vs binary frames."""
+    from ingest_server import parse_payload
+
+    rng = np.random.default_rng(seed)
+    data = rng.random((frames, samples_per_frame, len(SENSOR_FIELDS)), dtype=np.float32)
+    t0_ms = int(time.time() * 1000)
+    json_bodies = [
+        json.dumps({"node_id": "NODE-0001", "readings": [
+            dict(zip(SENSOR_FIELDS, (round(float(v), 4) for v in sample)), timestamp=(t0_ms + i * 100) / 1000)
+            for i, sample in enumerate(frame)
+        ]}).encode()
+        for frame in data
+    ]
+    binary_bodies = [encode_frame(1, seq, t0_ms, 100, frame) for seq, frame in enumerate(data)]
+    readings = frames * samples_per_frame
+
+    def timed(decode, bodies):
+        start = time.process_time()
+        for body in bodies:
+            decode(body)
+        return (time.process_time() - start) / readings * 1e6
+
+    results = {
+        "json": {"bytes_per_reading": sum(map(len, json_bodies)) / readings,
+                 "decode_us_per_reading": timed(parse_payload, json_bodies)},
+        "binary": {"bytes_per_reading": sum(map(len, binary_bodies)) / readings,
+                   "decode_us_per_reading": timed(decode_frames, binary_bodies)},
+    }
+    # As the ingest service does it: decode per request, expand once per flush
+    start = time.process_time()
+    frames_to_batch([frame for body in binary_bodies for frame in decode_frames(body)])
+    results["binary"]["decode_to_batch_us_per_reading"] = (time.process_time() - start) / readings * 1e6
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SetuAayu binary uplink protocol")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_bench = sub.add_parser("bench", help="Decode cost and body size per reading, JSON vs binary")
+    p_bench.add_argument("--samples", type=int, default=10, help="Samples per frame / JSON request")
+    args = parser.parse_args()
+
+    results = benchmark(args.samples)
+    print(f"--- Body decode, {args.samples} samples per request ---")
+    for name, r in results.items():
+        print(f"{name:<7} {r['bytes_per_reading']:7.1f} B/reading  {r['decode_us_per_reading']:7.2f} µs/reading")
+    print(f"binary + expand to a ReadingBatch (done at flush time): "
+          f"{results['binary']['decode_to_batch_us_per_reading']:.2f} µs/reading")